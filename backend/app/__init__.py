@@ -43,4 +43,25 @@ def create_app():
     from .api.department_heads import bp as department_heads_bp
     app.register_blueprint(department_heads_bp)
 
+    # Warm the typeahead indexes; if the database isn't reachable yet they load on first use
+    from . import typeahead
+    try:
+        typeahead.build_all()
+    except Exception as e:
+        print(f"Typeahead indexes not built at startup: {e}")
+
+    # Load the reference data snapshot (insurers, department heads, departments)
+    from . import refdata
+    try:
+        refdata.refresh()
+    except Exception as e:
+        print(f"Reference data not loaded at startup: {e}")
+
+    # Fill the dashboard rollups on first start so writes can keep them current
+    from . import rollups
+    try:
+        rollups.ensure_ready()
+    except Exception as e:
+        print(f"Dashboard rollups not built at startup: {e}")
+
     return app
\ No newline at end of file
@@ -0,0 +1,187 @@
+# Recent activity feed for the dashboard
+#
+# Procedures, medications and encounters are read with one UNION ALL. Each
+# branch walks its own date index for the window (and the keyset condition
+# when loading more), takes at most limit + 1 rows, and the outer
+# ORDER BY / LIMIT merges them.
+from mysql.connector import Error
+from .db import get_db_connection, get_db_cursor
+from .pagination import encode_cursor, decode_cursor
+
+DEFAULT_LIMIT = 15
+MAX_LIMIT = 100
+
+# Every branch selects the same columns, in this order
+_PROCEDURES = """
+    SELECT
+        'procedure' AS type,
+        p.procedure_id AS id,
+        p.procedure_date AS activity_date,
+        CONCAT('procedure:', p.procedure_id) AS feed_key,
+        COALESCE(NULLIF(p.procedure_description, ''), CONCAT('Procedure ', p.procedure_code)) AS description,
+        pt.patient_id,
+        pt.first_name AS patient_first_name,
+        pt.last_name AS patient_last_name,
+        pr.name AS provider_name,
+        p.procedure_cost AS cost,
+        e.encounter_id,
+        e.visit_type,
+        NULL AS status,
+        NULL AS diagnosis_code,
+        NULL AS frequency,
+        NULL AS route
+    FROM procedures p
+    INNER JOIN encounters e ON p.encounter_id = e.encounter_id
+    INNER JOIN patients pt ON e.patient_id = pt.patient_id
+    LEFT OUTER JOIN providers pr ON p.provider_id = pr.provider_id
+    WHERE p.procedure_date >= %s AND p.procedure_date <= %s{after}
+    ORDER BY p.procedure_date DESC, feed_key DESC
+    LIMIT %s
+"""
+
+_MEDICATIONS = """
+    SELECT
+        'medication' AS type,
+        m.medication_id AS id,
+        m.prescribed_date AS activity_date,
+        CONCAT('medication:', m.medication_id) AS feed_key,
+        CONCAT(m.drug_name, ' (', IFNULL(m.dosage, 'None'), ')') AS description,
+        pt.patient_id,
+        pt.first_name AS patient_first_name,
+        pt.last_name AS patient_last_name,
+        pr.name AS provider_name,
+        m.cost,
+        e.encounter_id,
+        e.visit_type,
+        NULL AS status,
+        NULL AS diagnosis_code,
+        m.frequency,
+        m.route
+    FROM medications m
+    INNER JOIN encounters e ON m.encounter_id = e.encounter_id
+    INNER JOIN patients pt ON e.patient_id = pt.patient_id
+    LEFT OUTER JOIN providers pr ON m.prescriber_id = pr.provider_id
+    WHERE m.prescribed_date >= %s AND m.prescribed_date <= %s{after}
+    ORDER BY m.prescribed_date DESC, feed_key DESC
+    LIMIT %s
+"""
+
+# The primary diagnosis is looked up per returned encounter (idx_diagnoses_encounter_primary)
+# instead of joining a DISTINCT over the whole diagnoses table.
+_ENCOUNTERS = """
+    SELECT
+        'encounter' AS type,
+        e.encounter_id AS id,
+        e.visit_date AS activity_date,
+        CONCAT('encounter:', e.encounter_id) AS feed_key,
+        COALESCE(
+            (SELECT NULLIF(d.diagnosis_description, '')
+             FROM diagnoses d
+             WHERE d.encounter_id = e.encounter_id AND d.primary_flag = TRUE
+             LIMIT 1),
+            CONCAT('Encounter - ', IFNULL(e.visit_type, 'None'))
+        ) AS description,
+        pt.patient_id,
+        pt.first_name AS patient_first_name,
+        pt.last_name AS patient_last_name,
+        pr.name AS provider_name,
+        NULL AS cost,
+        e.encounter_id,
+        e.visit_type,
+        e.status,
+        e.diagnosis_code,
+        NULL AS frequency,
+        NULL AS route
+    FROM encounters e
+    INNER JOIN patients pt ON e.patient_id = pt.patient_id
+    LEFT OUTER JOIN providers pr ON e.provider_id = pr.provider_id
+    WHERE e.visit_date >= %s AND e.visit_date <= %s{after}
+    ORDER BY e.visit_date DESC, feed_key DESC
+    LIMIT %s
+"""
+
+# (branch query, date column, key expression) - the key matches feed_key
+_BRANCHES = [
+    (_PROCEDURES, "p.procedure_date", "CONCAT('procedure:', p.procedure_id)"),
+    (_MEDICATIONS, "m.prescribed_date", "CONCAT('medication:', m.medication_id)"),
+    (_ENCOUNTERS, "e.visit_date", "CONCAT('encounter:', e.encounter_id)"),
+]
+
+
+def _format(row):
+    """Shape a feed row the way the dashboard has always received it."""
+    activity = {
+        "id": row['id'],
+        "type": row['type'],
+        "date": row['activity_date'].strftime('%Y-%m-%d') if row['activity_date'] else None,
+        "description": row['description'],
+        "patient_id": row['patient_id'],
+        "patient_name": f"{row['patient_first_name']} {row['patient_last_name']}",
+        "provider_name": row['provider_name'] or "N/A",
+    }
+    if row['type'] == 'encounter':
+        activity.update({
+            "status": row['status'],
+            "visit_type": row['visit_type'],
+            "diagnosis_code": row['diagnosis_code']
+        })
+        return activity
+    activity.update({
+        "cost": float(row['cost']) if row['cost'] else 0.0,
+        "encounter_id": row['encounter_id'],
+        "visit_type": row['visit_type']
+    })
+    if row['type'] == 'medication':
+        activity.update({"frequency": row['frequency'], "route": row['route']})
+    return activity
+
+
+def get_feed(start_date, end_date, limit=DEFAULT_LIMIT, after=None):
+    """
+    Return the newest activities between start_date and end_date (inclusive),
+    newest first, as {activities, has_more, next_cursor}. Pass next_cursor
+    back as `after` to load the next page.
+    """
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    cursor_date = cursor_key = None
+    if after:
+        cursor_date, cursor_key = decode_cursor(after)
+        if not cursor_date or not cursor_key:
+            raise ValueError("Invalid pagination cursor")
+
+    branches = []
+    params = []
+    for query, date_col, key_expr in _BRANCHES:
+        after_sql = ""
+        branch_params = [start_date, end_date]
+        if after:
+            after_sql = f" AND ({date_col} < %s OR ({date_col} = %s AND {key_expr} < %s))"
+            branch_params.extend([cursor_date, cursor_date, cursor_key])
+        branch_params.append(limit + 1)
+        branches.append(f"({query.format(after=after_sql)})")
+        params.extend(branch_params)
+
+    feed_query = "\nUNION ALL\n".join(branches) + "\nORDER BY activity_date DESC, feed_key DESC\nLIMIT %s"
+    params.append(limit + 1)
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = get_db_cursor(conn)
+        cursor.execute(feed_query, params)
+        rows = cursor.fetchall()
+    except Error as e: raise Error(f"Error fetching recent activities: {e}")
+    finally:
+        if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor(rows[-1]['activity_date'], rows[-1]['feed_key'])
+
+    return {
+        "activities": [_format(row) for row in rows],
+        "has_more": has_more,
+        "next_cursor": next_cursor
+    }
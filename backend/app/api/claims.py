@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from ..models import ClaimsAndBillingModel, EncountersModel
+from ..db import transaction
+from .. import streaming, columnar
+from ..query import parse_fields, parse_ids, batch_result
 from mysql.connector import Error
 
 bp = Blueprint("claims", __name__, url_prefix="/api/claims")
@@ -16,26 +19,35 @@ def _safe_float(value):
         return None
 
 
+def _list_filters():
+    """Filters of the list and export endpoints, from the query string."""
+    return {
+        'billing_id': _value_or_none(request.args.get('billing_id')),
+        'encounter_id': _value_or_none(request.args.get('encounter_id')),
+        'claim_status': _value_or_none(request.args.get('claim_status')),
+        'billed_amount_min': _safe_float(request.args.get('billed_amount_min')),
+        'billed_amount_max': _safe_float(request.args.get('billed_amount_max')),
+        'claim_date_from': _value_or_none(request.args.get('claim_date_from')),
+        'claim_date_to': _value_or_none(request.args.get('claim_date_to')),
+        'payment_method': _value_or_none(request.args.get('payment_method'))
+    }
+
+
 @bp.get("/")
 def list_claims():
-    """Get all claims with optional search, filters, sorting, and pagination."""
+    """Get all claims with optional search, filters, sorting, and pagination, or a batch of them by ID (ids=A,B,C)."""
     try:
+        ids = parse_ids(request.args.get("ids"))
+        if ids is not None:
+            return jsonify(batch_result(ids, ClaimsAndBillingModel.get_by_ids(ids)))
+
         limit = int(request.args.get("limit", 50))
         page = int(request.args.get("page", 1))
         search = request.args.get("q", "").strip() or None
         sort_by = request.args.get("sort", "claim_billing_date")
         direction = request.args.get("direction", "desc").lower()
 
-        filters = {
-            'billing_id': _value_or_none(request.args.get('billing_id')),
-            'encounter_id': _value_or_none(request.args.get('encounter_id')),
-            'claim_status': _value_or_none(request.args.get('claim_status')),
-            'billed_amount_min': _safe_float(request.args.get('billed_amount_min')),
-            'billed_amount_max': _safe_float(request.args.get('billed_amount_max')),
-            'claim_date_from': _value_or_none(request.args.get('claim_date_from')),
-            'claim_date_to': _value_or_none(request.args.get('claim_date_to')),
-            'payment_method': _value_or_none(request.args.get('payment_method'))
-        }
+        filters = _list_filters()
 
         result = ClaimsAndBillingModel.get_all(
             limit=limit,
@@ -43,9 +55,14 @@ def list_claims():
             search=search,
             filters=filters,
             sort_by=sort_by,
-            sort_dir=direction
+            sort_dir=direction,
+            after=request.args.get("after") or None,
+            count=(request.args.get("count") or "exact").lower(),
+            fields=parse_fields(request.args.get("fields"))
         )
         return jsonify(result)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Error as e:
         import traceback
         print(f"Claims API MySQL Error: {str(e)}")
@@ -58,6 +75,69 @@ def list_claims():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.post("/batch")
+def get_claims_batch():
+    """Get many claims by ID from a JSON body {"ids": [...]}, for lists too long for ?ids=."""
+    try:
+        ids = parse_ids((request.get_json(silent=True) or {}).get("ids"))
+        if ids is None:
+            raise ValueError("ids is required")
+        return jsonify(batch_result(ids, ClaimsAndBillingModel.get_by_ids(ids)))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.get("/export")
+def export_claims():
+    """Stream every claim matching the list filters as CSV or NDJSON (format=csv|ndjson)."""
+    try:
+        fmt = streaming.parse_format(request.args.get("format"))
+        search = request.args.get("q", "").strip() or None
+        sort_by = request.args.get("sort", "claim_billing_date")
+        direction = request.args.get("direction", "desc").lower()
+
+        export = ClaimsAndBillingModel.export(
+            search=search,
+            filters=_list_filters(),
+            sort_by=sort_by,
+            sort_dir=direction,
+            fields=parse_fields(request.args.get("fields"))
+        )
+        return streaming.response(export, fmt, "claims")
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.get("/export/columnar")
+def export_claims_columnar():
+    """
+    Stream the claims table as an Arrow IPC stream or a Parquet file (format=arrow|parquet),
+    optionally limited by claim date (date_from, date_to).
+    """
+    try:
+        fmt = columnar.parse_format(request.args.get("format"))
+        export = columnar.ColumnarExport(
+            'claims',
+            date_from=_value_or_none(request.args.get("date_from")),
+            date_to=_value_or_none(request.args.get("date_to"))
+        )
+        return columnar.response(export, fmt)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.get("/<billing_id>")
 def get_claim(billing_id):
     """Get a single claim by billing_id."""
@@ -75,6 +155,7 @@ def get_claim(billing_id):
 @bp.get("/by-claim-id/<claim_id>")
 def get_claim_by_claim_id(claim_id):
     """Get a single claim by claim_id (not billing_id)."""
+    conn = None
     try:
         from ..db import get_db_connection
         conn = get_db_connection()
@@ -90,7 +171,6 @@ def get_claim_by_claim_id(claim_id):
         
         claim = cursor.fetchone()
         cursor.close()
-        conn.close()
         
         if not claim:
             return jsonify({"error": "Claim not found"}), 404
@@ -99,6 +179,8 @@ def get_claim_by_claim_id(claim_id):
         return jsonify({"error": str(e)}), 500
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    finally:
+        if conn: conn.close()
 
 
 @bp.post("/")
@@ -119,8 +201,9 @@ def create_claim():
             except:
                 data['billed_amount'] = 0.0
 
-        billing_id = ClaimsAndBillingModel.add(data)
-        claim = ClaimsAndBillingModel.get_by_id(billing_id)
+        with transaction():
+            billing_id = ClaimsAndBillingModel.add(data)
+            claim = ClaimsAndBillingModel.get_by_id(billing_id)
         return jsonify(claim), 201
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -148,11 +231,12 @@ def update_claim(billing_id):
             except:
                 pass
 
-        success = ClaimsAndBillingModel.update(billing_id, data)
-        if not success:
-            return jsonify({"error": "Claim not found or no changes made"}), 404
+        with transaction():
+            success = ClaimsAndBillingModel.update(billing_id, data)
+            if not success:
+                return jsonify({"error": "Claim not found or no changes made"}), 404
 
-        claim = ClaimsAndBillingModel.get_by_id(billing_id)
+            claim = ClaimsAndBillingModel.get_by_id(billing_id)
         return jsonify(claim)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -191,6 +275,60 @@ def sync_claim_amount(encounter_id):
         return jsonify({"error": str(e)}), 500
 
 
+@bp.get("/reconcile")
+def check_claim_amounts():
+    """Report claims whose billed amount differs from the sum of their procedures and medications."""
+    try:
+        limit = int(request.args.get("limit", 100))
+        return jsonify(ClaimsAndBillingModel.reconcile(fix=False, limit=limit))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.post("/reconcile")
+def reconcile_claim_amounts():
+    """Reset mismatched billed amounts to the sum of their procedures and medications."""
+    try:
+        limit = int(request.args.get("limit", 100))
+        return jsonify(ClaimsAndBillingModel.reconcile(fix=True, limit=limit))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.post("/recompute")
+def recompute_claims():
+    """
+    Recompute the claims of many encounters at once, e.g. after a backfill of procedures or medications.
+    Body: {"encounter_ids": [...]} or {"since": "YYYY-MM-DD"} (encounters with line items dated since then).
+    """
+    try:
+        data = request.get_json() or {}
+        encounter_ids = data.get('encounter_ids')
+        since = _value_or_none(data.get('since'))
+        if encounter_ids is None and not since:
+            raise ValueError("encounter_ids or since is required")
+        if encounter_ids is not None and (not isinstance(encounter_ids, list)
+                                          or not all(isinstance(eid, str) for eid in encounter_ids)):
+            raise ValueError("encounter_ids must be a list of encounter IDs")
+        if encounter_ids is None:
+            encounter_ids = ClaimsAndBillingModel.dirty_encounters(since)
+        return jsonify(ClaimsAndBillingModel.recompute(encounter_ids, batch_size=int(data.get('batch_size') or 500)))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.get("/statistics")
 def get_statistics():
     """Get claim statistics grouped by status."""
@@ -205,13 +343,12 @@ def get_statistics():
 
 @bp.get("/options/encounters")
 def get_encounters_options():
-    """Get encounters for dropdown options with optional search using SQL LIKE."""
+    """Get the most recent encounters for dropdown options, matching an encounter ID prefix or patient name."""
     try:
         search = request.args.get("search", "").strip() or None
         limit = int(request.args.get("limit", 50))
         
-        result = EncountersModel.get_all(limit=limit, page=1, search=search)
-        encounters = result.get('data', []) if isinstance(result, dict) else []
+        encounters = EncountersModel.lookup(search=search, limit=limit)
         return jsonify(encounters)
     except Error as e:
         return jsonify({"error": str(e)}), 500
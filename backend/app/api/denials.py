@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from ..models import DenialsModel, ClaimsAndBillingModel
-from ..db import get_conn
+from ..db import get_conn, transaction
+from .. import streaming, columnar
+from ..query import parse_fields, parse_ids, batch_result
 from mysql.connector import Error
 
 bp = Blueprint("denials", __name__, url_prefix="/api/denials")
@@ -17,24 +19,33 @@ def _safe_float(value):
         return None
 
 
+def _list_filters():
+    """Filters of the list and export endpoints, from the query string."""
+    return {
+        'denial_id': _value_or_none(request.args.get('denial_id')),
+        'claim_id': _value_or_none(request.args.get('claim_id')),
+        'appeal_status': _value_or_none(request.args.get('appeal_status')),
+        'appeal_filed': _value_or_none(request.args.get('appeal_filed')),
+        'denial_date_from': _value_or_none(request.args.get('denial_date_from')),
+        'denial_date_to': _value_or_none(request.args.get('denial_date_to'))
+    }
+
+
 @bp.get("/")
 def list_denials():
-    """Get all denials with optional search, filters, sorting, and pagination."""
+    """Get all denials with optional search, filters, sorting, and pagination, or a batch of them by ID (ids=A,B,C)."""
     try:
+        ids = parse_ids(request.args.get("ids"))
+        if ids is not None:
+            return jsonify(batch_result(ids, DenialsModel.get_by_ids(ids)))
+
         limit = int(request.args.get("limit", 50))
         page = int(request.args.get("page", 1))
         search = request.args.get("q", "").strip() or None
-        sort_by = request.args.get("sort", "denial_date")
+        sort_by = request.args.get("sort") or ("relevance" if search else "denial_date")
         direction = request.args.get("direction", "desc").lower()
 
-        filters = {
-            'denial_id': _value_or_none(request.args.get('denial_id')),
-            'claim_id': _value_or_none(request.args.get('claim_id')),
-            'appeal_status': _value_or_none(request.args.get('appeal_status')),
-            'appeal_filed': _value_or_none(request.args.get('appeal_filed')),
-            'denial_date_from': _value_or_none(request.args.get('denial_date_from')),
-            'denial_date_to': _value_or_none(request.args.get('denial_date_to'))
-        }
+        filters = _list_filters()
 
         result = DenialsModel.get_all(
             limit=limit,
@@ -42,9 +53,14 @@ def list_denials():
             search=search,
             filters=filters,
             sort_by=sort_by,
-            sort_dir=direction
+            sort_dir=direction,
+            after=request.args.get("after") or None,
+            count=(request.args.get("count") or "exact").lower(),
+            fields=parse_fields(request.args.get("fields"))
         )
         return jsonify(result)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Error as e:
         import traceback
         print(f"Denials API MySQL Error: {str(e)}")
@@ -57,6 +73,69 @@ def list_denials():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.post("/batch")
+def get_denials_batch():
+    """Get many denials by ID from a JSON body {"ids": [...]}, for lists too long for ?ids=."""
+    try:
+        ids = parse_ids((request.get_json(silent=True) or {}).get("ids"))
+        if ids is None:
+            raise ValueError("ids is required")
+        return jsonify(batch_result(ids, DenialsModel.get_by_ids(ids)))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.get("/export")
+def export_denials():
+    """Stream every denial matching the list filters as CSV or NDJSON (format=csv|ndjson)."""
+    try:
+        fmt = streaming.parse_format(request.args.get("format"))
+        search = request.args.get("q", "").strip() or None
+        sort_by = request.args.get("sort") or ("relevance" if search else "denial_date")
+        direction = request.args.get("direction", "desc").lower()
+
+        export = DenialsModel.export(
+            search=search,
+            filters=_list_filters(),
+            sort_by=sort_by,
+            sort_dir=direction,
+            fields=parse_fields(request.args.get("fields"))
+        )
+        return streaming.response(export, fmt, "denials")
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.get("/export/columnar")
+def export_denials_columnar():
+    """
+    Stream the denials table as an Arrow IPC stream or a Parquet file (format=arrow|parquet),
+    optionally limited by denial date (date_from, date_to).
+    """
+    try:
+        fmt = columnar.parse_format(request.args.get("format"))
+        export = columnar.ColumnarExport(
+            'denials',
+            date_from=_value_or_none(request.args.get("date_from")),
+            date_to=_value_or_none(request.args.get("date_to"))
+        )
+        return columnar.response(export, fmt)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.get("/<denial_id>")
 def get_denial(denial_id):
     """Get a single denial by ID."""
@@ -103,8 +182,9 @@ def create_denial():
             except:
                 data['denied_amount'] = 0.0
 
-        denial_id = DenialsModel.add(data)
-        denial = DenialsModel.get_by_id(denial_id)
+        with transaction():
+            denial_id = DenialsModel.add(data)
+            denial = DenialsModel.get_by_id(denial_id)
         return jsonify(denial), 201
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -132,11 +212,12 @@ def update_denial(denial_id):
             except:
                 pass
 
-        success = DenialsModel.update(denial_id, data)
-        if not success:
-            return jsonify({"error": "Denial not found or no changes made"}), 404
+        with transaction():
+            success = DenialsModel.update(denial_id, data)
+            if not success:
+                return jsonify({"error": "Denial not found or no changes made"}), 404
 
-        denial = DenialsModel.get_by_id(denial_id)
+            denial = DenialsModel.get_by_id(denial_id)
         return jsonify(denial)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -178,6 +259,21 @@ def get_claims_options():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.get("/options")
+def get_options():
+    """Get all denial form vocabularies in one response; revalidated by ETag."""
+    try:
+        options, etag = DenialsModel.get_options()
+        response = jsonify(options)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.get("/options/denial-reason-codes")
 def get_denial_reason_codes():
     """Get all distinct denial reason codes."""
@@ -199,6 +295,7 @@ def get_billing_for_denial():
     - claim_id IS NOT NULL (insurance claims only)
     - claim_id NOT EXISTS in denials table (not already denied)
     """
+    conn = None
     try:
         search = request.args.get("search", "").strip() or None
         limit = int(request.args.get("limit", 50))
@@ -249,9 +346,10 @@ def get_billing_for_denial():
             })
         
         cursor.close()
-        conn.close()
         return jsonify(options)
     except Error as e:
         return jsonify({"error": str(e)}), 500
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    finally:
+        if conn: conn.close()
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 from ..models import DepartmentHeadsModel
+from ..db import transaction
+from ..query import parse_fields, parse_ids, batch_result
 from mysql.connector import Error
 
 bp = Blueprint("department_heads", __name__, url_prefix="/api/department-heads")
@@ -18,13 +20,17 @@ def _safe_int(value):
 
 @bp.get("/")
 def list_department_heads():
-    """Get all department heads with optional search, filters, sorting, and pagination."""
+    """Get all department heads with optional search, filters, sorting, and pagination, or a batch of them by ID (ids=A,B,C)."""
     try:
+        ids = parse_ids(request.args.get("ids"), cast=int)
+        if ids is not None:
+            return jsonify(batch_result(ids, DepartmentHeadsModel.get_by_ids(ids)))
+
         limit = int(request.args.get("limit", 50))
         page = int(request.args.get("page", 1))
         search = request.args.get("q", "").strip() or None
-        sort_by = request.args.get("sort", "department")
-        direction = request.args.get("direction", "asc").lower()
+        sort_by = request.args.get("sort") or ("relevance" if search else "department")
+        direction = request.args.get("direction", "desc" if sort_by == "relevance" else "asc").lower()
 
         filters = {
             'head_id': _safe_int(request.args.get('head_id')),
@@ -40,9 +46,14 @@ def list_department_heads():
             search=search,
             filters=filters,
             sort_by=sort_by,
-            sort_dir=direction
+            sort_dir=direction,
+            after=request.args.get("after") or None,
+            count=(request.args.get("count") or "exact").lower(),
+            fields=parse_fields(request.args.get("fields"))
         )
         return jsonify(result)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Error as e:
         import traceback
         print(f"Department Heads API MySQL Error: {str(e)}")
@@ -55,6 +66,22 @@ def list_department_heads():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.post("/batch")
+def get_department_heads_batch():
+    """Get many department heads by ID from a JSON body {"ids": [...]}, for lists too long for ?ids=."""
+    try:
+        ids = parse_ids((request.get_json(silent=True) or {}).get("ids"), cast=int)
+        if ids is None:
+            raise ValueError("ids is required")
+        return jsonify(batch_result(ids, DepartmentHeadsModel.get_by_ids(ids)))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.get("/<int:head_id>")
 def get_department_head(head_id):
     """Get a single department head by ID."""
@@ -88,8 +115,9 @@ def create_department_head():
             except:
                 data['head_id'] = None
 
-        head_id = DepartmentHeadsModel.add(data)
-        head = DepartmentHeadsModel.get_by_id(head_id)
+        with transaction():
+            head_id = DepartmentHeadsModel.add(data)
+            head = DepartmentHeadsModel.get_by_id(head_id)
         return jsonify(head), 201
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -111,11 +139,12 @@ def update_department_head(head_id):
             if value == "" and key not in required_fields:
                 data[key] = None
 
-        success = DepartmentHeadsModel.update(head_id, data)
-        if not success:
-            return jsonify({"error": "Department head not found or no changes made"}), 404
+        with transaction():
+            success = DepartmentHeadsModel.update(head_id, data)
+            if not success:
+                return jsonify({"error": "Department head not found or no changes made"}), 404
 
-        head = DepartmentHeadsModel.get_by_id(head_id)
+            head = DepartmentHeadsModel.get_by_id(head_id)
         return jsonify(head)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
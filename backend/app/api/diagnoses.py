@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from ..models import DiagnosesModel, EncountersModel
+from ..db import transaction
+from .. import streaming, bulk
+from ..query import parse_fields, parse_ids, batch_result
 from mysql.connector import Error
 
 bp = Blueprint("diagnoses", __name__, url_prefix="/api/diagnoses")
@@ -9,23 +12,32 @@ def _value_or_none(value):
     return value.strip() if value and value.strip() else None
 
 
+def _list_filters():
+    """Filters of the list and export endpoints, from the query string."""
+    return {
+        'diagnosis_id': _value_or_none(request.args.get('diagnosis_id')),
+        'encounter_id': _value_or_none(request.args.get('encounter_id')),
+        'diagnosis_code': _value_or_none(request.args.get('diagnosis_code')),
+        'primary_flag': _value_or_none(request.args.get('primary_flag')),
+        'chronic_flag': _value_or_none(request.args.get('chronic_flag')),
+    }
+
+
 @bp.get("/")
 def list_diagnoses():
-    """Get all diagnoses with optional search, filters, sorting, and pagination."""
+    """Get all diagnoses with optional search, filters, sorting, and pagination, or a batch of them by ID (ids=A,B,C)."""
     try:
+        ids = parse_ids(request.args.get("ids"))
+        if ids is not None:
+            return jsonify(batch_result(ids, DiagnosesModel.get_by_ids(ids)))
+
         limit = int(request.args.get("limit", 50))
         page = int(request.args.get("page", 1))
         search = request.args.get("q", "").strip() or None
-        sort_by = request.args.get("sort", "diagnosis_id")
+        sort_by = request.args.get("sort") or ("relevance" if search else "diagnosis_id")
         direction = request.args.get("direction", "desc").lower()
 
-        filters = {
-            'diagnosis_id': _value_or_none(request.args.get('diagnosis_id')),
-            'encounter_id': _value_or_none(request.args.get('encounter_id')),
-            'diagnosis_code': _value_or_none(request.args.get('diagnosis_code')),
-            'primary_flag': _value_or_none(request.args.get('primary_flag')),
-            'chronic_flag': _value_or_none(request.args.get('chronic_flag')),
-        }
+        filters = _list_filters()
 
         result = DiagnosesModel.get_all(
             limit=limit,
@@ -33,9 +45,14 @@ def list_diagnoses():
             search=search,
             filters=filters,
             sort_by=sort_by,
-            sort_dir=direction
+            sort_dir=direction,
+            after=request.args.get("after") or None,
+            count=(request.args.get("count") or "exact").lower(),
+            fields=parse_fields(request.args.get("fields"))
         )
         return jsonify(result)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Error as e:
         import traceback
         print(f"Diagnoses API MySQL Error: {str(e)}")
@@ -48,6 +65,47 @@ def list_diagnoses():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.post("/batch")
+def get_diagnoses_batch():
+    """Get many diagnoses by ID from a JSON body {"ids": [...]}, for lists too long for ?ids=."""
+    try:
+        ids = parse_ids((request.get_json(silent=True) or {}).get("ids"))
+        if ids is None:
+            raise ValueError("ids is required")
+        return jsonify(batch_result(ids, DiagnosesModel.get_by_ids(ids)))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.get("/export")
+def export_diagnoses():
+    """Stream every diagnosis matching the list filters as CSV or NDJSON (format=csv|ndjson)."""
+    try:
+        fmt = streaming.parse_format(request.args.get("format"))
+        search = request.args.get("q", "").strip() or None
+        sort_by = request.args.get("sort") or ("relevance" if search else "diagnosis_id")
+        direction = request.args.get("direction", "desc").lower()
+
+        export = DiagnosesModel.export(
+            search=search,
+            filters=_list_filters(),
+            sort_by=sort_by,
+            sort_dir=direction,
+            fields=parse_fields(request.args.get("fields"))
+        )
+        return streaming.response(export, fmt, "diagnoses")
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.get("/<diagnosis_id>")
 def get_diagnosis(diagnosis_id):
     """Get a single diagnosis by ID."""
@@ -73,8 +131,9 @@ def create_diagnosis():
             if value == "" and key not in required_fields:
                 data[key] = None
 
-        diagnosis_id = DiagnosesModel.add(data)
-        diagnosis = DiagnosesModel.get_by_id(diagnosis_id)
+        with transaction():
+            diagnosis_id = DiagnosesModel.add(data)
+            diagnosis = DiagnosesModel.get_by_id(diagnosis_id)
         return jsonify(diagnosis), 201
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -84,6 +143,30 @@ def create_diagnosis():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.post("/bulk")
+def create_diagnoses_bulk():
+    """Create many diagnoses in one transaction from a JSON array (or {"records": [...]})."""
+    try:
+        records = bulk.parse_records(request.get_json(silent=True))
+        # Clean up data - convert empty strings to None
+        required_fields = ['encounter_id', 'diagnosis_code']
+        for record in records:
+            if isinstance(record, dict):
+                for key, value in record.items():
+                    if value == "" and key not in required_fields:
+                        record[key] = None
+
+        with transaction():
+            ids = DiagnosesModel.add_many(records)
+        return jsonify({"created": len(ids), "ids": ids}), 201
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.put("/<diagnosis_id>")
 def update_diagnosis(diagnosis_id):
     """Update an existing diagnosis."""
@@ -95,11 +178,12 @@ def update_diagnosis(diagnosis_id):
             if value == "" and key not in required_fields:
                 data[key] = None
 
-        success = DiagnosesModel.update(diagnosis_id, data)
-        if not success:
-            return jsonify({"error": "Diagnosis not found or no changes made"}), 404
+        with transaction():
+            success = DiagnosesModel.update(diagnosis_id, data)
+            if not success:
+                return jsonify({"error": "Diagnosis not found or no changes made"}), 404
 
-        diagnosis = DiagnosesModel.get_by_id(diagnosis_id)
+            diagnosis = DiagnosesModel.get_by_id(diagnosis_id)
         return jsonify(diagnosis)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -125,7 +209,7 @@ def delete_diagnosis(diagnosis_id):
 
 @bp.get("/options/encounters")
 def get_encounters_options():
-    """Get encounters for dropdown options with optional search using SQL LIKE."""
+    """Get the most recent encounters for dropdown options, matching an encounter ID prefix or patient name."""
     try:
         search = request.args.get("search", "").strip() or None
         limit = int(request.args.get("limit", 50))
@@ -134,8 +218,7 @@ def get_encounters_options():
         if available_only:
             encounters = DiagnosesModel.get_available_encounters(search=search, limit=limit)
         else:
-            result = EncountersModel.get_all(limit=limit, page=1, search=search)
-            encounters = result.get('data', []) if isinstance(result, dict) else []
+            encounters = EncountersModel.lookup(search=search, limit=limit)
             
         return jsonify(encounters)
     except Error as e:
@@ -143,6 +226,21 @@ def get_encounters_options():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@bp.get("/options")
+def get_options():
+    """Get all diagnosis form vocabularies in one response; revalidated by ETag."""
+    try:
+        options, etag = DiagnosesModel.get_options()
+        response = jsonify(options)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.get("/options/diagnosis-codes")
 def get_diagnosis_codes():
     """Get all distinct diagnosis codes."""
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
-from ..models import EncountersModel, PatientsModel, ProvidersModel
-from ..db import get_db_connection
+from ..models import EncountersModel, ProvidersModel
+from ..db import transaction
+from .. import typeahead, fanout, streaming, columnar
+from ..query import parse_fields, parse_ids, batch_result
 from mysql.connector import Error
 
 bp = Blueprint("encounters", __name__)
@@ -23,27 +25,36 @@ def _bool_from_request(value):
     return value.lower() in ("1", "true", "yes", "y")
 
 
+def _list_filters():
+    """Filters of the list and export endpoints, from the query string."""
+    return {
+        'encounter_id': _value_or_none(request.args.get('encounter_id')),
+        'patient_id': _value_or_none(request.args.get('patient_id')),
+        'provider_id': _value_or_none(request.args.get('provider_id')),
+        'patient_name': _value_or_none(request.args.get('patient_name')),
+        'provider_name': _value_or_none(request.args.get('provider_name')),
+        'department': _value_or_none(request.args.get('department')),
+        'status': _value_or_none(request.args.get('status')),
+        'visit_from': _value_or_none(request.args.get('visit_from')),
+        'readmitted_flag': _bool_from_request(request.args.get('readmitted_flag'))
+    }
+
+
 @bp.get("/")
 def list_encounters():
-    """Get all encounters with optional search, filters, sorting, and pagination."""
+    """Get all encounters with optional search, filters, sorting, and pagination, or a batch of them by ID (ids=A,B,C)."""
     try:
+        ids = parse_ids(request.args.get("ids"))
+        if ids is not None:
+            return jsonify(batch_result(ids, EncountersModel.get_by_ids(ids)))
+
         limit = int(request.args.get("limit", 50))
         page = int(request.args.get("page", 1))
         search = request.args.get("q", "").strip() or None
-        sort_by = request.args.get("sort", "visit_date")
+        sort_by = request.args.get("sort") or ("relevance" if search else "visit_date")
         direction = request.args.get("direction", "desc").lower()
 
-        filters = {
-            'encounter_id': _value_or_none(request.args.get('encounter_id')),
-            'patient_id': _value_or_none(request.args.get('patient_id')),
-            'provider_id': _value_or_none(request.args.get('provider_id')),
-            'patient_name': _value_or_none(request.args.get('patient_name')),
-            'provider_name': _value_or_none(request.args.get('provider_name')),
-            'department': _value_or_none(request.args.get('department')),
-            'status': _value_or_none(request.args.get('status')),
-            'visit_from': _value_or_none(request.args.get('visit_from')),
-            'readmitted_flag': _bool_from_request(request.args.get('readmitted_flag'))
-        }
+        filters = _list_filters()
 
         result = EncountersModel.get_all(
             limit=limit,
@@ -51,9 +62,77 @@ def list_encounters():
             search=search,
             filters=filters,
             sort_by=sort_by,
-            sort_dir=direction
+            sort_dir=direction,
+            after=request.args.get("after") or None,
+            count=(request.args.get("count") or "exact").lower(),
+            fields=parse_fields(request.args.get("fields"))
         )
         return jsonify(result)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.post("/batch")
+def get_encounters_batch():
+    """Get many encounters by ID from a JSON body {"ids": [...]}, for lists too long for ?ids=."""
+    try:
+        ids = parse_ids((request.get_json(silent=True) or {}).get("ids"))
+        if ids is None:
+            raise ValueError("ids is required")
+        return jsonify(batch_result(ids, EncountersModel.get_by_ids(ids)))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.get("/export")
+def export_encounters():
+    """Stream every encounter matching the list filters as CSV or NDJSON (format=csv|ndjson)."""
+    try:
+        fmt = streaming.parse_format(request.args.get("format"))
+        search = request.args.get("q", "").strip() or None
+        sort_by = request.args.get("sort") or ("relevance" if search else "visit_date")
+        direction = request.args.get("direction", "desc").lower()
+
+        export = EncountersModel.export(
+            search=search,
+            filters=_list_filters(),
+            sort_by=sort_by,
+            sort_dir=direction,
+            fields=parse_fields(request.args.get("fields"))
+        )
+        return streaming.response(export, fmt, "encounters")
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.get("/export/columnar")
+def export_encounters_columnar():
+    """
+    Stream the encounters table as an Arrow IPC stream or a Parquet file (format=arrow|parquet),
+    optionally limited by visit date (date_from, date_to).
+    """
+    try:
+        fmt = columnar.parse_format(request.args.get("format"))
+        export = columnar.ColumnarExport(
+            'encounters',
+            date_from=_value_or_none(request.args.get("date_from")),
+            date_to=_value_or_none(request.args.get("date_to"))
+        )
+        return columnar.response(export, fmt)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Error as e:
         return jsonify({"error": str(e)}), 500
     except Exception as e:
@@ -90,8 +169,9 @@ def create_encounter():
         if 'readmitted_flag' in data:
             data['readmitted_flag'] = bool(data['readmitted_flag'])
 
-        encounter_id = EncountersModel.add(data)
-        encounter = EncountersModel.get_by_id(encounter_id)
+        with transaction():
+            encounter_id = EncountersModel.add(data)
+            encounter = EncountersModel.get_by_id(encounter_id)
         return jsonify(encounter), 201
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -117,11 +197,12 @@ def update_encounter(encounter_id):
         if 'readmitted_flag' in data:
             data['readmitted_flag'] = bool(data['readmitted_flag'])
 
-        success = EncountersModel.update(encounter_id, data)
-        if not success:
-            return jsonify({"error": "Encounter not found or no changes made"}), 404
+        with transaction():
+            success = EncountersModel.update(encounter_id, data)
+            if not success:
+                return jsonify({"error": "Encounter not found or no changes made"}), 404
 
-        encounter = EncountersModel.get_by_id(encounter_id)
+            encounter = EncountersModel.get_by_id(encounter_id)
         return jsonify(encounter)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -147,14 +228,12 @@ def delete_encounter(encounter_id):
 
 @bp.get("/options/patients")
 def get_patients_options():
-    """Get patients for dropdown options with optional search using SQL LIKE."""
+    """Get patients for dropdown options, answered from the in-memory typeahead index."""
     try:
         search = request.args.get("search", "").strip() or None
         limit = int(request.args.get("limit", 50))
         
-        result = PatientsModel.get_all(limit=limit, page=1, search=search)
-        # Handle both old format (array) and new format (object)
-        patients = result if isinstance(result, list) else (result.get('data', []) if isinstance(result, dict) else [])
+        patients = typeahead.patients.search(search, limit)
         return jsonify(patients)
     except Error as e:
         return jsonify({"error": str(e)}), 500
@@ -164,12 +243,12 @@ def get_patients_options():
 
 @bp.get("/options/providers")
 def get_providers_options():
-    """Get providers for dropdown options with optional search using SQL LIKE."""
+    """Get providers for dropdown options, answered from the in-memory typeahead index."""
     try:
         search = request.args.get("search", "").strip() or None
         limit = int(request.args.get("limit", 50))
         
-        providers = ProvidersModel.get_all_simple(limit=limit, search=search)
+        providers = typeahead.providers.search(search, limit)
         return jsonify(providers)
     except Error as e:
         return jsonify({"error": str(e)}), 500
@@ -189,73 +268,59 @@ def get_departments_options():
         return jsonify({"error": str(e)}), 500
 
 
+# Sections of /<encounter_id>/related, each filtered by encounter_id
+RELATED_QUERIES = {
+    "medications": """
+        SELECT m.*, p.name as prescriber_name
+        FROM medications m
+        LEFT JOIN providers p ON m.prescriber_id = p.provider_id
+        WHERE m.encounter_id = %s
+        ORDER BY m.prescribed_date DESC
+    """,
+    "procedures": """
+        SELECT pr.*, p.name as provider_name
+        FROM procedures pr
+        LEFT JOIN providers p ON pr.provider_id = p.provider_id
+        WHERE pr.encounter_id = %s
+        ORDER BY pr.procedure_date DESC
+    """,
+    "diagnoses": """
+        SELECT *
+        FROM diagnoses
+        WHERE encounter_id = %s
+        ORDER BY primary_flag DESC, diagnosis_id
+    """,
+    "lab_tests": """
+        SELECT *
+        FROM lab_tests
+        WHERE encounter_id = %s
+        ORDER BY test_date DESC
+    """,
+    "claims": """
+        SELECT cb.*, p.first_name, p.last_name
+        FROM claims_and_billing cb
+        LEFT JOIN patients p ON cb.patient_id = p.patient_id
+        WHERE cb.encounter_id = %s
+        ORDER BY cb.claim_billing_date DESC
+    """,
+}
+
+
 @bp.get("/<encounter_id>/related")
 def get_encounter_related(encounter_id):
-    """Get all related data for an encounter: medications, procedures, diagnoses, lab_tests, claims."""
+    """
+    Get related data for an encounter: medications, procedures, diagnoses, lab_tests, claims.
+    `include=medications,claims` limits the response to those sections; the
+    selected sections are fetched concurrently.
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        related_data = {
-            "medications": [],
-            "procedures": [],
-            "diagnoses": [],
-            "lab_tests": [],
-            "claims": []
-        }
-        
-        # Get medications
-        cursor.execute("""
-            SELECT m.*, p.name as prescriber_name
-            FROM medications m
-            LEFT JOIN providers p ON m.prescriber_id = p.provider_id
-            WHERE m.encounter_id = %s
-            ORDER BY m.prescribed_date DESC
-        """, (encounter_id,))
-        related_data["medications"] = cursor.fetchall()
-        
-        # Get procedures
-        cursor.execute("""
-            SELECT pr.*, p.name as provider_name
-            FROM procedures pr
-            LEFT JOIN providers p ON pr.provider_id = p.provider_id
-            WHERE pr.encounter_id = %s
-            ORDER BY pr.procedure_date DESC
-        """, (encounter_id,))
-        related_data["procedures"] = cursor.fetchall()
-        
-        # Get diagnoses
-        cursor.execute("""
-            SELECT *
-            FROM diagnoses
-            WHERE encounter_id = %s
-            ORDER BY primary_flag DESC, diagnosis_id
-        """, (encounter_id,))
-        related_data["diagnoses"] = cursor.fetchall()
-        
-        # Get lab_tests
-        cursor.execute("""
-            SELECT *
-            FROM lab_tests
-            WHERE encounter_id = %s
-            ORDER BY test_date DESC
-        """, (encounter_id,))
-        related_data["lab_tests"] = cursor.fetchall()
-        
-        # Get claims
-        cursor.execute("""
-            SELECT cb.*, p.first_name, p.last_name
-            FROM claims_and_billing cb
-            LEFT JOIN patients p ON cb.patient_id = p.patient_id
-            WHERE cb.encounter_id = %s
-            ORDER BY cb.claim_billing_date DESC
-        """, (encounter_id,))
-        related_data["claims"] = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
+        sections = fanout.parse_include(request.args.get("include"), list(RELATED_QUERIES))
+        related_data = fanout.fetch_all({
+            name: (RELATED_QUERIES[name], (encounter_id,)) for name in sections
+        })
         return jsonify(related_data)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Error as e:
         return jsonify({"error": str(e)}), 500
     except Exception as e:
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 from ..models import InsurersModel
+from ..db import transaction
+from ..query import parse_fields, parse_ids, batch_result
 from mysql.connector import Error
 
 bp = Blueprint("insurers", __name__)
@@ -11,13 +13,17 @@ def _value_or_none(value):
 
 @bp.get("/")
 def list_insurers():
-    """Get all insurers with optional search, filters, sorting, and pagination."""
+    """Get all insurers with optional search, filters, sorting, and pagination, or a batch of them by ID (ids=A,B,C)."""
     try:
+        ids = parse_ids(request.args.get("ids"), cast=int)
+        if ids is not None:
+            return jsonify(batch_result(ids, InsurersModel.get_by_ids(ids)))
+
         limit = int(request.args.get("limit", 50))
         page = int(request.args.get("page", 1))
         search = request.args.get("q", "").strip() or None
-        sort_by = request.args.get("sort", "name")
-        direction = request.args.get("direction", "asc").lower()
+        sort_by = request.args.get("sort") or ("relevance" if search else "name")
+        direction = request.args.get("direction", "desc" if sort_by == "relevance" else "asc").lower()
 
         filters = {
             'code': _value_or_none(request.args.get('code')),
@@ -31,9 +37,30 @@ def list_insurers():
             search=search,
             filters=filters,
             sort_by=sort_by,
-            sort_dir=direction
+            sort_dir=direction,
+            after=request.args.get("after") or None,
+            count=(request.args.get("count") or "exact").lower(),
+            fields=parse_fields(request.args.get("fields"))
         )
         return jsonify(result)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.post("/batch")
+def get_insurers_batch():
+    """Get many insurers by ID from a JSON body {"ids": [...]}, for lists too long for ?ids=."""
+    try:
+        ids = parse_ids((request.get_json(silent=True) or {}).get("ids"), cast=int)
+        if ids is None:
+            raise ValueError("ids is required")
+        return jsonify(batch_result(ids, InsurersModel.get_by_ids(ids)))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Error as e:
         return jsonify({"error": str(e)}), 500
     except Exception as e:
@@ -65,8 +92,9 @@ def create_insurer():
             if value == "" and key not in required_fields:
                 data[key] = None
 
-        insurer_id = InsurersModel.add(data)
-        insurer = InsurersModel.get_by_id(insurer_id)
+        with transaction():
+            insurer_id = InsurersModel.add(data)
+            insurer = InsurersModel.get_by_id(insurer_id)
         return jsonify(insurer), 201
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -87,11 +115,12 @@ def update_insurer(insurer_id):
             if value == "" and key not in required_fields:
                 data[key] = None
 
-        success = InsurersModel.update(insurer_id, data)
-        if not success:
-            return jsonify({"error": "Insurer not found or no changes made"}), 404
+        with transaction():
+            success = InsurersModel.update(insurer_id, data)
+            if not success:
+                return jsonify({"error": "Insurer not found or no changes made"}), 404
 
-        insurer = InsurersModel.get_by_id(insurer_id)
+            insurer = InsurersModel.get_by_id(insurer_id)
         return jsonify(insurer)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from ..models import LabTestsModel, EncountersModel
+from ..db import transaction
+from .. import streaming, bulk
+from ..query import parse_fields, parse_ids, batch_result
 from mysql.connector import Error
 
 bp = Blueprint("lab_tests", __name__, url_prefix="/api/lab-tests")
@@ -9,26 +12,35 @@ def _value_or_none(value):
     return value.strip() if value and value.strip() else None
 
 
+def _list_filters():
+    """Filters of the list and export endpoints, from the query string."""
+    return {
+        'test_id': _value_or_none(request.args.get('test_id')),
+        'encounter_id': _value_or_none(request.args.get('encounter_id')),
+        'test_code': _value_or_none(request.args.get('test_code')),
+        'lab_id': _value_or_none(request.args.get('lab_id')),
+        'test_date_from': _value_or_none(request.args.get('test_date_from')),
+        'test_date_to': _value_or_none(request.args.get('test_date_to')),
+        'status': _value_or_none(request.args.get('status')),
+        'specimen_type': _value_or_none(request.args.get('specimen_type')),
+    }
+
+
 @bp.get("/")
 def list_lab_tests():
-    """Get all lab tests with optional search, filters, sorting, and pagination."""
+    """Get all lab tests with optional search, filters, sorting, and pagination, or a batch of them by ID (ids=A,B,C)."""
     try:
+        ids = parse_ids(request.args.get("ids"))
+        if ids is not None:
+            return jsonify(batch_result(ids, LabTestsModel.get_by_ids(ids)))
+
         limit = int(request.args.get("limit", 50))
         page = int(request.args.get("page", 1))
         search = request.args.get("q", "").strip() or None
-        sort_by = request.args.get("sort", "test_date")
+        sort_by = request.args.get("sort") or ("relevance" if search else "test_date")
         direction = request.args.get("direction", "desc").lower()
 
-        filters = {
-            'test_id': _value_or_none(request.args.get('test_id')),
-            'encounter_id': _value_or_none(request.args.get('encounter_id')),
-            'test_code': _value_or_none(request.args.get('test_code')),
-            'lab_id': _value_or_none(request.args.get('lab_id')),
-            'test_date_from': _value_or_none(request.args.get('test_date_from')),
-            'test_date_to': _value_or_none(request.args.get('test_date_to')),
-            'status': _value_or_none(request.args.get('status')),
-            'specimen_type': _value_or_none(request.args.get('specimen_type')),
-        }
+        filters = _list_filters()
 
         result = LabTestsModel.get_all(
             limit=limit,
@@ -36,9 +48,14 @@ def list_lab_tests():
             search=search,
             filters=filters,
             sort_by=sort_by,
-            sort_dir=direction
+            sort_dir=direction,
+            after=request.args.get("after") or None,
+            count=(request.args.get("count") or "exact").lower(),
+            fields=parse_fields(request.args.get("fields"))
         )
         return jsonify(result)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Error as e:
         import traceback
         print(f"Lab Tests API MySQL Error: {str(e)}")
@@ -51,6 +68,47 @@ def list_lab_tests():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.post("/batch")
+def get_lab_tests_batch():
+    """Get many lab tests by ID from a JSON body {"ids": [...]}, for lists too long for ?ids=."""
+    try:
+        ids = parse_ids((request.get_json(silent=True) or {}).get("ids"))
+        if ids is None:
+            raise ValueError("ids is required")
+        return jsonify(batch_result(ids, LabTestsModel.get_by_ids(ids)))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.get("/export")
+def export_lab_tests():
+    """Stream every lab test matching the list filters as CSV or NDJSON (format=csv|ndjson)."""
+    try:
+        fmt = streaming.parse_format(request.args.get("format"))
+        search = request.args.get("q", "").strip() or None
+        sort_by = request.args.get("sort") or ("relevance" if search else "test_date")
+        direction = request.args.get("direction", "desc").lower()
+
+        export = LabTestsModel.export(
+            search=search,
+            filters=_list_filters(),
+            sort_by=sort_by,
+            sort_dir=direction,
+            fields=parse_fields(request.args.get("fields"))
+        )
+        return streaming.response(export, fmt, "lab-tests")
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.get("/<test_id>")
 def get_lab_test(test_id):
     """Get a single lab test by ID."""
@@ -82,8 +140,9 @@ def create_lab_test():
         if 'normal_range' not in data or not data['normal_range']:
             data['normal_range'] = 'N/A'
 
-        test_id = LabTestsModel.add(data)
-        lab_test = LabTestsModel.get_by_id(test_id)
+        with transaction():
+            test_id = LabTestsModel.add(data)
+            lab_test = LabTestsModel.get_by_id(test_id)
         return jsonify(lab_test), 201
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -93,6 +152,30 @@ def create_lab_test():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.post("/bulk")
+def create_lab_tests_bulk():
+    """Create many lab tests in one transaction from a JSON array (or {"records": [...]})."""
+    try:
+        records = bulk.parse_records(request.get_json(silent=True))
+        # Clean up data - convert empty strings to None
+        required_fields = ['encounter_id', 'test_code', 'test_name', 'test_date', 'status']
+        for record in records:
+            if isinstance(record, dict):
+                for key, value in record.items():
+                    if value == "" and key not in required_fields:
+                        record[key] = None
+
+        with transaction():
+            ids = LabTestsModel.add_many(records)
+        return jsonify({"created": len(ids), "ids": ids}), 201
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.put("/<test_id>")
 def update_lab_test(test_id):
     """Update an existing lab test."""
@@ -110,11 +193,12 @@ def update_lab_test(test_id):
         if 'normal_range' in data and data['normal_range'] == "":
             data['normal_range'] = 'N/A'
 
-        success = LabTestsModel.update(test_id, data)
-        if not success:
-            return jsonify({"error": "Lab test not found or no changes made"}), 404
+        with transaction():
+            success = LabTestsModel.update(test_id, data)
+            if not success:
+                return jsonify({"error": "Lab test not found or no changes made"}), 404
 
-        lab_test = LabTestsModel.get_by_id(test_id)
+            lab_test = LabTestsModel.get_by_id(test_id)
         return jsonify(lab_test)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -140,13 +224,12 @@ def delete_lab_test(test_id):
 
 @bp.get("/options/encounters")
 def get_encounters_options():
-    """Get encounters for dropdown options with optional search using SQL LIKE."""
+    """Get the most recent encounters for dropdown options, matching an encounter ID prefix or patient name."""
     try:
         search = request.args.get("search", "").strip() or None
         limit = int(request.args.get("limit", 50))
         
-        result = EncountersModel.get_all(limit=limit, page=1, search=search)
-        encounters = result.get('data', []) if isinstance(result, dict) else []
+        encounters = EncountersModel.lookup(search=search, limit=limit)
         return jsonify(encounters)
     except Error as e:
         return jsonify({"error": str(e)}), 500
@@ -154,6 +237,21 @@ def get_encounters_options():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.get("/options")
+def get_options():
+    """Get all lab test form vocabularies in one response; revalidated by ETag."""
+    try:
+        options, etag = LabTestsModel.get_options()
+        response = jsonify(options)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.get("/options/test-codes")
 def get_test_codes():
     """Get all distinct test codes with test names."""
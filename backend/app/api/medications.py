@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
-from ..models import MedicationsModel, EncountersModel, ProvidersModel
+from ..models import MedicationsModel, EncountersModel
+from ..db import transaction
+from .. import typeahead, streaming, bulk
+from ..query import parse_fields, parse_ids, batch_result
 from mysql.connector import Error
 
 bp = Blueprint("medications", __name__, url_prefix="/api/medications")
@@ -16,26 +19,35 @@ def _safe_float(value):
         return None
 
 
+def _list_filters():
+    """Filters of the list and export endpoints, from the query string."""
+    return {
+        'medication_id': _value_or_none(request.args.get('medication_id')),
+        'encounter_id': _value_or_none(request.args.get('encounter_id')),
+        'drug_name': _value_or_none(request.args.get('drug_name')),
+        'prescriber_id': _value_or_none(request.args.get('prescriber_id')),
+        'prescribed_date_from': _value_or_none(request.args.get('prescribed_date_from')),
+        'prescribed_date_to': _value_or_none(request.args.get('prescribed_date_to')),
+        'cost_min': _safe_float(request.args.get('cost_min')),
+        'cost_max': _safe_float(request.args.get('cost_max')),
+    }
+
+
 @bp.get("/")
 def list_medications():
-    """Get all medications with optional search, filters, sorting, and pagination."""
+    """Get all medications with optional search, filters, sorting, and pagination, or a batch of them by ID (ids=A,B,C)."""
     try:
+        ids = parse_ids(request.args.get("ids"))
+        if ids is not None:
+            return jsonify(batch_result(ids, MedicationsModel.get_by_ids(ids)))
+
         limit = int(request.args.get("limit", 50))
         page = int(request.args.get("page", 1))
         search = request.args.get("q", "").strip() or None
-        sort_by = request.args.get("sort", "prescribed_date")
+        sort_by = request.args.get("sort") or ("relevance" if search else "prescribed_date")
         direction = request.args.get("direction", "desc").lower()
 
-        filters = {
-            'medication_id': _value_or_none(request.args.get('medication_id')),
-            'encounter_id': _value_or_none(request.args.get('encounter_id')),
-            'drug_name': _value_or_none(request.args.get('drug_name')),
-            'prescriber_id': _value_or_none(request.args.get('prescriber_id')),
-            'prescribed_date_from': _value_or_none(request.args.get('prescribed_date_from')),
-            'prescribed_date_to': _value_or_none(request.args.get('prescribed_date_to')),
-            'cost_min': _safe_float(request.args.get('cost_min')),
-            'cost_max': _safe_float(request.args.get('cost_max')),
-        }
+        filters = _list_filters()
 
         result = MedicationsModel.get_all(
             limit=limit,
@@ -43,9 +55,14 @@ def list_medications():
             search=search,
             filters=filters,
             sort_by=sort_by,
-            sort_dir=direction
+            sort_dir=direction,
+            after=request.args.get("after") or None,
+            count=(request.args.get("count") or "exact").lower(),
+            fields=parse_fields(request.args.get("fields"))
         )
         return jsonify(result)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Error as e:
         import traceback
         print(f"Medications API MySQL Error: {str(e)}")
@@ -58,6 +75,47 @@ def list_medications():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.post("/batch")
+def get_medications_batch():
+    """Get many medications by ID from a JSON body {"ids": [...]}, for lists too long for ?ids=."""
+    try:
+        ids = parse_ids((request.get_json(silent=True) or {}).get("ids"))
+        if ids is None:
+            raise ValueError("ids is required")
+        return jsonify(batch_result(ids, MedicationsModel.get_by_ids(ids)))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.get("/export")
+def export_medications():
+    """Stream every medication matching the list filters as CSV or NDJSON (format=csv|ndjson)."""
+    try:
+        fmt = streaming.parse_format(request.args.get("format"))
+        search = request.args.get("q", "").strip() or None
+        sort_by = request.args.get("sort") or ("relevance" if search else "prescribed_date")
+        direction = request.args.get("direction", "desc").lower()
+
+        export = MedicationsModel.export(
+            search=search,
+            filters=_list_filters(),
+            sort_by=sort_by,
+            sort_dir=direction,
+            fields=parse_fields(request.args.get("fields"))
+        )
+        return streaming.response(export, fmt, "medications")
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.get("/<medication_id>")
 def get_medication(medication_id):
     """Get a single medication by ID."""
@@ -90,8 +148,9 @@ def create_medication():
             except:
                 data['cost'] = 0.0
 
-        medication_id = MedicationsModel.add(data)
-        medication = MedicationsModel.get_by_id(medication_id)
+        with transaction():
+            medication_id = MedicationsModel.add(data)
+            medication = MedicationsModel.get_by_id(medication_id)
         return jsonify(medication), 201
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -101,6 +160,30 @@ def create_medication():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.post("/bulk")
+def create_medications_bulk():
+    """Create many medications in one transaction from a JSON array (or {"records": [...]})."""
+    try:
+        records = bulk.parse_records(request.get_json(silent=True))
+        # Clean up data - convert empty strings to None
+        required_fields = ['encounter_id', 'drug_name', 'prescribed_date', 'prescriber_id']
+        for record in records:
+            if isinstance(record, dict):
+                for key, value in record.items():
+                    if value == "" and key not in required_fields:
+                        record[key] = None
+
+        with transaction():
+            ids = MedicationsModel.add_many(records)
+        return jsonify({"created": len(ids), "ids": ids}), 201
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.put("/<medication_id>")
 def update_medication(medication_id):
     """Update an existing medication."""
@@ -119,11 +202,12 @@ def update_medication(medication_id):
             except:
                 pass
 
-        success = MedicationsModel.update(medication_id, data)
-        if not success:
-            return jsonify({"error": "Medication not found or no changes made"}), 404
+        with transaction():
+            success = MedicationsModel.update(medication_id, data)
+            if not success:
+                return jsonify({"error": "Medication not found or no changes made"}), 404
 
-        medication = MedicationsModel.get_by_id(medication_id)
+            medication = MedicationsModel.get_by_id(medication_id)
         return jsonify(medication)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -149,13 +233,12 @@ def delete_medication(medication_id):
 
 @bp.get("/options/encounters")
 def get_encounters_options():
-    """Get encounters for dropdown options with optional search using SQL LIKE."""
+    """Get the most recent encounters for dropdown options, matching an encounter ID prefix or patient name."""
     try:
         search = request.args.get("search", "").strip() or None
         limit = int(request.args.get("limit", 50))
         
-        result = EncountersModel.get_all(limit=limit, page=1, search=search)
-        encounters = result.get('data', []) if isinstance(result, dict) else []
+        encounters = EncountersModel.lookup(search=search, limit=limit)
         return jsonify(encounters)
     except Error as e:
         return jsonify({"error": str(e)}), 500
@@ -165,12 +248,12 @@ def get_encounters_options():
 
 @bp.get("/options/prescribers")
 def get_prescribers_options():
-    """Get providers (prescribers) for dropdown options with optional search using SQL LIKE."""
+    """Get providers (prescribers) for dropdown options, answered from the in-memory typeahead index."""
     try:
         search = request.args.get("search", "").strip() or None
         limit = int(request.args.get("limit", 50))
         
-        providers = ProvidersModel.get_all_simple(limit=limit, search=search)
+        providers = typeahead.providers.search(search, limit)
         return jsonify(providers)
     except Error as e:
         return jsonify({"error": str(e)}), 500
@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from ..models import PatientsModel, InsurersModel
+from ..db import transaction
+from .. import streaming, fanout
+from ..query import parse_fields, parse_ids, batch_result
 from mysql.connector import Error
 
 bp = Blueprint("patients", __name__)
@@ -16,26 +19,35 @@ def _value_or_none(value):
     return value.strip() if value and value.strip() else None
 
 
+def _list_filters():
+    """Filters of the list and export endpoints, from the query string."""
+    return {
+        'patient_id': _value_or_none(request.args.get('patient_id')),
+        'first_name': _value_or_none(request.args.get('first_name')),
+        'last_name': _value_or_none(request.args.get('last_name')),
+        'gender': _value_or_none(request.args.get('gender')),
+        'insurance_type': _value_or_none(request.args.get('insurance_type')),
+        'age_exact': _safe_int(request.args.get('age')),
+        'registration_from': _value_or_none(request.args.get('registration_from')),
+        'city': _value_or_none(request.args.get('city'))
+    }
+
+
 @bp.get("/")
 def list_patients():
-    """Get all patients with optional search, filters, sorting, and pagination."""
+    """Get all patients with optional search, filters, sorting, and pagination, or a batch of them by ID (ids=A,B,C)."""
     try:
+        ids = parse_ids(request.args.get("ids"))
+        if ids is not None:
+            return jsonify(batch_result(ids, PatientsModel.get_by_ids(ids)))
+
         limit = int(request.args.get("limit", 50))
         page = int(request.args.get("page", 1))
         search = request.args.get("q", "").strip() or None
-        sort_by = request.args.get("sort", "registration_date")
+        sort_by = request.args.get("sort") or ("relevance" if search else "registration_date")
         direction = request.args.get("direction", "desc").lower()
 
-        filters = {
-            'patient_id': _value_or_none(request.args.get('patient_id')),
-            'first_name': _value_or_none(request.args.get('first_name')),
-            'last_name': _value_or_none(request.args.get('last_name')),
-            'gender': _value_or_none(request.args.get('gender')),
-            'insurance_type': _value_or_none(request.args.get('insurance_type')),
-            'age_exact': _safe_int(request.args.get('age')),
-            'registration_from': _value_or_none(request.args.get('registration_from')),
-            'city': _value_or_none(request.args.get('city'))
-        }
+        filters = _list_filters()
 
         result = PatientsModel.get_all(
             limit=limit,
@@ -43,9 +55,55 @@ def list_patients():
             search=search,
             filters=filters,
             sort_by=sort_by,
-            sort_dir=direction
+            sort_dir=direction,
+            after=request.args.get("after") or None,
+            count=(request.args.get("count") or "exact").lower(),
+            fields=parse_fields(request.args.get("fields"))
         )
         return jsonify(result)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.post("/batch")
+def get_patients_batch():
+    """Get many patients by ID from a JSON body {"ids": [...]}, for lists too long for ?ids=."""
+    try:
+        ids = parse_ids((request.get_json(silent=True) or {}).get("ids"))
+        if ids is None:
+            raise ValueError("ids is required")
+        return jsonify(batch_result(ids, PatientsModel.get_by_ids(ids)))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.get("/export")
+def export_patients():
+    """Stream every patient matching the list filters as CSV or NDJSON (format=csv|ndjson)."""
+    try:
+        fmt = streaming.parse_format(request.args.get("format"))
+        search = request.args.get("q", "").strip() or None
+        sort_by = request.args.get("sort") or ("relevance" if search else "registration_date")
+        direction = request.args.get("direction", "desc").lower()
+
+        export = PatientsModel.export(
+            search=search,
+            filters=_list_filters(),
+            sort_by=sort_by,
+            sort_dir=direction,
+            fields=parse_fields(request.args.get("fields"))
+        )
+        return streaming.response(export, fmt, "patients")
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Error as e:
         return jsonify({"error": str(e)}), 500
     except Exception as e:
@@ -66,6 +124,110 @@ def get_patient(patient_id):
         return jsonify({"error": str(e)}), 500
 
 
+# Sections of /<patient_id>/summary. Each is read through an index on the
+# patient: encounters (patient_id, visit_date), claims patient_id, and the
+# encounter_id keys of the line-item tables. Lists take `LIMIT %s`.
+SUMMARY_QUERIES = {
+    "insurer": """
+        SELECT i.*
+        FROM patients p
+        JOIN insurers i ON p.insurance_type = i.code
+        WHERE p.patient_id = %s
+    """,
+    "encounters": """
+        SELECT e.*, pr.name as provider_name
+        FROM encounters e
+        LEFT JOIN providers pr ON e.provider_id = pr.provider_id
+        WHERE e.patient_id = %s
+        ORDER BY e.visit_date DESC, e.encounter_id DESC
+        LIMIT %s
+    """,
+    "diagnoses": """
+        SELECT d.*, e.visit_date
+        FROM encounters e
+        JOIN diagnoses d ON d.encounter_id = e.encounter_id
+        WHERE e.patient_id = %s
+        ORDER BY e.visit_date DESC, d.primary_flag DESC, d.diagnosis_id
+        LIMIT %s
+    """,
+    # The schema has no end date for prescriptions; the latest ones stand in for the active list
+    "medications": """
+        SELECT m.*, pr.name as prescriber_name
+        FROM encounters e
+        JOIN medications m ON m.encounter_id = e.encounter_id
+        LEFT JOIN providers pr ON m.prescriber_id = pr.provider_id
+        WHERE e.patient_id = %s
+        ORDER BY m.prescribed_date DESC, m.medication_id DESC
+        LIMIT %s
+    """,
+    "lab_tests": """
+        SELECT lt.*
+        FROM encounters e
+        JOIN lab_tests lt ON lt.encounter_id = e.encounter_id
+        WHERE e.patient_id = %s
+        ORDER BY lt.test_date DESC, lt.test_id DESC
+        LIMIT %s
+    """,
+    "claims": """
+        SELECT COUNT(*) as claim_count,
+               COALESCE(SUM(billed_amount), 0) as total_billed,
+               COALESCE(SUM(paid_amount), 0) as total_paid,
+               COALESCE(SUM(billed_amount - COALESCE(paid_amount, 0)), 0) as balance,
+               COALESCE(SUM(claim_status = 'Denied'), 0) as denied_count,
+               MAX(claim_billing_date) as last_billed
+        FROM claims_and_billing
+        WHERE patient_id = %s
+    """,
+}
+
+# Default rows per list section; `<section>_limit=N` overrides up to MAX_SUMMARY_LIMIT
+SUMMARY_LIMITS = {"encounters": 50, "diagnoses": 10, "medications": 10, "lab_tests": 10}
+MAX_SUMMARY_LIMIT = 200
+
+
+def _summary_limit(name):
+    value = request.args.get(f"{name}_limit")
+    if value is None:
+        return SUMMARY_LIMITS[name]
+    limit = _safe_int(value)
+    if limit is None or limit < 1:
+        raise ValueError(f"{name}_limit must be a positive integer")
+    return min(limit, MAX_SUMMARY_LIMIT)
+
+
+@bp.get("/<patient_id>/summary")
+def get_patient_summary(patient_id):
+    """
+    Everything the patient chart shows, in one request: demographics, insurer,
+    encounters, latest diagnoses, medications, recent lab tests and the claims
+    balance. `include=encounters,claims` limits the sections; they are fetched
+    concurrently along with the patient row.
+    """
+    try:
+        sections = fanout.parse_include(request.args.get("include"), list(SUMMARY_QUERIES))
+        limits = {name: _summary_limit(name) for name in sections if name in SUMMARY_LIMITS}
+        queries = {"patient": (f"{PatientsModel.ROW_QUERY} WHERE p.patient_id = %s", (patient_id,))}
+        for name in sections:
+            params = (patient_id, limits[name]) if name in limits else (patient_id,)
+            queries[name] = (SUMMARY_QUERIES[name], params)
+        results = fanout.fetch_all(queries)
+
+        if not results["patient"]:
+            return jsonify({"error": "Patient not found"}), 404
+        summary = {"patient": results.pop("patient")[0]}
+        for name, rows in results.items():
+            # insurer and claims are single rows, the rest lists
+            summary[name] = rows if name in SUMMARY_LIMITS else (rows[0] if rows else None)
+        summary["limits"] = limits
+        return jsonify(summary)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.post("/")
 def create_patient():
     """Create a new patient."""
@@ -78,8 +240,9 @@ def create_patient():
             if value == "" and key not in required_fields:
                 data[key] = None
 
-        patient_id = PatientsModel.add(data)
-        patient = PatientsModel.get_by_id(patient_id)
+        with transaction():
+            patient_id = PatientsModel.add(data)
+            patient = PatientsModel.get_by_id(patient_id)
         return jsonify(patient), 201
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -105,11 +268,12 @@ def update_patient(patient_id):
             if value == "" and key not in required_fields:
                 data[key] = None
 
-        success = PatientsModel.update(patient_id, data)
-        if not success:
-            return jsonify({"error": "Patient not found or no changes made"}), 404
+        with transaction():
+            success = PatientsModel.update(patient_id, data)
+            if not success:
+                return jsonify({"error": "Patient not found or no changes made"}), 404
 
-        patient = PatientsModel.get_by_id(patient_id)
+            patient = PatientsModel.get_by_id(patient_id)
         return jsonify(patient)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
-from ..models import ProceduresModel, EncountersModel, ProvidersModel
+from ..models import ProceduresModel, EncountersModel
+from ..db import transaction
+from .. import typeahead, streaming, bulk
+from ..query import parse_fields, parse_ids, batch_result
 from mysql.connector import Error
 
 bp = Blueprint("procedures", __name__, url_prefix="/api/procedures")
@@ -16,26 +19,35 @@ def _safe_float(value):
         return None
 
 
+def _list_filters():
+    """Filters of the list and export endpoints, from the query string."""
+    return {
+        'procedure_id': _value_or_none(request.args.get('procedure_id')),
+        'encounter_id': _value_or_none(request.args.get('encounter_id')),
+        'procedure_code': _value_or_none(request.args.get('procedure_code')),
+        'provider_id': _value_or_none(request.args.get('provider_id')),
+        'procedure_date_from': _value_or_none(request.args.get('procedure_date_from')),
+        'procedure_date_to': _value_or_none(request.args.get('procedure_date_to')),
+        'procedure_cost_min': _safe_float(request.args.get('procedure_cost_min')),
+        'procedure_cost_max': _safe_float(request.args.get('procedure_cost_max')),
+    }
+
+
 @bp.get("/")
 def list_procedures():
-    """Get all procedures with optional search, filters, sorting, and pagination."""
+    """Get all procedures with optional search, filters, sorting, and pagination, or a batch of them by ID (ids=A,B,C)."""
     try:
+        ids = parse_ids(request.args.get("ids"))
+        if ids is not None:
+            return jsonify(batch_result(ids, ProceduresModel.get_by_ids(ids)))
+
         limit = int(request.args.get("limit", 50))
         page = int(request.args.get("page", 1))
         search = request.args.get("q", "").strip() or None
-        sort_by = request.args.get("sort", "procedure_date")
+        sort_by = request.args.get("sort") or ("relevance" if search else "procedure_date")
         direction = request.args.get("direction", "desc").lower()
 
-        filters = {
-            'procedure_id': _value_or_none(request.args.get('procedure_id')),
-            'encounter_id': _value_or_none(request.args.get('encounter_id')),
-            'procedure_code': _value_or_none(request.args.get('procedure_code')),
-            'provider_id': _value_or_none(request.args.get('provider_id')),
-            'procedure_date_from': _value_or_none(request.args.get('procedure_date_from')),
-            'procedure_date_to': _value_or_none(request.args.get('procedure_date_to')),
-            'procedure_cost_min': _safe_float(request.args.get('procedure_cost_min')),
-            'procedure_cost_max': _safe_float(request.args.get('procedure_cost_max')),
-        }
+        filters = _list_filters()
 
         result = ProceduresModel.get_all(
             limit=limit,
@@ -43,9 +55,14 @@ def list_procedures():
             search=search,
             filters=filters,
             sort_by=sort_by,
-            sort_dir=direction
+            sort_dir=direction,
+            after=request.args.get("after") or None,
+            count=(request.args.get("count") or "exact").lower(),
+            fields=parse_fields(request.args.get("fields"))
         )
         return jsonify(result)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Error as e:
         import traceback
         print(f"Procedures API MySQL Error: {str(e)}")
@@ -58,6 +75,47 @@ def list_procedures():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.post("/batch")
+def get_procedures_batch():
+    """Get many procedures by ID from a JSON body {"ids": [...]}, for lists too long for ?ids=."""
+    try:
+        ids = parse_ids((request.get_json(silent=True) or {}).get("ids"))
+        if ids is None:
+            raise ValueError("ids is required")
+        return jsonify(batch_result(ids, ProceduresModel.get_by_ids(ids)))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.get("/export")
+def export_procedures():
+    """Stream every procedure matching the list filters as CSV or NDJSON (format=csv|ndjson)."""
+    try:
+        fmt = streaming.parse_format(request.args.get("format"))
+        search = request.args.get("q", "").strip() or None
+        sort_by = request.args.get("sort") or ("relevance" if search else "procedure_date")
+        direction = request.args.get("direction", "desc").lower()
+
+        export = ProceduresModel.export(
+            search=search,
+            filters=_list_filters(),
+            sort_by=sort_by,
+            sort_dir=direction,
+            fields=parse_fields(request.args.get("fields"))
+        )
+        return streaming.response(export, fmt, "procedures")
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.get("/<procedure_id>")
 def get_procedure(procedure_id):
     """Get a single procedure by ID."""
@@ -90,8 +148,9 @@ def create_procedure():
             except:
                 data['procedure_cost'] = 0.0
 
-        procedure_id = ProceduresModel.add(data)
-        procedure = ProceduresModel.get_by_id(procedure_id)
+        with transaction():
+            procedure_id = ProceduresModel.add(data)
+            procedure = ProceduresModel.get_by_id(procedure_id)
         return jsonify(procedure), 201
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -101,6 +160,30 @@ def create_procedure():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.post("/bulk")
+def create_procedures_bulk():
+    """Create many procedures in one transaction from a JSON array (or {"records": [...]})."""
+    try:
+        records = bulk.parse_records(request.get_json(silent=True))
+        # Clean up data - convert empty strings to None
+        required_fields = ['encounter_id', 'procedure_code', 'procedure_date']
+        for record in records:
+            if isinstance(record, dict):
+                for key, value in record.items():
+                    if value == "" and key not in required_fields:
+                        record[key] = None
+
+        with transaction():
+            ids = ProceduresModel.add_many(records)
+        return jsonify({"created": len(ids), "ids": ids}), 201
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.put("/<procedure_id>")
 def update_procedure(procedure_id):
     """Update an existing procedure."""
@@ -119,11 +202,12 @@ def update_procedure(procedure_id):
             except:
                 pass
 
-        success = ProceduresModel.update(procedure_id, data)
-        if not success:
-            return jsonify({"error": "Procedure not found or no changes made"}), 404
+        with transaction():
+            success = ProceduresModel.update(procedure_id, data)
+            if not success:
+                return jsonify({"error": "Procedure not found or no changes made"}), 404
 
-        procedure = ProceduresModel.get_by_id(procedure_id)
+            procedure = ProceduresModel.get_by_id(procedure_id)
         return jsonify(procedure)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -149,13 +233,12 @@ def delete_procedure(procedure_id):
 
 @bp.get("/options/encounters")
 def get_encounters_options():
-    """Get encounters for dropdown options with optional search using SQL LIKE."""
+    """Get the most recent encounters for dropdown options, matching an encounter ID prefix or patient name."""
     try:
         search = request.args.get("search", "").strip() or None
         limit = int(request.args.get("limit", 50))
         
-        result = EncountersModel.get_all(limit=limit, page=1, search=search)
-        encounters = result.get('data', []) if isinstance(result, dict) else []
+        encounters = EncountersModel.lookup(search=search, limit=limit)
         return jsonify(encounters)
     except Error as e:
         return jsonify({"error": str(e)}), 500
@@ -165,12 +248,12 @@ def get_encounters_options():
 
 @bp.get("/options/providers")
 def get_providers_options():
-    """Get providers for dropdown options with optional search using SQL LIKE."""
+    """Get providers for dropdown options, answered from the in-memory typeahead index."""
     try:
         search = request.args.get("search", "").strip() or None
         limit = int(request.args.get("limit", 50))
         
-        providers = ProvidersModel.get_all_simple(limit=limit, search=search)
+        providers = typeahead.providers.search(search, limit)
         return jsonify(providers)
     except Error as e:
         return jsonify({"error": str(e)}), 500
@@ -178,6 +261,21 @@ def get_providers_options():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.get("/options")
+def get_options():
+    """Get all procedure form vocabularies in one response; revalidated by ETag."""
+    try:
+        options, etag = ProceduresModel.get_options()
+        response = jsonify(options)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.get("/options/procedure-codes")
 def get_procedure_codes():
     """Get all distinct procedure codes."""
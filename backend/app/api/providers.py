@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 from ..models import ProvidersModel, DepartmentHeadsModel
+from ..db import transaction
+from ..query import parse_fields, parse_ids, batch_result
 from mysql.connector import Error
 
 bp = Blueprint("providers", __name__, url_prefix="/api/providers")
@@ -18,13 +20,17 @@ def _safe_int(value):
 
 @bp.get("/")
 def list_providers():
-    """Get all providers with optional search, filters, sorting, and pagination."""
+    """Get all providers with optional search, filters, sorting, and pagination, or a batch of them by ID (ids=A,B,C)."""
     try:
+        ids = parse_ids(request.args.get("ids"))
+        if ids is not None:
+            return jsonify(batch_result(ids, ProvidersModel.get_by_ids(ids)))
+
         limit = int(request.args.get("limit", 50))
         page = int(request.args.get("page", 1))
         search = request.args.get("q", "").strip() or None
-        sort_by = request.args.get("sort", "name")
-        direction = request.args.get("direction", "asc").lower()
+        sort_by = request.args.get("sort") or ("relevance" if search else "name")
+        direction = request.args.get("direction", "desc" if sort_by == "relevance" else "asc").lower()
 
         filters = {
             'provider_id': _value_or_none(request.args.get('provider_id')),
@@ -42,9 +48,14 @@ def list_providers():
             search=search,
             filters=filters,
             sort_by=sort_by,
-            sort_dir=direction
+            sort_dir=direction,
+            after=request.args.get("after") or None,
+            count=(request.args.get("count") or "exact").lower(),
+            fields=parse_fields(request.args.get("fields"))
         )
         return jsonify(result)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Error as e:
         import traceback
         print(f"Providers API MySQL Error: {str(e)}")
@@ -57,6 +68,22 @@ def list_providers():
         return jsonify({"error": str(e)}), 500
 
 
+@bp.post("/batch")
+def get_providers_batch():
+    """Get many providers by ID from a JSON body {"ids": [...]}, for lists too long for ?ids=."""
+    try:
+        ids = parse_ids((request.get_json(silent=True) or {}).get("ids"))
+        if ids is None:
+            raise ValueError("ids is required")
+        return jsonify(batch_result(ids, ProvidersModel.get_by_ids(ids)))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.get("/<provider_id>")
 def get_provider(provider_id):
     """Get a single provider by ID."""
@@ -99,8 +126,9 @@ def create_provider():
             except:
                 data['head_id'] = None
 
-        provider_id = ProvidersModel.add(data)
-        provider = ProvidersModel.get_by_id(provider_id)
+        with transaction():
+            provider_id = ProvidersModel.add(data)
+            provider = ProvidersModel.get_by_id(provider_id)
         return jsonify(provider), 201
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -137,11 +165,12 @@ def update_provider(provider_id):
             except:
                 data['head_id'] = None
 
-        success = ProvidersModel.update(provider_id, data)
-        if not success:
-            return jsonify({"error": "Provider not found or no changes made"}), 404
+        with transaction():
+            success = ProvidersModel.update(provider_id, data)
+            if not success:
+                return jsonify({"error": "Provider not found or no changes made"}), 404
 
-        provider = ProvidersModel.get_by_id(provider_id)
+            provider = ProvidersModel.get_by_id(provider_id)
         return jsonify(provider)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
@@ -0,0 +1,63 @@
+# Bulk inserts for the /bulk create endpoints
+#
+# A bulk request is validated as a whole before anything is written: every
+# record missing a required field is reported in one error. The rows are then
+# written in one transaction with multi-row INSERT statements of up to
+# INSERT_ROWS rows each, and the IDs the records don't bring along are
+# reserved from the sequences table as one block.
+from . import sequences
+import settings
+
+# Records accepted by one bulk request
+BULK_MAX_RECORDS = getattr(settings, 'BULK_MAX_RECORDS', 5000)
+# Rows per INSERT statement (keeps statements well under max_allowed_packet)
+INSERT_ROWS = 500
+# Per-record problems listed in a validation error before the rest are counted
+MAX_REPORTED_ERRORS = 20
+
+
+def parse_records(payload):
+    """Accept a JSON array of records or {"records": [...]}; raise ValueError for anything else."""
+    records = payload.get('records') if isinstance(payload, dict) else payload
+    if not isinstance(records, list) or not records:
+        raise ValueError("Expected a non-empty JSON array of records (or {\"records\": [...]})")
+    if len(records) > BULK_MAX_RECORDS:
+        raise ValueError(f"Too many records: {len(records)} (at most {BULK_MAX_RECORDS} per request)")
+    return records
+
+
+def validate(records, required):
+    """Check every record for the required NOT NULL fields; raise one ValueError listing the problems."""
+    problems = []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            problems.append(f"record {index}: must be an object")
+            continue
+        missing = [field for field in required if not record.get(field)]
+        if missing:
+            problems.append(f"record {index}: {', '.join(missing)} required (NOT NULL)")
+    if problems:
+        more = len(problems) - MAX_REPORTED_ERRORS
+        listed = '; '.join(problems[:MAX_REPORTED_ERRORS])
+        raise ValueError(f"{len(problems)} invalid record(s): {listed}" + (f"; and {more} more" if more > 0 else ""))
+
+
+def assign_ids(records, table_name, column_name, prefix, padding=6):
+    """IDs for `records` in order: their own where given, the rest reserved as one block."""
+    given = [record.get(column_name) for record in records if record.get(column_name)]
+    # Keep the sequence ahead of the IDs the records bring along
+    sequences.advance(table_name, column_name, prefix, given)
+    count = len(records) - len(given)
+    new_ids = iter(sequences.next_ids(table_name, column_name, prefix, count, padding) if count else [])
+    return [record.get(column_name) or next(new_ids) for record in records]
+
+
+def insert_rows(cursor, table, columns, rows):
+    """INSERT `rows` (tuples in `columns` order) with multi-row statements."""
+    row_sql = f"({', '.join(['%s'] * len(columns))})"
+    for start in range(0, len(rows), INSERT_ROWS):
+        chunk = rows[start:start + INSERT_ROWS]
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([row_sql] * len(chunk))}",
+            [value for row in chunk for value in row]
+        )
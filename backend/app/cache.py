@@ -0,0 +1,439 @@
+# Cache for single-entity reads (get_by_id) and other short-lived results
+#
+# Entries are keyed by (entity, id), expire after CACHE_TTL seconds and are
+# evicted least-recently-used beyond CACHE_MAX_ENTRIES. Each entry can name the
+# rows it embeds data from (e.g. an encounter embeds its patient's and
+# provider's names); invalidating one of those rows drops the entry too.
+#
+# CACHE_BACKEND selects where entries live:
+#   local - in this process only (default; right for a single worker)
+#   redis - shared by all workers through a Redis-protocol server at REDIS_URL.
+#           Each worker keeps a small local copy in front of it, and
+#           invalidations are published so every worker drops them at once.
+#
+# Inside a unit of work (db.transaction()) reads bypass the cache, since they
+# can see uncommitted writes, and invalidations wait until the unit commits.
+import base64
+import copy
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import settings
+from .db import after_commit, in_transaction
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+CACHE_BACKEND = getattr(settings, 'CACHE_BACKEND', 'local')
+CACHE_MAX_ENTRIES = getattr(settings, 'CACHE_MAX_ENTRIES', 5000)
+CACHE_TTL = getattr(settings, 'CACHE_TTL', 300)
+REDIS_URL = getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0')
+CACHE_PREFIX = getattr(settings, 'CACHE_PREFIX', 'medico')
+
+# Dependency on every row of an entity, for entries that embed data from a
+# row they don't carry the key of (e.g. claims show the insurer's name)
+ANY = '*'
+
+# RedisCache.generation() when the server can't be read. It never equals a real
+# generation, so set() stores nothing for a read it can't guard.
+GENERATION_UNKNOWN = -1
+
+
+class EntityCache:
+    """In-process LRU + TTL cache of entity rows with dependency-based invalidation and hit/miss counters."""
+
+    name = 'local'
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self._entries = OrderedDict()   # (entity, key) -> (expires_at, value, depends)
+        self._dependents = {}           # (entity, key or ANY) -> {(entity, key), ...}
+        self._lock = threading.Lock()
+        # Bumped on every invalidation; a read that started before it doesn't store its result
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(entity, key):
+        return (entity, str(key))
+
+    def _unlink(self, cache_key):
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            return
+        for dependency in entry[2]:
+            dependents = self._dependents.get(dependency)
+            if dependents:
+                dependents.discard(cache_key)
+                if not dependents:
+                    del self._dependents[dependency]
+
+    def generation(self):
+        return self._generation
+
+    def get(self, entity, key):
+        """Return (hit, value). Values are copies, so callers may modify them."""
+        cache_key = self._key(entity, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return True, copy.copy(entry[1])
+            if entry is not None:
+                self._unlink(cache_key)
+            self.misses += 1
+            return False, None
+
+    def set(self, entity, key, value, depends=(), generation=None, ttl=None):
+        """
+        Store `value`. depends lists the (entity, key) rows it embeds data from.
+        If `generation` is given and an invalidation happened since, nothing is stored.
+        """
+        cache_key = self._key(entity, key)
+        depends = {(dep_entity, str(dep_key)) for dep_entity, dep_key in depends if dep_key is not None}
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._unlink(cache_key)
+            expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._entries[cache_key] = (expires_at, copy.copy(value), depends)
+            for dependency in depends:
+                self._dependents.setdefault(dependency, set()).add(cache_key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._unlink(oldest)
+                self.evictions += 1
+
+    def invalidate(self, entity, key):
+        """Drop a row and, transitively, every cached entry that embeds data from it."""
+        with self._lock:
+            self._generation += 1
+            pending = [self._key(entity, key)]
+            seen = set()
+            while pending:
+                cache_key = pending.pop()
+                if cache_key in seen:
+                    continue
+                seen.add(cache_key)
+                if cache_key in self._entries:
+                    self._unlink(cache_key)
+                    self.invalidations += 1
+                pending.extend(self._dependents.get(cache_key, ()))
+                pending.extend(self._dependents.get((cache_key[0], ANY), ()))
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._dependents.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+def _encode(value):
+    """JSON for cached rows, keeping the date/Decimal types the rows are read with."""
+    def default(obj):
+        if isinstance(obj, datetime):
+            return {"__t": "datetime", "v": obj.isoformat()}
+        if isinstance(obj, date):
+            return {"__t": "date", "v": obj.isoformat()}
+        if isinstance(obj, Decimal):
+            return {"__t": "decimal", "v": str(obj)}
+        if isinstance(obj, timedelta):
+            return {"__t": "timedelta", "v": obj.total_seconds()}
+        if isinstance(obj, (bytes, bytearray)):
+            return {"__t": "bytes", "v": base64.b64encode(bytes(obj)).decode('ascii')}
+        raise TypeError(f"Can't cache a value of type {type(obj).__name__}")
+    return json.dumps(value, default=default, separators=(',', ':'))
+
+
+_DECODERS = {
+    "datetime": datetime.fromisoformat,
+    "date": date.fromisoformat,
+    "decimal": Decimal,
+    "timedelta": lambda seconds: timedelta(seconds=seconds),
+    "bytes": base64.b64decode,
+}
+
+
+def _decode(payload):
+    def hook(obj):
+        if "__t" in obj and obj["__t"] in _DECODERS:
+            return _DECODERS[obj["__t"]](obj["v"])
+        return obj
+    return json.loads(payload, object_hook=hook)
+
+
+class RedisCache:
+    """
+    Cache shared by all workers through a Redis-protocol server.
+
+    Entries are stored as `<prefix>:entry:<entity>:<key>` with their TTL, and
+    `<prefix>:deps:<entity>:<key>` holds the entries that embed data from that
+    row, so invalidation can be walked on the server. Every invalidation is
+    also published on `<prefix>:invalidate`; each worker subscribes and drops
+    the row (and its dependents) from its local copy. A shared generation
+    counter keeps a read that overlaps an invalidation in any worker from
+    storing its stale result.
+    """
+
+    name = 'redis'
+
+    def __init__(self, url=REDIS_URL, prefix=CACHE_PREFIX, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND = 'redis' requires the redis package (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.local = EntityCache(max_entries, ttl)
+        self.channel = f"{prefix}:invalidate"
+        self._generation_key = f"{prefix}:generation"
+        self.shared_hits = 0
+        self.errors = 0
+        self._listener = threading.Thread(target=self._listen, name="cache-invalidation", daemon=True)
+        self._listener.start()
+
+    def _entry_key(self, entity, key):
+        return f"{self.prefix}:entry:{entity}:{key}"
+
+    def _deps_key(self, entity, key):
+        return f"{self.prefix}:deps:{entity}:{key}"
+
+    def _listen(self):
+        """Apply invalidations published by any worker to the local copy; reconnect on errors."""
+        delay = 1
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Messages may have been missed while disconnected
+                self.local.clear()
+                delay = 1
+                for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    entity, key = json.loads(message['data'])
+                    if entity is None:
+                        self.local.clear()
+                    else:
+                        self.local.invalidate(entity, key)
+            except Exception as e:
+                self.errors += 1
+                print(f"Cache invalidation listener error: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    def generation(self):
+        try:
+            return int(self.client.get(self._generation_key) or 0)
+        except redis.RedisError:
+            self.errors += 1
+            return GENERATION_UNKNOWN
+
+    def get(self, entity, key):
+        hit, value = self.local.get(entity, key)
+        if hit:
+            return hit, value
+        try:
+            payload = self.client.get(self._entry_key(entity, key))
+        except redis.RedisError:
+            self.errors += 1
+            return False, None
+        if payload is None:
+            return False, None
+        stored = _decode(payload)
+        self.shared_hits += 1
+        self.local.set(entity, key, stored["value"], [tuple(dep) for dep in stored["depends"]])
+        return True, stored["value"]
+
+    def set(self, entity, key, value, depends=(), generation=None, ttl=None):
+        if generation == GENERATION_UNKNOWN:
+            # An invalidation during the read would have gone unnoticed
+            return
+        depends = [(dep_entity, str(dep_key)) for dep_entity, dep_key in depends if dep_key is not None]
+        ttl = self.ttl if ttl is None else ttl
+        entry_key = self._entry_key(entity, key)
+        payload = _encode({"value": value, "depends": depends})
+        try:
+            with self.client.pipeline() as pipe:
+                # Only store if no worker invalidated anything since the read began
+                pipe.watch(self._generation_key)
+                if generation is not None and int(pipe.get(self._generation_key) or 0) != generation:
+                    pipe.reset()
+                    return
+                pipe.multi()
+                pipe.set(entry_key, payload, ex=ttl)
+                for dep_entity, dep_key in depends:
+                    deps_key = self._deps_key(dep_entity, dep_key)
+                    pipe.sadd(deps_key, json.dumps([entity, str(key)]))
+                    pipe.expire(deps_key, ttl)
+                pipe.execute()
+        except redis.WatchError:
+            return
+        except redis.RedisError:
+            self.errors += 1
+            return
+        self.local.set(entity, key, value, depends, ttl=ttl)
+
+    def invalidate(self, entity, key):
+        self.local.invalidate(entity, key)
+        try:
+            self.client.incr(self._generation_key)
+            pending = [(entity, str(key))]
+            seen = set()
+            while pending:
+                current = pending.pop()
+                if current in seen:
+                    continue
+                seen.add(current)
+                dependency_keys = [self._deps_key(*current), self._deps_key(current[0], ANY)]
+                with self.client.pipeline() as pipe:
+                    pipe.delete(self._entry_key(*current))
+                    for deps_key in dependency_keys:
+                        pipe.smembers(deps_key)
+                    pipe.delete(dependency_keys[0])
+                    results = pipe.execute()
+                for members in results[1:3]:
+                    pending.extend(tuple(json.loads(member)) for member in members)
+            self.client.publish(self.channel, json.dumps([entity, str(key)]))
+        except redis.RedisError:
+            self.errors += 1
+
+    def clear(self):
+        self.local.clear()
+        try:
+            self.client.incr(self._generation_key)
+            keys = list(self.client.scan_iter(f"{self.prefix}:entry:*")) + \
+                list(self.client.scan_iter(f"{self.prefix}:deps:*"))
+            if keys:
+                self.client.delete(*keys)
+            self.client.publish(self.channel, json.dumps([None, None]))
+        except redis.RedisError:
+            self.errors += 1
+
+    def stats(self):
+        stats = self.local.stats()
+        stats.update({
+            "backend": self.name,
+            "shared_hits": self.shared_hits,
+            "errors": self.errors
+        })
+        return stats
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """The configured cache backend, created on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = RedisCache() if CACHE_BACKEND == 'redis' else EntityCache()
+    return _backend
+
+
+def cached(entity, depends=None):
+    """
+    Read-through caching for a get_by_id(key) function. `depends(row)`
+    returns the (entity, key) pairs the row embeds data from. Rows that
+    don't exist (None) are not cached.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(key):
+            if in_transaction():
+                # May read the transaction's own uncommitted writes; never cache those
+                return fn(key)
+            backend = get_backend()
+            hit, value = backend.get(entity, key)
+            if hit:
+                return value
+            generation = backend.generation()
+            value = fn(key)
+            if value is not None:
+                backend.set(entity, key, value, depends(value) if depends else (), generation)
+            return value
+        return wrapper
+    return decorator
+
+
+def cached_many(entity, depends=None):
+    """
+    Read-through caching for a get_by_ids(keys) function returning {key: row}.
+    Shares entries with cached(entity): keys found in the cache are served
+    from it and only the rest are passed to the function, in one call.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(keys):
+            keys = list(dict.fromkeys(key for key in keys if key))
+            if in_transaction():
+                return fn(keys)
+            backend = get_backend()
+            found, missing = {}, []
+            for key in keys:
+                hit, value = backend.get(entity, key)
+                if hit:
+                    found[key] = value
+                else:
+                    missing.append(key)
+            if missing:
+                generation = backend.generation()
+                rows = fn(missing)
+                for key, value in rows.items():
+                    backend.set(entity, key, value, depends(value) if depends else (), generation)
+                found.update(rows)
+            return found
+        return wrapper
+    return decorator
+
+
+def remember(entity, key, ttl, compute):
+    """Return the cached result of compute() for (entity, key), computing it at most every `ttl` seconds."""
+    if in_transaction():
+        return compute()
+    backend = get_backend()
+    hit, value = backend.get(entity, key)
+    if hit:
+        return value
+    generation = backend.generation()
+    value = compute()
+    if value is not None:
+        backend.set(entity, key, value, (), generation, ttl)
+    return value
+
+
+@after_commit
+def invalidate(entity, key):
+    get_backend().invalidate(entity, key)
+
+
+def get_cache_stats():
+    return get_backend().stats()
@@ -0,0 +1,167 @@
+# Vocabulary catalogs behind the form dropdowns
+#
+# The lab test, procedure, diagnosis and denial forms offer the values already
+# used in their tables (test codes, units, procedure codes, ...). Each
+# Catalog loads its vocabularies with one DISTINCT/GROUP BY pass on first use
+# and then keeps them current in memory: inserts add their values directly,
+# while updates and deletes (which may remove the last use of a value) mark
+# the catalog for a reload on next read. Catalogs older than CATALOG_MAX_AGE
+# seconds are also reloaded, to pick up writes made through other workers.
+#
+# Every state of a catalog has a content hash that the /options endpoints
+# send as an ETag, so browsers revalidate instead of downloading it again.
+import hashlib
+import json
+import threading
+import time
+from collections import namedtuple
+from mysql.connector import Error
+from .db import get_db_connection, get_db_cursor, after_commit
+import settings
+
+CATALOG_MAX_AGE = getattr(settings, 'CATALOG_MAX_AGE', 300)
+
+# name       - key in the catalog's payload
+# columns    - columns of each entry; entries are sorted by them
+# skip_empty - leave out rows whose first column is NULL or ''
+# group      - one entry per first column, keeping the largest of the other
+#              values (GROUP BY first column with MAX())
+Vocabulary = namedtuple('Vocabulary', ['name', 'columns', 'skip_empty', 'group'], defaults=(False, False))
+
+
+def _sort_key(entry):
+    # NULLs first and case-insensitive, like ORDER BY on the table
+    return tuple((value is not None, str(value).lower() if value is not None else '') for value in entry)
+
+
+class Catalog:
+    """The vocabularies of one table, kept in memory and versioned by content hash."""
+
+    def __init__(self, name, table, vocabularies):
+        self.name = name
+        self.table = table
+        self.vocabularies = {vocabulary.name: vocabulary for vocabulary in vocabularies}
+        self._lock = threading.Lock()
+        self._entries = None        # vocabulary name -> {identity: entry tuple}
+        self._loaded_at = 0
+        self._payload = None        # (payload, etag) of the current state, built on read
+        self._changes = 0           # bumped by add()/invalidate(), to detect writes during a load
+
+    def _query(self, vocabulary):
+        first, rest = vocabulary.columns[0], vocabulary.columns[1:]
+        where = f" WHERE {first} IS NOT NULL AND {first} != ''" if vocabulary.skip_empty else ""
+        if vocabulary.group:
+            selected = ', '.join([first] + [f"MAX({column}) AS {column}" for column in rest])
+            return f"SELECT {selected} FROM {self.table}{where} GROUP BY {first}"
+        return f"SELECT DISTINCT {', '.join(vocabulary.columns)} FROM {self.table}{where}"
+
+    def _load(self):
+        conn = None
+        try:
+            conn = get_db_connection(shared=False)
+            cursor = get_db_cursor(conn)
+            entries = {}
+            for vocabulary in self.vocabularies.values():
+                cursor.execute(self._query(vocabulary))
+                entries[vocabulary.name] = {}
+                for row in cursor.fetchall():
+                    self._merge(entries[vocabulary.name], vocabulary, row)
+            return entries
+        except Error as e: raise Error(f"Error loading {self.name} options: {e}")
+        finally:
+            if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    @staticmethod
+    def _merge(entries, vocabulary, row):
+        entry = tuple(row.get(column) for column in vocabulary.columns)
+        if vocabulary.skip_empty and entry[0] in (None, ''):
+            return False
+        identity = entry[:1] if vocabulary.group else entry
+        existing = entries.get(identity)
+        if existing is not None:
+            if not vocabulary.group:
+                return False
+            entry = entry[:1] + tuple(
+                max((v for v in pair if v is not None), default=None) for pair in zip(existing[1:], entry[1:])
+            )
+            if entry == existing:
+                return False
+        entries[identity] = entry
+        return True
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._entries is not None and time.monotonic() - self._loaded_at <= CATALOG_MAX_AGE:
+                return
+            changes = self._changes
+        entries = self._load()
+        with self._lock:
+            self._entries = entries
+            # A write during the load may be missing from it; serve this state once and reload next time
+            self._loaded_at = time.monotonic() if changes == self._changes else 0
+            self._payload = None
+
+    @after_commit
+    def add(self, row):
+        """Add the values of an inserted row (column -> value). Nothing happens until the catalog is loaded."""
+        with self._lock:
+            self._changes += 1
+            if self._entries is None:
+                return
+            changed = False
+            for vocabulary in self.vocabularies.values():
+                changed = self._merge(self._entries[vocabulary.name], vocabulary, row) or changed
+            if changed:
+                self._payload = None
+
+    @after_commit
+    def invalidate(self):
+        """Reload on next read (after updates and deletes, which may drop values)."""
+        with self._lock:
+            self._changes += 1
+            self._entries = None
+            self._payload = None
+
+    def snapshot(self):
+        """Return ({vocabulary: rows}, etag) for the current state."""
+        while True:
+            self._ensure_loaded()
+            with self._lock:
+                if self._entries is not None:
+                    break
+        with self._lock:
+            if self._payload is None:
+                payload = {
+                    name: [dict(zip(self.vocabularies[name].columns, entry))
+                           for entry in sorted(entries.values(), key=_sort_key)]
+                    for name, entries in self._entries.items()
+                }
+                digest = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+                self._payload = (payload, f"{self.name}-{digest[:16]}")
+            return self._payload
+
+    def get(self, name):
+        """Rows of one vocabulary, shaped like the DISTINCT query's rows."""
+        return self.snapshot()[0][name]
+
+
+lab_tests = Catalog('lab-tests', 'lab_tests', [
+    Vocabulary('test_codes', ('test_code', 'test_name')),
+    Vocabulary('lab_ids', ('lab_id',), skip_empty=True),
+    Vocabulary('specimen_types', ('specimen_type',), skip_empty=True),
+    Vocabulary('units', ('units',), skip_empty=True),
+    Vocabulary('normal_ranges', ('normal_range',), skip_empty=True),
+    Vocabulary('test_results', ('test_result',), skip_empty=True),
+])
+
+procedures = Catalog('procedures', 'procedures', [
+    Vocabulary('procedure_codes', ('procedure_code', 'procedure_description')),
+])
+
+diagnoses = Catalog('diagnoses', 'diagnoses', [
+    Vocabulary('diagnosis_codes', ('diagnosis_code', 'diagnosis_description'), skip_empty=True, group=True),
+])
+
+denials = Catalog('denials', 'denials', [
+    Vocabulary('denial_reason_codes', ('denial_reason_code', 'denial_reason_description')),
+])
@@ -0,0 +1,217 @@
+# Columnar (Apache Arrow / Parquet) exports for analytics
+#
+# Revenue-cycle analysis pulls whole tables - claims, denials, encounters.
+# These exports write them as an Arrow IPC stream or a Parquet file with real
+# column types taken from information_schema: DECIMAL(p, s) as
+# decimal128(p, s), DATE as date32, DATETIME as timestamp, BOOLEAN as bool.
+# Rows come from an unbuffered tuple cursor BATCH_ROWS at a time and each
+# batch is turned column by column into an Arrow record batch, without
+# building a dict (or a JSON value) per row.
+#
+# pyarrow is optional (pip install pyarrow); without it these exports report
+# that it is missing and nothing else is affected.
+import io
+from flask import Response
+from mysql.connector import Error
+from .db import get_db_connection, get_db_cursor
+from .streaming import NET_WRITE_TIMEOUT, release
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# export name -> (table, primary key, date column filtered by date_from/date_to)
+TABLES = {
+    'claims': ('claims_and_billing', 'billing_id', 'claim_billing_date'),
+    'denials': ('denials', 'denial_id', 'denial_date'),
+    'encounters': ('encounters', 'encounter_id', 'visit_date'),
+}
+
+# format -> (content type, file extension)
+FORMATS = {
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# Rows per record batch (and per Parquet row group)
+BATCH_ROWS = 10000
+
+
+def parse_format(value):
+    fmt = (value or 'parquet').strip().lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format '{fmt}'. Use one of: {', '.join(FORMATS)}")
+    return fmt
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Arrow/Parquet exports require the pyarrow package (pip install pyarrow)")
+
+
+def _arrow_type(column):
+    """Arrow type of a column described by information_schema.COLUMNS."""
+    data_type = column['data_type'].lower()
+    column_type = column['column_type'].lower()
+    unsigned = 'unsigned' in column_type
+    if column_type.startswith('tinyint(1)'):
+        return pa.bool_()
+    if data_type in ('tinyint', 'smallint'):
+        return pa.int32() if unsigned else pa.int16()
+    if data_type in ('mediumint', 'int', 'integer'):
+        return pa.int64() if unsigned else pa.int32()
+    if data_type == 'bigint':
+        return pa.uint64() if unsigned else pa.int64()
+    if data_type == 'decimal':
+        return pa.decimal128(int(column['numeric_precision']), int(column['numeric_scale']))
+    if data_type == 'float':
+        return pa.float32()
+    if data_type == 'double':
+        return pa.float64()
+    if data_type == 'date':
+        return pa.date32()
+    if data_type in ('datetime', 'timestamp'):
+        return pa.timestamp('us')
+    if data_type == 'time':
+        return pa.duration('us')
+    if data_type in ('binary', 'varbinary', 'blob', 'tinyblob', 'mediumblob', 'longblob'):
+        return pa.binary()
+    return pa.string()
+
+
+def _to_array(values, field):
+    if pa.types.is_boolean(field.type):
+        # BOOLEAN is TINYINT(1): MySQL sends 0/1
+        return pa.array(values, type=pa.int8()).cast(pa.bool_())
+    return pa.array(values, type=field.type)
+
+
+class ColumnarExport:
+    """One table read in record batches, written as Arrow IPC or Parquet."""
+
+    def __init__(self, name, date_from=None, date_to=None):
+        _require_pyarrow()
+        if name not in TABLES:
+            raise ValueError(f"Unknown export '{name}'. Available: {', '.join(TABLES)}")
+        table, key, date_col = TABLES[name]
+        self.name = name
+        self._conn = None
+        try:
+            self._conn = get_db_connection(shared=False)
+            cursor = get_db_cursor(self._conn)
+            cursor.execute("""
+                SELECT COLUMN_NAME AS name, DATA_TYPE AS data_type, COLUMN_TYPE AS column_type,
+                       NUMERIC_PRECISION AS numeric_precision, NUMERIC_SCALE AS numeric_scale
+                FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+                ORDER BY ORDINAL_POSITION
+            """, (table,))
+            columns = cursor.fetchall()
+            cursor.close()
+            self.schema = pa.schema([pa.field(column['name'], _arrow_type(column)) for column in columns])
+
+            conditions, params = [], []
+            if date_from:
+                conditions.append(f"{date_col} >= %s")
+                params.append(date_from)
+            if date_to:
+                conditions.append(f"{date_col} <= %s")
+                params.append(date_to)
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            # Unbuffered tuples: rows are fetched a batch at a time, never as dicts
+            self._cursor = self._conn.cursor()
+            self._cursor.execute(f"SET SESSION net_write_timeout = {int(NET_WRITE_TIMEOUT)}")
+            self._cursor.execute(
+                f"SELECT {', '.join(f'`{field.name}`' for field in self.schema)} FROM {table}{where} ORDER BY {key}",
+                params
+            )
+        except Error as e:
+            self.close()
+            raise Error(f"Error exporting {name}: {e}")
+
+    def batches(self):
+        """Yield pyarrow.RecordBatch objects of up to BATCH_ROWS rows; closes the export when done."""
+        try:
+            while self._conn is not None:
+                rows = self._cursor.fetchmany(BATCH_ROWS)
+                if not rows:
+                    break
+                columns = zip(*rows)
+                yield pa.RecordBatch.from_arrays(
+                    [_to_array(values, field) for values, field in zip(columns, self.schema)],
+                    schema=self.schema
+                )
+        finally:
+            self.close()
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            release(conn, getattr(self, '_cursor', None))
+
+    def _writer(self, sink, fmt):
+        if fmt == 'parquet':
+            return pq.ParquetWriter(sink, self.schema)
+        return pa.ipc.new_stream(sink, self.schema)
+
+    def write(self, sink, fmt):
+        """Write the whole export to a path or binary file object. Returns the number of rows."""
+        rows = 0
+        writer = self._writer(sink, fmt)
+        try:
+            for batch in self.batches():
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        finally:
+            writer.close()
+        return rows
+
+    def chunks(self, fmt):
+        """Yield the encoded export piece by piece, one record batch at a time."""
+        sink = _ChunkSink()
+        writer = self._writer(sink, fmt)
+        yield sink.take()
+        try:
+            for batch in self.batches():
+                writer.write_batch(batch)
+                yield sink.take()
+        finally:
+            writer.close()
+        yield sink.take()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose written bytes are handed out with take()."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data, self._parts = b''.join(self._parts), []
+        return data
+
+
+def response(export, fmt):
+    """Stream a ColumnarExport as a file download (`<name>.arrows` or `<name>.parquet`)."""
+    content_type, extension = FORMATS[fmt]
+    resp = Response(export.chunks(fmt), content_type=content_type)
+    resp.headers['Content-Disposition'] = f'attachment; filename="{export.name}.{extension}"'
+    resp.headers['Cache-Control'] = 'no-store'
+    resp.call_on_close(export.close)
+    return resp
@@ -1,30 +1,30 @@
 # Database connection utilities
 import mysql.connector
 from mysql.connector import Error, errorcode
+import contextlib
+import contextvars
+import functools
 import os
 import sys
+import threading
+import time
 
 # Import settings from root directory
 backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # backend/
 root_dir = os.path.dirname(backend_dir)  # root/
 sys.path.insert(0, root_dir)
 from settings import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT
+import settings
 
-
-def get_conn():
-    return mysql.connector.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        port=DB_PORT,
-        autocommit=False
-    )
+DB_POOL_SIZE = getattr(settings, 'DB_POOL_SIZE', 10)
+DB_POOL_MAX_OVERFLOW = getattr(settings, 'DB_POOL_MAX_OVERFLOW', 10)
+DB_POOL_TIMEOUT = getattr(settings, 'DB_POOL_TIMEOUT', 30)
+DB_POOL_RECYCLE = getattr(settings, 'DB_POOL_RECYCLE', 3600)
 
 
-def get_db_connection():
+def _connect():
     try:
-        conn = mysql.connector.connect(
+        return mysql.connector.connect(
             host=DB_HOST,
             user=DB_USER,
             password=DB_PASSWORD,
@@ -32,7 +32,6 @@ def get_db_connection():
             port=DB_PORT,
             autocommit=False
         )
-        return conn
     except Error as err:
         if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
             raise Error("Access denied: Check username and password")
@@ -42,5 +41,337 @@ def get_db_connection():
             raise Error(f"Database connection error: {err}")
 
 
+class PooledConnection:
+    """
+    Wrapper handed out by the pool. Behaves like a normal MySQL connection,
+    but close() returns the underlying connection to the pool instead of
+    closing the socket.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def is_connected(self):
+        return not self._released and self._raw.is_connected()
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool.release(self._raw)
+
+    def discard(self):
+        """Close the underlying connection instead of returning it for reuse."""
+        if self._released:
+            return
+        try:
+            self._raw.close()
+        except Error:
+            pass
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Safety net for code paths that forget to close the connection
+        if not getattr(self, '_released', True):
+            self.close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe MySQL connection pool.
+
+    Keeps up to `size` idle connections for reuse and allows `max_overflow`
+    extra connections under load. Connections are health-checked before they
+    are handed out and replaced after `recycle` seconds.
+    """
+
+    def __init__(self, size=DB_POOL_SIZE, max_overflow=DB_POOL_MAX_OVERFLOW,
+                 timeout=DB_POOL_TIMEOUT, recycle=DB_POOL_RECYCLE, connect=_connect):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self._connect = connect
+        self._idle = []  # raw connections, most recently used last
+        self._created_at = {}
+        self._open = 0
+        self._checked_out = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'connections_created': 0,
+            'connections_closed': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'failed_health_checks': 0,
+        }
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    raw = None
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise Error(f"Connection pool exhausted: no connection available within {self.timeout}s")
+                self._stats['waits'] += 1
+                self._cond.wait(remaining)
+            self._checked_out += 1
+            self._stats['checkouts'] += 1
+
+        try:
+            if raw is not None and not self._is_healthy(raw):
+                self._discard(raw, reopen=True)
+                raw = None
+            if raw is None:
+                raw = self._connect()
+                with self._cond:
+                    self._created_at[id(raw)] = time.monotonic()
+                    self._stats['connections_created'] += 1
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._checked_out -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        reusable = True
+        try:
+            if getattr(raw, 'unread_result', False):
+                # Rows of an unbuffered query were left unread (e.g. an export
+                # the client abandoned); draining them could take long, so the
+                # connection is closed instead of reused.
+                reusable = False
+            elif raw.is_connected():
+                # Never hand a connection with an open transaction (and its
+                # read snapshot) to the next caller.
+                raw.rollback()
+            else:
+                reusable = False
+        except Error:
+            reusable = False
+
+        with self._cond:
+            self._checked_out -= 1
+            too_old = time.monotonic() - self._created_at.get(id(raw), 0) > self.recycle
+            if reusable and not too_old and self._open <= self.size:
+                self._idle.append(raw)
+                self._cond.notify()
+                return
+        self._discard(raw)
+
+    def _is_healthy(self, raw):
+        try:
+            if time.monotonic() - self._created_at.get(id(raw), 0) > self.recycle:
+                return False
+            raw.ping(reconnect=False)
+            return True
+        except Error:
+            with self._cond:
+                self._stats['failed_health_checks'] += 1
+            return False
+
+    def _discard(self, raw, reopen=False):
+        try:
+            raw.close()
+        except Error:
+            pass
+        with self._cond:
+            self._created_at.pop(id(raw), None)
+            self._stats['connections_closed'] += 1
+            if not reopen:
+                # The slot stays reserved when the caller opens a replacement
+                self._open -= 1
+                self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'timeout': self.timeout,
+                'open': self._open,
+                'idle': len(self._idle),
+                'checked_out': self._checked_out,
+                'overflow': max(0, self._open - self.size),
+                **self._stats,
+            }
+
+    def dispose(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for raw in idle:
+            self._discard(raw)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def get_pool_stats():
+    return get_pool().stats()
+
+
+# Unit of work
+#
+# Every model method opens, commits and closes its own connection. Inside
+# `with transaction():` they share one connection instead: their commit() and
+# close() calls are no-ops, reads see the block's own uncommitted writes, and
+# the block commits once at the end (or rolls back if it raises or if any step
+# rolled back). Work that must not join the caller's transaction - ID
+# reservation, loads of process-wide in-memory indexes, DDL - asks for
+# get_db_connection(shared=False). Write hooks decorated with @after_commit
+# (cache invalidation, index refreshes) are queued and run once it commits.
+#
+# The unit lives in a context variable, so it is scoped to the request (thread)
+# that opened it; fan-out worker threads keep using their own connections.
+_current_unit = contextvars.ContextVar('unit_of_work', default=None)
+
+
+class SharedConnection:
+    """The unit's connection as handed to model code: commit() and close() are left to the unit."""
+
+    def __init__(self, unit, conn):
+        self._unit = unit
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def is_connected(self):
+        return self._conn.is_connected()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        # Rolls back everything the unit did so far, so it can no longer commit
+        self._unit.rollback_only = True
+        self._conn.rollback()
+
+    def close(self):
+        pass
+
+
+class UnitOfWork:
+    """One connection and transaction shared by the model calls of a transaction() block."""
+
+    def __init__(self):
+        self._conn = None
+        self._callbacks = []
+        self.rollback_only = False
+
+    def connection(self):
+        if self._conn is None:
+            self._conn = get_pool().acquire()
+        return SharedConnection(self, self._conn)
+
+    def after_commit(self, callback, *args, **kwargs):
+        self._callbacks.append((callback, args, kwargs))
+
+    def _finish(self, commit):
+        try:
+            if self._conn is not None and commit:
+                self._conn.commit()
+        finally:
+            if self._conn is not None:
+                # The pool rolls back anything left uncommitted
+                self._conn.close()
+        if not commit:
+            return
+        for callback, args, kwargs in self._callbacks:
+            try:
+                callback(*args, **kwargs)
+            except Exception as e:
+                # The transaction is already committed; a failed hook must not report it as failed
+                print(f"After-commit hook {getattr(callback, '__qualname__', callback)} failed: {e}")
+
+
+@contextlib.contextmanager
+def transaction():
+    """
+    Run the model calls of the block on one connection and commit them
+    together. A transaction() inside another one joins the outer unit.
+    """
+    unit = _current_unit.get()
+    if unit is not None:
+        yield unit
+        return
+    unit = UnitOfWork()
+    token = _current_unit.set(unit)
+    committed = False
+    try:
+        yield unit
+        if unit.rollback_only:
+            raise Error("Transaction was rolled back by a failed step")
+        committed = True
+    finally:
+        _current_unit.reset(token)
+        unit._finish(committed)
+
+
+def in_transaction():
+    return _current_unit.get() is not None
+
+
+def after_commit(fn):
+    """
+    Decorator for write hooks that read or publish committed state: inside a
+    unit of work the call is queued until the unit commits (and dropped if it
+    rolls back); outside one it runs immediately.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        unit = _current_unit.get()
+        if unit is None:
+            return fn(*args, **kwargs)
+        unit.after_commit(fn, *args, **kwargs)
+    return wrapper
+
+
+def get_conn():
+    return get_db_connection()
+
+
+def get_db_connection(shared=True):
+    """
+    A pooled connection, or the current unit of work's connection inside
+    transaction(). shared=False always returns a connection of its own.
+    """
+    unit = _current_unit.get() if shared else None
+    if unit is not None:
+        return unit.connection()
+    return get_pool().acquire()
+
+
 def get_db_cursor(conn):
-    return conn.cursor(dictionary=True, buffered=True)
\ No newline at end of file
+    return conn.cursor(dictionary=True, buffered=True)
@@ -0,0 +1,214 @@
+# Encounter picker for the claim, medication, procedure, lab test and diagnosis forms
+#
+# The pickers only need a few columns of the most recent matching encounters,
+# so instead of the encounters list query (joins, a multi-column search and a
+# COUNT) they get a narrow projection, ordered by visit_date through its index,
+# with no count. A search term matches encounter IDs by prefix (primary key
+# range) or every patient whose name contains it, read from the patients name
+# index (idx_patients_last_first) and joined on idx_encounters_patient_visit_date.
+#
+# The diagnosis form offers only encounters without a diagnosis. Those are kept
+# as an in-memory set, loaded with one anti-join and updated by the encounter
+# and diagnosis write paths, so the anti-join isn't run on every keystroke.
+# Writes made through another worker reach the set when it is reloaded (every
+# UNDIAGNOSED_MAX_AGE seconds); until then the encounters a search returns are
+# re-checked against diagnoses, so one that has been diagnosed is never offered.
+import heapq
+import threading
+import time
+from mysql.connector import Error
+from .db import get_db_connection, get_db_cursor, after_commit
+import settings
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+UNDIAGNOSED_MAX_AGE = getattr(settings, 'UNDIAGNOSED_MAX_AGE', 60)
+
+# Patients whose name contains the term; answered from idx_patients_last_first,
+# which holds both names and the patient_id
+_PATIENT_NAME_MATCH = "SELECT patient_id FROM patients WHERE CONCAT(first_name, ' ', last_name) LIKE %s"
+
+_NOT_DIAGNOSED = "NOT EXISTS (SELECT 1 FROM diagnoses d WHERE d.encounter_id = e.encounter_id)"
+
+_COLUMNS = """
+    e.encounter_id, e.patient_id, e.provider_id, e.visit_date, e.status, e.diagnosis_code,
+    p.first_name AS patient_first_name, p.last_name AS patient_last_name,
+    pr.name AS provider_name
+"""
+
+_JOINS = """
+    LEFT JOIN patients p ON e.patient_id = p.patient_id
+    LEFT JOIN providers pr ON e.provider_id = pr.provider_id
+"""
+
+
+def _clamp(limit):
+    return max(1, min(int(limit or DEFAULT_LIMIT), MAX_LIMIT))
+
+
+def _like_prefix(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"{escaped}%"
+
+
+def _like_contains(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def _matching_patients(term):
+    """IDs of every patient whose name contains the term."""
+    return [row['patient_id'] for row in _run(_PATIENT_NAME_MATCH, [_like_contains(term)])]
+
+
+def _run(query, params, shared=True):
+    conn = None
+    try:
+        conn = get_db_connection(shared)
+        cursor = get_db_cursor(conn)
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    except Error as e: raise Error(f"Error looking up encounters: {e}")
+    finally:
+        if conn and conn.is_connected(): cursor.close(); conn.close()
+
+
+def search(term=None, limit=DEFAULT_LIMIT):
+    """Most recent encounters, optionally matching `term` by encounter ID prefix or patient."""
+    limit = _clamp(limit)
+    term = (term or '').strip()
+    if not term:
+        return _run(f"""
+            SELECT {_COLUMNS}
+            FROM encounters e{_JOINS}
+            ORDER BY e.visit_date DESC, e.encounter_id DESC
+            LIMIT %s
+        """, [limit])
+
+    # Each branch takes its own most recent `limit` rows through its own index
+    branches = ["""
+        (SELECT e.encounter_id FROM encounters e
+         WHERE e.encounter_id LIKE %s
+         ORDER BY e.visit_date DESC, e.encounter_id DESC
+         LIMIT %s)
+    """, f"""
+        (SELECT e.encounter_id FROM encounters e
+         WHERE e.patient_id IN ({_PATIENT_NAME_MATCH})
+         ORDER BY e.visit_date DESC, e.encounter_id DESC
+         LIMIT %s)
+    """]
+    params = [_like_prefix(term), limit, _like_contains(term), limit, limit]
+    return _run(f"""
+        SELECT {_COLUMNS}
+        FROM ({' UNION '.join(branches)}) matched
+        INNER JOIN encounters e ON e.encounter_id = matched.encounter_id{_JOINS}
+        ORDER BY e.visit_date DESC, e.encounter_id DESC
+        LIMIT %s
+    """, params)
+
+
+class UndiagnosedEncounters:
+    """Encounters that have no diagnosis, as {encounter_id: (visit_date, patient_id)}."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = None
+        self._loaded_at = 0
+        self._changes = 0   # bumped by every write, to detect writes during a load
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._entries is not None and time.monotonic() - self._loaded_at <= UNDIAGNOSED_MAX_AGE:
+                return
+            changes = self._changes
+        rows = _run(f"""
+            SELECT e.encounter_id, e.visit_date, e.patient_id
+            FROM encounters e
+            WHERE {_NOT_DIAGNOSED}
+        """, [], shared=False)
+        with self._lock:
+            self._entries = {row['encounter_id']: (row['visit_date'], row['patient_id']) for row in rows}
+            # A write during the load may be missing from it; use it once and reload next time
+            self._loaded_at = time.monotonic() if changes == self._changes else 0
+
+    @after_commit
+    def refresh(self, *encounter_ids):
+        """Re-check encounters after a write that may have changed whether they have a diagnosis."""
+        encounter_ids = [encounter_id for encounter_id in encounter_ids if encounter_id]
+        with self._lock:
+            self._changes += 1
+            if self._entries is None or not encounter_ids:
+                return
+        try:
+            rows = _run(f"""
+                SELECT e.encounter_id, e.visit_date, e.patient_id
+                FROM encounters e
+                WHERE e.encounter_id IN ({', '.join(['%s'] * len(encounter_ids))})
+                  AND {_NOT_DIAGNOSED}
+            """, encounter_ids, shared=False)
+        except Error:
+            self.invalidate()
+            return
+        with self._lock:
+            if self._entries is None:
+                return
+            for encounter_id in encounter_ids:
+                self._entries.pop(encounter_id, None)
+            for row in rows:
+                self._entries[row['encounter_id']] = (row['visit_date'], row['patient_id'])
+
+    @after_commit
+    def discard(self, encounter_id):
+        """Drop an encounter that was deleted or just received a diagnosis."""
+        with self._lock:
+            self._changes += 1
+            if self._entries is not None:
+                self._entries.pop(encounter_id, None)
+
+    @after_commit
+    def invalidate(self):
+        with self._lock:
+            self._changes += 1
+            self._entries = None
+
+    def search(self, term=None, limit=DEFAULT_LIMIT):
+        """Most recent undiagnosed encounters, optionally matching `term` like search()."""
+        limit = _clamp(limit)
+        term = (term or '').strip()
+        self._ensure_loaded()
+        patient_ids = set(_matching_patients(term)) if term else set()
+        prefix = term.lower()
+        with self._lock:
+            candidates = [
+                (visit_date, encounter_id) for encounter_id, (visit_date, patient_id) in (self._entries or {}).items()
+                if not term or str(encounter_id).lower().startswith(prefix) or patient_id in patient_ids
+            ]
+        while True:
+            # visit_date can be NULL in older data; those sort last
+            newest = heapq.nlargest(limit, candidates, key=lambda item: (item[0] is not None, item[0] or 0, item[1]))
+            if not newest:
+                return []
+            ids = [encounter_id for _, encounter_id in newest]
+            rows = _run(f"""
+                SELECT {_COLUMNS}
+                FROM encounters e{_JOINS}
+                WHERE e.encounter_id IN ({', '.join(['%s'] * len(ids))})
+                  AND {_NOT_DIAGNOSED}
+                ORDER BY e.visit_date DESC, e.encounter_id DESC
+            """, ids)
+            # Diagnosed or deleted through another worker since the set was loaded
+            stale = set(ids) - {row['encounter_id'] for row in rows}
+            if not stale:
+                return rows
+            with self._lock:
+                for encounter_id in stale:
+                    if self._entries is not None:
+                        self._entries.pop(encounter_id, None)
+            candidates = [item for item in candidates if item[1] not in stale]
+
+    def stats(self):
+        with self._lock:
+            return {'loaded': self._entries is not None, 'encounters': len(self._entries or ())}
+
+
+undiagnosed = UndiagnosedEncounters()
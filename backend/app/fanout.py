@@ -0,0 +1,61 @@
+# Concurrent read-only queries over pooled connections
+#
+# Pages that need several independent result sets (e.g. an encounter and all
+# of its related rows) can send them at once instead of one after another on
+# a single connection, so their latency is that of the slowest query rather
+# than the sum of all of them.
+from concurrent.futures import ThreadPoolExecutor
+from mysql.connector import Error
+from .db import get_db_connection, get_db_cursor, DB_POOL_SIZE
+
+# Kept below the pool size so fan-out requests leave connections for everyone else
+FANOUT_WORKERS = max(2, DB_POOL_SIZE // 2)
+
+_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+
+
+def _fetch(query, params):
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = get_db_cursor(conn)
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        if conn and conn.is_connected(): cursor.close(); conn.close()
+
+
+def fetch_all(queries):
+    """
+    Run {name: (query, params)} concurrently, each on its own pooled
+    connection, and return {name: rows} in the same order. A single query
+    runs on the calling thread.
+    """
+    if len(queries) <= 1:
+        return {name: _fetch(query, params) for name, (query, params) in queries.items()}
+
+    futures = {name: _executor.submit(_fetch, query, params) for name, (query, params) in queries.items()}
+    results = {}
+    errors = []
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Error as e:
+            errors.append(f"{name}: {e}")
+    if errors:
+        raise Error(f"Error fetching {', '.join(errors)}")
+    return results
+
+
+def parse_include(value, available):
+    """
+    Parse an `include=a,b` parameter against the available section names.
+    An empty value selects every section; unknown names raise ValueError.
+    """
+    if not value:
+        return list(available)
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown include: {', '.join(unknown)}. Available: {', '.join(available)}")
+    return [name for name in available if name in names]
@@ -1,89 +1,112 @@
 # Hospital Management System data models
+from decimal import Decimal
 from .db import get_db_connection, get_db_cursor
-from .utils import generate_new_id
+from .utils import generate_new_id, use_or_generate_id
+from .query import ListQuery, Join, Filter, Lookup
+from . import typeahead, rollups, cache, refdata, catalog, encounter_lookup, sequences, streaming, bulk
+from .search import SearchSpec, PATIENT_NAME, PROVIDER_SEARCH, DEPARTMENT_HEAD_NAME
 from mysql.connector import Error
 
 
+def _rows_by_ids(query, key_column, ids, what):
+    """
+    Run a ROW_QUERY for many keys with one WHERE key IN (...) statement.
+    Returns {key: row} for the keys that exist.
+    """
+    ids = list(ids)
+    if not ids:
+        return {}
+    key_name = key_column.split('.')[-1]
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = get_db_cursor(conn)
+        cursor.execute(f"{query} WHERE {key_column} IN ({', '.join(['%s'] * len(ids))})", ids)
+        return {row[key_name]: row for row in cursor.fetchall()}
+    except Error as e: raise Error(f"Error fetching {what}: {e}")
+    finally:
+        if conn and conn.is_connected(): cursor.close(); conn.close()
+
+
 class PatientsModel:
     SORTABLE_COLUMNS = {
         "registration_date": "p.registration_date", "patient_id": "p.patient_id",
         "first_name": "p.first_name", "last_name": "p.last_name",
         "age": "p.age", "gender": "p.gender"
     }
-    
-    @staticmethod
-    def get_all(limit=1000, page=1, search=None, filters=None, sort_by="registration_date", sort_dir="desc"):
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = get_db_cursor(conn)
-            
-            base_query = "SELECT p.*, i.name AS insurance_name FROM patients p LEFT JOIN insurers i ON p.insurance_type = i.code WHERE 1 = 1"
-            params = []
-            
-            if search:
-                like_term = f"%{search}%"
-                base_query += " AND (p.patient_id LIKE %s OR p.first_name LIKE %s OR p.last_name LIKE %s OR CONCAT(p.first_name, ' ', p.last_name) LIKE %s OR p.phone LIKE %s OR p.email LIKE %s)"
-                params.extend([like_term] * 6)
-            
-            filters = filters or {}
-            if filters.get('patient_id'): base_query += " AND p.patient_id LIKE %s"; params.append(f"%{filters['patient_id']}%")
-            if filters.get('first_name'): base_query += " AND p.first_name LIKE %s"; params.append(f"%{filters['first_name']}%")
-            if filters.get('last_name'): base_query += " AND p.last_name LIKE %s"; params.append(f"%{filters['last_name']}%")
-            if filters.get('gender'): base_query += " AND LOWER(p.gender) = LOWER(%s)"; params.append(filters['gender'])
-            if filters.get('insurance_type'): base_query += " AND p.insurance_type = %s"; params.append(filters['insurance_type'])
-            if filters.get('age_exact') is not None: base_query += " AND p.age = %s"; params.append(filters['age_exact'])
-            if filters.get('age_min') is not None: base_query += " AND p.age >= %s"; params.append(filters['age_min'])
-            if filters.get('age_max') is not None: base_query += " AND p.age <= %s"; params.append(filters['age_max'])
-            if filters.get('city'): base_query += " AND p.city LIKE %s"; params.append(f"%{filters['city']}%")
-            if filters.get('state'): base_query += " AND p.state LIKE %s"; params.append(f"%{filters['state']}%")
-            if filters.get('registration_from'): base_query += " AND p.registration_date >= %s"; params.append(filters['registration_from'])
-            if filters.get('registration_to'): base_query += " AND p.registration_date <= %s"; params.append(filters['registration_to'])
-            
-            count_query = f"SELECT COUNT(*) as total FROM ({base_query}) as filtered"
-            cursor.execute(count_query, params)
-            total_count = cursor.fetchone()['total']
-            
-            sort_column = PatientsModel.SORTABLE_COLUMNS.get(sort_by, "p.registration_date")
-            sort_direction = "ASC" if str(sort_dir).lower() == "asc" else "DESC"
-            offset = (page - 1) * limit
-            query = f"{base_query} ORDER BY {sort_column} {sort_direction} LIMIT %s OFFSET %s"
-            params.extend([limit, offset])
-            
-            cursor.execute(query, params)
-            patients = cursor.fetchall()
-            
-            return {
-                'data': patients,
-                'total': total_count,
-                'page': page,
-                'per_page': limit,
-                'total_pages': (total_count + limit - 1) // limit
-            }
+    PRIMARY_KEY = "p.patient_id"
+    SEARCH = SearchSpec(
+        fulltext=[("p.first_name", "p.last_name")],
+        prefix=["p.patient_id", "p.phone", "p.email"]
+    )
+    QUERY = ListQuery(
+        "patients p",
+        columns=["p.*"],
+        fields=["patient_id", "first_name", "last_name", "dob", "age", "gender", "ethnicity", "insurance_type",
+                "marital_status", "address", "city", "state", "zip", "phone", "email", "registration_date"],
+        lookups=[Lookup("insurance_name", "p.insurance_type", refdata.insurer_name)],
+        filters={
+            "patient_id": Filter("p.patient_id"),
+            "first_name": Filter("p.first_name"),
+            "last_name": Filter("p.last_name"),
+            "gender": Filter("p.gender", "ieq"),
+            "insurance_type": Filter("p.insurance_type", "eq"),
+            "age_exact": Filter("p.age", "eq", keep_falsy=True),
+            "age_min": Filter("p.age", "gte", keep_falsy=True),
+            "age_max": Filter("p.age", "lte", keep_falsy=True),
+            "city": Filter("p.city"),
+            "state": Filter("p.state"),
+            "registration_from": Filter("p.registration_date", "gte"),
+            "registration_to": Filter("p.registration_date", "lte"),
+        },
+        sortable=SORTABLE_COLUMNS, default_sort="p.registration_date",
+        primary_key=PRIMARY_KEY, search=SEARCH
+    )
+    
+    @staticmethod
+    def get_all(limit=1000, page=1, search=None, filters=None, sort_by="registration_date", sort_dir="desc", after=None, count='exact', fields=None):
+        conn = None
+        try:
+            conn = get_db_connection()
+            cursor = get_db_cursor(conn)
+            return PatientsModel.QUERY.paginate(cursor, search, filters, sort_by, sort_dir, limit, page, after, count, fields)
         except Error as e: raise Error(f"Error fetching patients: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
 
     @staticmethod
+    def export(search=None, filters=None, sort_by="registration_date", sort_dir="desc", fields=None):
+        """Every row matching the list query, for streaming (see streaming.Export)."""
+        return streaming.Export(PatientsModel.QUERY, search, filters, sort_by, sort_dir, fields)
+
+    ROW_QUERY = """
+        SELECT p.*,
+               i.name as insurance_name,
+               i.insurer_id as insurance_id_fk
+        FROM patients p
+        LEFT JOIN insurers i ON p.insurance_type = i.code
+    """
+
+    @staticmethod
+    @cache.cached('patients', lambda row: [('insurers', row.get('insurance_id_fk'))])
     def get_by_id(patient_id):
         conn = None
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            query = """
-                SELECT p.*, 
-                       i.name as insurance_name, 
-                       i.insurer_id as insurance_id_fk 
-                FROM patients p
-                LEFT JOIN insurers i ON p.insurance_type = i.code
-                WHERE p.patient_id = %s
-            """
+            query = f"{PatientsModel.ROW_QUERY} WHERE p.patient_id = %s"
             cursor.execute(query, (patient_id,))
             return cursor.fetchone()
         except Error as e: raise Error(f"Error fetching patient: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
 
+    @staticmethod
+    @cache.cached_many('patients', lambda row: [('insurers', row.get('insurance_id_fk'))])
+    def get_by_ids(patient_ids):
+        """Many patients in one query, as {patient_id: row}; IDs without a row are left out."""
+        return _rows_by_ids(PatientsModel.ROW_QUERY, 'p.patient_id', patient_ids, 'patients')
+
     @staticmethod
     def add(patient_data):
         conn = None
@@ -137,6 +160,7 @@ class PatientsModel:
             )
             cursor.execute(query, values)
             conn.commit()
+            typeahead.patients.refresh(patient_id)
             return patient_id
         except ValueError as ve:
             if conn: conn.rollback()
@@ -192,6 +216,8 @@ class PatientsModel:
             values.append(patient_id)
             cursor.execute(f"UPDATE patients SET {', '.join(fields)} WHERE patient_id = %s", values)
             conn.commit()
+            cache.invalidate('patients', patient_id)
+            typeahead.patients.refresh(patient_id)
             return cursor.rowcount > 0
         except ValueError as ve:
             if conn: conn.rollback()
@@ -212,6 +238,8 @@ class PatientsModel:
             if cursor.fetchone()['cnt'] > 0: raise Error(f"Cannot delete patient {patient_id}: Delete related encounters first.")
             cursor.execute("DELETE FROM patients WHERE patient_id = %s", (patient_id,))
             conn.commit()
+            cache.invalidate('patients', patient_id)
+            typeahead.patients.remove(patient_id)
             return cursor.rowcount > 0
         except Error as e:
             if conn: conn.rollback()
@@ -227,81 +255,75 @@ class EncountersModel:
         "department": "e.department", "visit_type": "e.visit_type",
         "status": "e.status", "length_of_stay": "e.length_of_stay"
     }
-    
-    @staticmethod
-    def get_all(limit=1000, page=1, search=None, filters=None, sort_by="visit_date", sort_dir="desc"):
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = get_db_cursor(conn)
-            
-            # Build base query
-            base_query = """
-                SELECT e.*, p.first_name AS patient_first_name, p.last_name AS patient_last_name,
-                       pr.name AS provider_name, pr.department AS provider_department
-                FROM encounters e
-                LEFT JOIN patients p ON e.patient_id = p.patient_id
-                LEFT JOIN providers pr ON e.provider_id = pr.provider_id
-                WHERE 1 = 1
-            """
-            params = []
-            if search:
-                like_term = f"%{search}%"
-                base_query += " AND (e.encounter_id LIKE %s OR e.patient_id LIKE %s OR e.provider_id LIKE %s OR CONCAT(p.first_name, ' ', p.last_name) LIKE %s OR pr.name LIKE %s OR e.department LIKE %s OR e.visit_type LIKE %s)"
-                params.extend([like_term] * 7)
-            
-            filters = filters or {}
-            if filters.get('encounter_id'): base_query += " AND e.encounter_id LIKE %s"; params.append(f"%{filters['encounter_id']}%")
-            if filters.get('patient_id'): base_query += " AND e.patient_id LIKE %s"; params.append(f"%{filters['patient_id']}%")
-            if filters.get('provider_id'): base_query += " AND e.provider_id LIKE %s"; params.append(f"%{filters['provider_id']}%")
-            if filters.get('patient_name'): base_query += " AND CONCAT(p.first_name, ' ', p.last_name) LIKE %s"; params.append(f"%{filters['patient_name']}%")
-            if filters.get('provider_name'): base_query += " AND pr.name LIKE %s"; params.append(f"%{filters['provider_name']}%")
-            if filters.get('department'): base_query += " AND e.department LIKE %s"; params.append(f"%{filters['department']}%")
-            if filters.get('visit_type'): base_query += " AND e.visit_type LIKE %s"; params.append(f"%{filters['visit_type']}%")
-            if filters.get('status'): base_query += " AND e.status = %s"; params.append(filters['status'])
-            if filters.get('readmitted_flag') is not None: base_query += " AND e.readmitted_flag = %s"; params.append(filters['readmitted_flag'])
-            if filters.get('visit_from'): base_query += " AND e.visit_date >= %s"; params.append(filters['visit_from'])
-            if filters.get('visit_to'): base_query += " AND e.visit_date <= %s"; params.append(filters['visit_to'])
-            
-            count_query = f"SELECT COUNT(*) as total FROM ({base_query}) as filtered"
-            cursor.execute(count_query, params)
-            total_count = cursor.fetchone()['total']
-            
-            sort_col = EncountersModel.SORTABLE_COLUMNS.get(sort_by, "e.visit_date")
-            sort_d = "ASC" if str(sort_dir).lower() == "asc" else "DESC"
-            offset = (page - 1) * limit
-            query = f"{base_query} ORDER BY {sort_col} {sort_d} LIMIT %s OFFSET %s"
-            params.extend([limit, offset])
-            
-            cursor.execute(query, params)
-            encounters = cursor.fetchall()
-            
-            return {
-                'data': encounters,
-                'total': total_count,
-                'page': page,
-                'per_page': limit,
-                'total_pages': (total_count + limit - 1) // limit
-            }
+    PRIMARY_KEY = "e.encounter_id"
+    SEARCH = SearchSpec(
+        fulltext=[("e.department", "e.visit_type")],
+        prefix=["e.encounter_id", "e.patient_id", "e.provider_id"],
+        related=[("e.patient_id", PATIENT_NAME), ("e.provider_id", PROVIDER_SEARCH)]
+    )
+    QUERY = ListQuery(
+        "encounters e",
+        columns=["e.*", "p.first_name AS patient_first_name", "p.last_name AS patient_last_name",
+                 "pr.name AS provider_name", "pr.department AS provider_department"],
+        fields=["encounter_id", "patient_id", "provider_id", "visit_date", "visit_type", "department",
+                "reason_for_visit", "diagnosis_code", "admission_type", "discharge_date", "length_of_stay",
+                "status", "readmitted_flag"],
+        joins=[
+            Join("p", "LEFT JOIN patients p ON e.patient_id = p.patient_id"),
+            Join("pr", "LEFT JOIN providers pr ON e.provider_id = pr.provider_id"),
+        ],
+        filters={
+            "encounter_id": Filter("e.encounter_id"),
+            "patient_id": Filter("e.patient_id"),
+            "provider_id": Filter("e.provider_id"),
+            "patient_name": Filter("CONCAT(p.first_name, ' ', p.last_name)"),
+            "provider_name": Filter("pr.name"),
+            "department": Filter("e.department"),
+            "visit_type": Filter("e.visit_type"),
+            "status": Filter("e.status", "eq"),
+            "readmitted_flag": Filter("e.readmitted_flag", "eq", keep_falsy=True),
+            "visit_from": Filter("e.visit_date", "gte"),
+            "visit_to": Filter("e.visit_date", "lte"),
+        },
+        sortable=SORTABLE_COLUMNS, default_sort="e.visit_date",
+        primary_key=PRIMARY_KEY, search=SEARCH
+    )
+    
+    @staticmethod
+    def get_all(limit=1000, page=1, search=None, filters=None, sort_by="visit_date", sort_dir="desc", after=None, count='exact', fields=None):
+        conn = None
+        try:
+            conn = get_db_connection()
+            cursor = get_db_cursor(conn)
+            return EncountersModel.QUERY.paginate(cursor, search, filters, sort_by, sort_dir, limit, page, after, count, fields)
         except Error as e: raise Error(f"Error fetching encounters: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
-    
+
+    @staticmethod
+    def export(search=None, filters=None, sort_by="visit_date", sort_dir="desc", fields=None):
+        """Every row matching the list query, for streaming (see streaming.Export)."""
+        return streaming.Export(EncountersModel.QUERY, search, filters, sort_by, sort_dir, fields)
+    
+    ROW_QUERY = """
+        SELECT e.*,
+               p.first_name as patient_first_name,
+               p.last_name as patient_last_name,
+               pr.name as provider_name,
+               pr.department as provider_department
+        FROM encounters e
+        LEFT JOIN patients p ON e.patient_id = p.patient_id
+        LEFT JOIN providers pr ON e.provider_id = pr.provider_id
+    """
+
     @staticmethod
+    @cache.cached('encounters', lambda row: [('patients', row.get('patient_id')), ('providers', row.get('provider_id'))])
     def get_by_id(encounter_id):
         conn = None
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            query = """SELECT e.*, 
-                       p.first_name as patient_first_name, 
-                       p.last_name as patient_last_name, 
-                       pr.name as provider_name,
-                       pr.department as provider_department
-                       FROM encounters e 
-                       LEFT JOIN patients p ON e.patient_id = p.patient_id 
-                       LEFT JOIN providers pr ON e.provider_id = pr.provider_id 
-                       WHERE e.encounter_id = %s"""
+            query = f"{EncountersModel.ROW_QUERY} WHERE e.encounter_id = %s"
             cursor.execute(query, (encounter_id,))
             result = cursor.fetchone()
             
@@ -314,6 +336,17 @@ class EncountersModel:
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
 
+    @staticmethod
+    @cache.cached_many('encounters', lambda row: [('patients', row.get('patient_id')), ('providers', row.get('provider_id'))])
+    def get_by_ids(encounter_ids):
+        """Many encounters in one query, as {encounter_id: row}; IDs without a row are left out."""
+        rows = _rows_by_ids(EncountersModel.ROW_QUERY, 'e.encounter_id', encounter_ids, 'encounters')
+        # Same department fallback as get_by_id()
+        for row in rows.values():
+            if not row.get('department') and row.get('provider_department'):
+                row['department'] = row['provider_department']
+        return rows
+
     @staticmethod
     def add(encounter_data):
         """
@@ -383,7 +416,9 @@ class EncountersModel:
                 readmitted_flag
             )
             cursor.execute(query, values)
+            rollups.apply_change(cursor, 'encounters', [], rollups.capture(cursor, 'encounters', [eid]))
             conn.commit()
+            encounter_lookup.undiagnosed.refresh(eid)
             return eid
         except ValueError as ve:
             if conn: conn.rollback()
@@ -439,9 +474,17 @@ class EncountersModel:
                 return False
             
             values.append(encounter_id)
+            counted = any(key in data for key in ('status', 'patient_id', 'length_of_stay', 'visit_date'))
+            before = rollups.capture(cursor, 'encounters', [encounter_id]) if counted else []
             cursor.execute(f"UPDATE encounters SET {', '.join(fields)} WHERE encounter_id = %s", values)
+            updated = cursor.rowcount
+            if updated and counted:
+                rollups.apply_change(cursor, 'encounters', before, rollups.capture(cursor, 'encounters', [encounter_id]))
             conn.commit()
-            return cursor.rowcount > 0
+            cache.invalidate('encounters', encounter_id)
+            if 'visit_date' in data or 'patient_id' in data:
+                encounter_lookup.undiagnosed.refresh(encounter_id)
+            return updated > 0
         except ValueError as ve:
             if conn: conn.rollback()
             raise ve
@@ -459,15 +502,33 @@ class EncountersModel:
             cursor = get_db_cursor(conn)
             cursor.execute("SELECT COUNT(*) as cnt FROM claims_and_billing WHERE encounter_id = %s", (encounter_id,))
             if cursor.fetchone()['cnt'] > 0: raise Error("Cannot delete encounter: It has linked billing records.")
+            # Procedures, lab tests and diagnoses go with the encounter (ON DELETE CASCADE)
+            cursor.execute("SELECT procedure_id FROM procedures WHERE encounter_id = %s", (encounter_id,))
+            procedures = rollups.capture(cursor, 'procedures', [row['procedure_id'] for row in cursor.fetchall()])
+            before = rollups.capture(cursor, 'encounters', [encounter_id])
             cursor.execute("DELETE FROM encounters WHERE encounter_id = %s", (encounter_id,))
+            deleted = cursor.rowcount
+            rollups.apply_change(cursor, 'procedures', procedures, [])
+            rollups.apply_change(cursor, 'encounters', before, [])
             conn.commit()
-            return cursor.rowcount > 0
+            # Also drops the cached line items, which depend on the encounter
+            cache.invalidate('encounters', encounter_id)
+            catalog.procedures.invalidate()
+            catalog.diagnoses.invalidate()
+            catalog.lab_tests.invalidate()
+            encounter_lookup.undiagnosed.discard(encounter_id)
+            return deleted > 0
         except Error as e:
             if conn: conn.rollback()
             raise Error(f"Error deleting encounter: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
 
+    @staticmethod
+    def lookup(search=None, limit=50):
+        """Most recent encounters for the form pickers (narrow columns, ID prefix or patient search, no count)."""
+        return encounter_lookup.search(search, limit)
+
 
 # Helper models for dropdowns
 class ProvidersModel:
@@ -521,9 +582,26 @@ class InsurersModel:
         "name": "name",
         "payer_type": "payer_type"
     }
-    
-    @staticmethod
-    def get_all(limit=1000, page=1, search=None, filters=None, sort_by="name", sort_dir="asc"):
+    PRIMARY_KEY = "insurer_id"
+    SEARCH = SearchSpec(
+        fulltext=[("name",)],
+        prefix=["CAST(insurer_id AS CHAR)", "code", "payer_type", "phone"]
+    )
+    QUERY = ListQuery(
+        "insurers",
+        columns=["*"],
+        fields=["insurer_id", "code", "name", "payer_type", "phone"],
+        filters={
+            "code": Filter("code"),
+            "name": Filter("name"),
+            "payer_type": Filter("payer_type", "eq"),
+        },
+        sortable=SORTABLE_COLUMNS, default_sort="name",
+        primary_key=PRIMARY_KEY, search=SEARCH
+    )
+    
+    @staticmethod
+    def get_all(limit=1000, page=1, search=None, filters=None, sort_by="name", sort_dir="asc", after=None, count='exact', fields=None):
         """
         Get all insurers with optional search, filters, sorting, and pagination.
         Uses SQL LIKE for search and filtering.
@@ -532,60 +610,35 @@ class InsurersModel:
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            
-            # Build base query for filtering
-            base_query = "SELECT * FROM insurers WHERE 1 = 1"
-            params = []
-            
-            if search:
-                like_term = f"%{search}%"
-                # For INT insurer_id, use CAST to VARCHAR for LIKE search, or check if search is numeric for exact match
-                base_query += " AND (CAST(insurer_id AS CHAR) LIKE %s OR code LIKE %s OR name LIKE %s OR payer_type LIKE %s OR phone LIKE %s)"
-                params.extend([like_term] * 5)
-            
-            filters = filters or {}
-            if filters.get('code'): base_query += " AND code LIKE %s"; params.append(f"%{filters['code']}%")
-            if filters.get('name'): base_query += " AND name LIKE %s"; params.append(f"%{filters['name']}%")
-            if filters.get('payer_type'): base_query += " AND payer_type = %s"; params.append(filters['payer_type'])
-            
-            # Get total count
-            count_query = f"SELECT COUNT(*) as total FROM ({base_query}) as filtered"
-            cursor.execute(count_query, params)
-            total_count = cursor.fetchone()['total']
-            
-            # Apply sorting and pagination
-            sort_column = InsurersModel.SORTABLE_COLUMNS.get(sort_by, "name")
-            sort_direction = "ASC" if str(sort_dir).lower() == "asc" else "DESC"
-            offset = (page - 1) * limit
-            query = f"{base_query} ORDER BY {sort_column} {sort_direction} LIMIT %s OFFSET %s"
-            params.extend([limit, offset])
-            
-            cursor.execute(query, params)
-            insurers = cursor.fetchall()
-            
-            return {
-                'data': insurers,
-                'total': total_count,
-                'page': page,
-                'per_page': limit,
-                'total_pages': (total_count + limit - 1) // limit
-            }
+            return InsurersModel.QUERY.paginate(cursor, search, filters, sort_by, sort_dir, limit, page, after, count, fields)
         except Error as e: raise Error(f"Error fetching insurers: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
     
+    ROW_QUERY = """
+        SELECT *
+        FROM insurers
+    """
+
     @staticmethod
+    @cache.cached('insurers')
     def get_by_id(insurer_id):
         conn = None
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            query = "SELECT * FROM insurers WHERE insurer_id = %s"
+            query = f"{InsurersModel.ROW_QUERY} WHERE insurer_id = %s"
             cursor.execute(query, (insurer_id,))
             return cursor.fetchone()
         except Error as e: raise Error(f"Error fetching insurer: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    @staticmethod
+    @cache.cached_many('insurers')
+    def get_by_ids(insurer_ids):
+        """Many insurers in one query, as {insurer_id: row}; IDs without a row are left out."""
+        return _rows_by_ids(InsurersModel.ROW_QUERY, 'insurer_id', insurer_ids, 'insurers')
     
     @staticmethod
     def add(insurer_data):
@@ -627,6 +680,7 @@ class InsurersModel:
             )
             cursor.execute(query, values)
             conn.commit()
+            refdata.refresh_after_write()
             return cursor.lastrowid  # Return the auto-generated insurer_id
         except ValueError as ve:
             if conn: conn.rollback()
@@ -674,6 +728,8 @@ class InsurersModel:
             values.append(insurer_id)
             cursor.execute(f"UPDATE insurers SET {', '.join(fields)} WHERE insurer_id = %s", values)
             conn.commit()
+            cache.invalidate('insurers', insurer_id)
+            refdata.refresh_after_write()
             return cursor.rowcount > 0
         except ValueError as ve:
             if conn: conn.rollback()
@@ -702,6 +758,8 @@ class InsurersModel:
             
             cursor.execute("DELETE FROM insurers WHERE insurer_id = %s", (insurer_id,))
             conn.commit()
+            cache.invalidate('insurers', insurer_id)
+            refdata.refresh_after_write()
             return cursor.rowcount > 0
         except Error as e:
             if conn: conn.rollback()
@@ -721,9 +779,39 @@ class ClaimsAndBillingModel:
         "billed_amount": "cb.billed_amount",
         "claim_status": "cb.claim_status"
     }
-    
-    @staticmethod
-    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='claim_billing_date', sort_dir='desc'):
+    PRIMARY_KEY = "cb.billing_id"
+    SEARCH = SearchSpec(
+        prefix=["cb.billing_id", "cb.claim_id", "cb.encounter_id", "cb.claim_status"],
+        related=[("cb.patient_id", PATIENT_NAME)]
+    )
+    QUERY = ListQuery(
+        "claims_and_billing cb",
+        columns=["cb.*", "p.first_name", "p.last_name", "e.visit_date"],
+        fields=["billing_id", "patient_id", "encounter_id", "insurance_provider", "payment_method", "claim_id",
+                "claim_billing_date", "billed_amount", "paid_amount", "claim_status", "denial_reason"],
+        joins=[
+            Join("p", "LEFT JOIN patients p ON cb.patient_id = p.patient_id"),
+            Join("e", "LEFT JOIN encounters e ON cb.encounter_id = e.encounter_id"),
+        ],
+        lookups=[Lookup("insurer_name", "p.insurance_type", refdata.insurer_name)],
+        filters={
+            "billing_id": Filter("cb.billing_id"),
+            "claim_id": Filter("cb.claim_id"),
+            "encounter_id": Filter("cb.encounter_id"),
+            "patient_id": Filter("cb.patient_id"),
+            "claim_status": Filter("cb.claim_status", "eq"),
+            "billed_amount_min": Filter("cb.billed_amount", "gte", keep_falsy=True),
+            "billed_amount_max": Filter("cb.billed_amount", "lte", keep_falsy=True),
+            "claim_date_from": Filter("cb.claim_billing_date", "gte"),
+            "claim_date_to": Filter("cb.claim_billing_date", "lte"),
+            "payment_method": Filter("cb.payment_method", "eq"),
+        },
+        sortable=SORTABLE_COLUMNS, default_sort="cb.claim_billing_date",
+        primary_key=PRIMARY_KEY, search=SEARCH
+    )
+    
+    @staticmethod
+    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='claim_billing_date', sort_dir='desc', after=None, count='exact', fields=None):
         """
         Get all claims with optional search, filters, sorting, and pagination.
         Uses SQL LIKE for search and filtering.
@@ -732,119 +820,47 @@ class ClaimsAndBillingModel:
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            
-            # Build base query with JOINs
-            base_query = """
-                SELECT cb.*, 
-                       p.first_name, p.last_name, 
-                       e.visit_date, i.name as insurer_name
-                FROM claims_and_billing cb
-                LEFT JOIN patients p ON cb.patient_id = p.patient_id
-                LEFT JOIN encounters e ON cb.encounter_id = e.encounter_id
-                LEFT JOIN insurers i ON p.insurance_type = i.code
-                WHERE 1=1
-            """
-            params = []
-            
-            # General search
-            if search:
-                like_term = f"%{search}%"
-                base_query += """
-                    AND (cb.billing_id LIKE %s OR cb.claim_id LIKE %s OR cb.encounter_id LIKE %s 
-                    OR CONCAT(p.first_name, ' ', p.last_name) LIKE %s OR cb.claim_status LIKE %s)
-                """
-                params.extend([like_term] * 5)
-            
-            # Detailed filters
-            filters = filters or {}
-            if filters.get('billing_id'): base_query += " AND cb.billing_id LIKE %s"; params.append(f"%{filters['billing_id']}%")
-            if filters.get('claim_id'): base_query += " AND cb.claim_id LIKE %s"; params.append(f"%{filters['claim_id']}%")
-            if filters.get('encounter_id'): base_query += " AND cb.encounter_id LIKE %s"; params.append(f"%{filters['encounter_id']}%")
-            if filters.get('patient_id'): base_query += " AND cb.patient_id LIKE %s"; params.append(f"%{filters['patient_id']}%")
-            if filters.get('claim_status'): base_query += " AND cb.claim_status = %s"; params.append(filters['claim_status'])
-            if filters.get('billed_amount_min') is not None: base_query += " AND cb.billed_amount >= %s"; params.append(filters['billed_amount_min'])
-            if filters.get('billed_amount_max') is not None: base_query += " AND cb.billed_amount <= %s"; params.append(filters['billed_amount_max'])
-            if filters.get('claim_date_from'): base_query += " AND cb.claim_billing_date >= %s"; params.append(filters['claim_date_from'])
-            if filters.get('claim_date_to'): base_query += " AND cb.claim_billing_date <= %s"; params.append(filters['claim_date_to'])
-            if filters.get('payment_method'): base_query += " AND cb.payment_method = %s"; params.append(filters['payment_method'])
-            
-            # Get total count - build separate count query without SELECT columns
-            count_base = """
-                SELECT COUNT(*) as total
-                FROM claims_and_billing cb
-                LEFT JOIN patients p ON cb.patient_id = p.patient_id
-                LEFT JOIN encounters e ON cb.encounter_id = e.encounter_id
-                LEFT JOIN insurers i ON p.insurance_type = i.code
-                WHERE 1=1
-            """
-            count_params = []
-            
-            # Apply same filters to count query
-            if search:
-                like_term = f"%{search}%"
-                count_base += """
-                    AND (cb.billing_id LIKE %s OR cb.claim_id LIKE %s OR cb.encounter_id LIKE %s 
-                    OR CONCAT(p.first_name, ' ', p.last_name) LIKE %s OR cb.claim_status LIKE %s)
-                """
-                count_params.extend([like_term] * 5)
-            
-            if filters.get('billing_id'): count_base += " AND cb.billing_id LIKE %s"; count_params.append(f"%{filters['billing_id']}%")
-            if filters.get('claim_id'): count_base += " AND cb.claim_id LIKE %s"; count_params.append(f"%{filters['claim_id']}%")
-            if filters.get('encounter_id'): count_base += " AND cb.encounter_id LIKE %s"; count_params.append(f"%{filters['encounter_id']}%")
-            if filters.get('patient_id'): count_base += " AND cb.patient_id LIKE %s"; count_params.append(f"%{filters['patient_id']}%")
-            if filters.get('claim_status'): count_base += " AND cb.claim_status = %s"; count_params.append(filters['claim_status'])
-            if filters.get('billed_amount_min') is not None: count_base += " AND cb.billed_amount >= %s"; count_params.append(filters['billed_amount_min'])
-            if filters.get('billed_amount_max') is not None: count_base += " AND cb.billed_amount <= %s"; count_params.append(filters['billed_amount_max'])
-            if filters.get('claim_date_from'): count_base += " AND cb.claim_billing_date >= %s"; count_params.append(filters['claim_date_from'])
-            if filters.get('claim_date_to'): count_base += " AND cb.claim_billing_date <= %s"; count_params.append(filters['claim_date_to'])
-            if filters.get('payment_method'): count_base += " AND cb.payment_method = %s"; count_params.append(filters['payment_method'])
-            
-            cursor.execute(count_base, count_params)
-            count_result = cursor.fetchone()
-            total_count = count_result['total'] if count_result else 0
-            
-            # Apply sorting and pagination
-            sort_col = ClaimsAndBillingModel.SORTABLE_COLUMNS.get(sort_by, 'cb.claim_billing_date')
-            sort_d = 'ASC' if str(sort_dir).lower() == 'asc' else 'DESC'
-            offset = (page - 1) * limit
-            query = f"{base_query} ORDER BY {sort_col} {sort_d} LIMIT %s OFFSET %s"
-            params.extend([limit, offset])
-            
-            cursor.execute(query, params)
-            claims = cursor.fetchall()
-            
-            return {
-                'data': claims,
-                'total': total_count,
-                'page': page,
-                'per_page': limit,
-                'total_pages': (total_count + limit - 1) // limit
-            }
+            return ClaimsAndBillingModel.QUERY.paginate(cursor, search, filters, sort_by, sort_dir, limit, page, after, count, fields)
         except Error as e: raise Error(f"Error fetching claims: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
-    
+
+    @staticmethod
+    def export(search=None, filters=None, sort_by='claim_billing_date', sort_dir='desc', fields=None):
+        """Every row matching the list query, for streaming (see streaming.Export)."""
+        return streaming.Export(ClaimsAndBillingModel.QUERY, search, filters, sort_by, sort_dir, fields)
+    
+    ROW_QUERY = """
+        SELECT cb.*,
+               p.first_name, p.last_name,
+               e.visit_date, i.name as insurer_name
+        FROM claims_and_billing cb
+        LEFT JOIN patients p ON cb.patient_id = p.patient_id
+        LEFT JOIN encounters e ON cb.encounter_id = e.encounter_id
+        LEFT JOIN insurers i ON p.insurance_type = i.code
+    """
+
     @staticmethod
+    @cache.cached('claims', lambda row: [('patients', row.get('patient_id')), ('encounters', row.get('encounter_id')),
+                                    ('insurers', cache.ANY)])
     def get_by_id(billing_id):
         conn = None
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            query = """
-                SELECT cb.*, 
-                       p.first_name, p.last_name, 
-                       e.visit_date, i.name as insurer_name
-                FROM claims_and_billing cb
-                LEFT JOIN patients p ON cb.patient_id = p.patient_id
-                LEFT JOIN encounters e ON cb.encounter_id = e.encounter_id
-                LEFT JOIN insurers i ON p.insurance_type = i.code
-                WHERE cb.billing_id = %s
-            """
+            query = f"{ClaimsAndBillingModel.ROW_QUERY} WHERE cb.billing_id = %s"
             cursor.execute(query, (billing_id,))
             return cursor.fetchone()
         except Error as e: raise Error(f"Error fetching claim: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    @staticmethod
+    @cache.cached_many('claims', lambda row: [('patients', row.get('patient_id')), ('encounters', row.get('encounter_id')),
+                                         ('insurers', cache.ANY)])
+    def get_by_ids(billing_ids):
+        """Many claims in one query, as {billing_id: row}; IDs without a row are left out."""
+        return _rows_by_ids(ClaimsAndBillingModel.ROW_QUERY, 'cb.billing_id', billing_ids, 'claims')
     
     @staticmethod
     def add(claim_data):
@@ -904,6 +920,7 @@ class ClaimsAndBillingModel:
             )
             
             cursor.execute(query, values)
+            rollups.apply_change(cursor, 'claims', [], rollups.capture(cursor, 'claims', [bill_id]))
             conn.commit()
             return bill_id
         except ValueError as ve:
@@ -951,9 +968,13 @@ class ClaimsAndBillingModel:
                 return False
             
             values.append(billing_id)
+            before = rollups.capture(cursor, 'claims', [billing_id])
             cursor.execute(f"UPDATE claims_and_billing SET {', '.join(fields)} WHERE billing_id = %s", values)
+            updated = cursor.rowcount
+            rollups.apply_change(cursor, 'claims', before, rollups.capture(cursor, 'claims', [billing_id]))
             conn.commit()
-            return cursor.rowcount > 0
+            cache.invalidate('claims', billing_id)
+            return updated > 0
         except ValueError as ve:
             if conn: conn.rollback()
             raise ve
@@ -984,37 +1005,165 @@ class ClaimsAndBillingModel:
                     if result and result.get('cnt', 0) > 0:
                         raise Error(f"Cannot delete claim {billing_id}: It has {result['cnt']} denial record(s). Delete denial records first.")
             
+            before = rollups.capture(cursor, 'claims', [billing_id])
             cursor.execute("DELETE FROM claims_and_billing WHERE billing_id = %s", (billing_id,))
+            deleted = cursor.rowcount
+            rollups.apply_change(cursor, 'claims', before, [])
             conn.commit()
-            return cursor.rowcount > 0
+            cache.invalidate('claims', billing_id)
+            return deleted > 0
         except Error as e:
             if conn: conn.rollback()
             raise Error(f"Error deleting claim: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
     
+    # Line items billed on an encounter's claim: source -> (table, key column, cost column)
+    LINE_ITEMS = {
+        'procedures': ('procedures', 'procedure_id', 'procedure_cost'),
+        'medications': ('medications', 'medication_id', 'cost'),
+    }
+
+    @staticmethod
+    def lock_encounters(cursor, *encounter_ids):
+        """
+        Lock encounter rows (in a fixed order) for the rest of the transaction.
+        Line-item writes take this lock before touching their rows, so billed
+        amounts of one encounter are changed by one transaction at a time.
+        """
+        encounter_ids = sorted({eid for eid in encounter_ids if eid})
+        if not encounter_ids:
+            return
+        cursor.execute(f"""
+            SELECT encounter_id FROM encounters
+            WHERE encounter_id IN ({', '.join(['%s'] * len(encounter_ids))})
+            ORDER BY encounter_id
+            FOR UPDATE
+        """, encounter_ids)
+        cursor.fetchall()
+
+    @staticmethod
+    def line_item(cursor, source, key, lock=False):
+        """Return {encounter_id, cost} of a procedure/medication row, or None if it doesn't exist."""
+        table, key_col, cost_col = ClaimsAndBillingModel.LINE_ITEMS[source]
+        cursor.execute(
+            f"SELECT encounter_id, COALESCE({cost_col}, 0) AS cost FROM {table} WHERE {key_col} = %s"
+            + (" FOR UPDATE" if lock else ""),
+            (key,)
+        )
+        return cursor.fetchone()
+
+    @staticmethod
+    def _encounter_total(cursor, encounter_id):
+        cursor.execute("""
+            SELECT 
+                (SELECT COALESCE(SUM(procedure_cost), 0) FROM procedures WHERE encounter_id = %s) +
+                (SELECT COALESCE(SUM(cost), 0) FROM medications WHERE encounter_id = %s) 
+            AS total_amount
+        """, (encounter_id, encounter_id))
+        result = cursor.fetchone()
+        return Decimal(result['total_amount']) if result else Decimal(0)
+
+    @staticmethod
+    def _create_claim(cursor, encounter_id, total_amount):
+        """
+        Create the claim/bill of an encounter. Returns its billing_id, or None if the encounter doesn't exist.
+        Logic: billing_id comes from the BILL sequence. claim_id increments if not Selfpay.
+        """
+        # Fetch patient and insurance info
+        cursor.execute("""
+            SELECT p.patient_id, p.insurance_type 
+            FROM encounters e 
+            JOIN patients p ON e.patient_id = p.patient_id 
+            WHERE e.encounter_id = %s
+        """, (encounter_id,))
+        p_data = cursor.fetchone()
+        
+        if not p_data:
+            return None
+        
+        patient_id = p_data['patient_id']
+        insurance_type = p_data.get('insurance_type')
+        # From the sequence like every other claim, so it can't collide with add()
+        billing_id = generate_new_id(cursor, 'claims_and_billing', 'billing_id', 'BILL', 6)
+        
+        # Determine if Selfpay
+        is_selfpay = False
+        if insurance_type and ('self' in insurance_type.lower()):
+            is_selfpay = True
+        
+        if is_selfpay:
+            claim_id = None
+            payment_method = 'Selfpay'
+            insurance_provider = None
+        else:
+            claim_id = generate_new_id(cursor, 'claims_and_billing', 'claim_id', 'CLM', 6)
+            payment_method = 'Insurance'
+            insurance_provider = insurance_type
+        
+        insert_query = """
+            INSERT INTO claims_and_billing 
+            (billing_id, claim_id, patient_id, encounter_id, claim_billing_date, 
+             billed_amount, paid_amount, claim_status, payment_method, insurance_provider)
+            VALUES (%s, %s, %s, %s, NOW(), %s, 0, 'Pending', %s, %s)
+        """
+        cursor.execute(insert_query, (billing_id, claim_id, patient_id, encounter_id, total_amount, payment_method, insurance_provider))
+        rollups.apply_change(cursor, 'claims', [], rollups.capture(cursor, 'claims', [billing_id]))
+        return billing_id
+
+    @staticmethod
+    def apply_line_item_change(cursor, before, after):
+        """
+        Apply a line-item write to the claims, inside the writer's transaction.
+        `before`/`after` are line_item() rows from before and after the write
+        (None for an insert/delete). The claim's billed_amount (the encounter's
+        lowest billing_id, if it has several) is moved by the cost difference; an encounter without a claim gets one with its full
+        total. The caller must hold lock_encounters() for the encounters
+        involved. Returns the billing_ids changed, to invalidate after commit.
+        """
+        deltas = {}
+        if before and before['encounter_id']:
+            deltas[before['encounter_id']] = deltas.get(before['encounter_id'], 0) - Decimal(before['cost'])
+        if after and after['encounter_id']:
+            deltas[after['encounter_id']] = deltas.get(after['encounter_id'], 0) + Decimal(after['cost'])
+
+        billing_ids = []
+        for encounter_id, delta in deltas.items():
+            cursor.execute(
+                "SELECT billing_id FROM claims_and_billing WHERE encounter_id = %s ORDER BY billing_id LIMIT 1",
+                (encounter_id,)
+            )
+            claim = cursor.fetchone()
+            if claim:
+                if delta:
+                    cursor.execute(
+                        "UPDATE claims_and_billing SET billed_amount = billed_amount + %s WHERE billing_id = %s",
+                        (delta, claim['billing_id'])
+                    )
+                    billing_ids.append(claim['billing_id'])
+            elif after and after['encounter_id'] == encounter_id:
+                billing_id = ClaimsAndBillingModel._create_claim(
+                    cursor, encounter_id, ClaimsAndBillingModel._encounter_total(cursor, encounter_id))
+                if billing_id:
+                    billing_ids.append(billing_id)
+        return billing_ids
+
     @staticmethod
     def sync_claim_amount(encounter_id):
         """
-        Calculate total cost from procedures and medications for an encounter.
-        Updates existing claim or creates new one if doesn't exist.
-        Logic: bill_id = encounter_id. claim_id increments if not Selfpay.
+        Recalculate an encounter's claim from all of its procedures and medications.
+        Updates existing claim or creates new one if doesn't exist. Line-item
+        writes keep claims current themselves (apply_line_item_change); this is
+        for repairing a single encounter.
         """
         conn = None
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
+            ClaimsAndBillingModel.lock_encounters(cursor, encounter_id)
             
             # Calculate total amount (procedures + medications)
-            calc_query = """
-                SELECT 
-                    (SELECT COALESCE(SUM(procedure_cost), 0) FROM procedures WHERE encounter_id = %s) +
-                    (SELECT COALESCE(SUM(cost), 0) FROM medications WHERE encounter_id = %s) 
-                AS total_amount
-            """
-            cursor.execute(calc_query, (encounter_id, encounter_id))
-            result = cursor.fetchone()
-            total_amount = float(result['total_amount']) if result else 0.0
+            total_amount = ClaimsAndBillingModel._encounter_total(cursor, encounter_id)
             
             # Check if claim exists for this encounter
             cursor.execute("SELECT billing_id FROM claims_and_billing WHERE encounter_id = %s", (encounter_id,))
@@ -1024,60 +1173,217 @@ class ClaimsAndBillingModel:
                 # Update existing claim amount
                 cursor.execute("UPDATE claims_and_billing SET billed_amount = %s WHERE billing_id = %s", 
                              (total_amount, existing_claim['billing_id']))
-            else:
-                # Create new claim/bill
-                # Logic: bill_id derived from encounter_id (ENC -> BILL)
-                if encounter_id.startswith('ENC'):
-                    billing_id = 'BILL' + encounter_id[3:]
-                else:
-                    # Fallback if encounter_id format is unexpected
-                    billing_id = 'BILL' + encounter_id
-                
-                # Fetch patient and insurance info
-                cursor.execute("""
-                    SELECT p.patient_id, p.insurance_type 
-                    FROM encounters e 
-                    JOIN patients p ON e.patient_id = p.patient_id 
-                    WHERE e.encounter_id = %s
-                """, (encounter_id,))
-                p_data = cursor.fetchone()
-                
-                if not p_data:
-                    return False
-                
-                patient_id = p_data['patient_id']
-                insurance_type = p_data.get('insurance_type')
-                
-                # Determine if Selfpay
-                is_selfpay = False
-                if insurance_type and ('self' in insurance_type.lower()):
-                    is_selfpay = True
-                
-                if is_selfpay:
-                    claim_id = None
-                    payment_method = 'Selfpay'
-                    insurance_provider = None
-                else:
-                    claim_id = generate_new_id(cursor, 'claims_and_billing', 'claim_id', 'CLM', 6)
-                    payment_method = 'Insurance'
-                    insurance_provider = insurance_type
-                
-                insert_query = """
-                    INSERT INTO claims_and_billing 
-                    (billing_id, claim_id, patient_id, encounter_id, claim_billing_date, 
-                     billed_amount, paid_amount, claim_status, payment_method, insurance_provider)
-                    VALUES (%s, %s, %s, %s, NOW(), %s, 0, 'Pending', %s, %s)
-                """
-                cursor.execute(insert_query, (billing_id, claim_id, patient_id, encounter_id, total_amount, payment_method, insurance_provider))
+            elif not ClaimsAndBillingModel._create_claim(cursor, encounter_id, total_amount):
+                return False
             
             conn.commit()
+            if existing_claim:
+                cache.invalidate('claims', existing_claim['billing_id'])
             return True
         except Error as e:
             if conn: conn.rollback()
             raise Error(f"Error syncing claim amount: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
-    
+
+    @staticmethod
+    def reconcile(fix=False, limit=100):
+        """
+        Check every claim that has line items against the sum of its
+        encounter's procedure and medication costs (one grouped pass). With
+        fix=True mismatched claims are set to that sum; a claim whose amount
+        changed since it was checked is left for the next run.
+        Returns {checked, mismatched, fixed, claims} with up to `limit` mismatches listed.
+        """
+        conn = None
+        try:
+            conn = get_db_connection()
+            cursor = get_db_cursor(conn)
+            cursor.execute("""
+                SELECT cb.billing_id, cb.encounter_id, cb.billed_amount,
+                       COALESCE(pc.total, 0) + COALESCE(mc.total, 0) AS expected_amount
+                FROM claims_and_billing cb
+                LEFT JOIN (SELECT encounter_id, SUM(procedure_cost) AS total FROM procedures GROUP BY encounter_id) pc
+                    ON pc.encounter_id = cb.encounter_id
+                LEFT JOIN (SELECT encounter_id, SUM(cost) AS total FROM medications GROUP BY encounter_id) mc
+                    ON mc.encounter_id = cb.encounter_id
+                WHERE pc.encounter_id IS NOT NULL OR mc.encounter_id IS NOT NULL
+            """)
+            rows = cursor.fetchall()
+            mismatched = [row for row in rows
+                          if abs(float(row['billed_amount'] or 0) - float(row['expected_amount'])) >= 0.005]
+
+            fixed = []
+            if fix:
+                for row in mismatched:
+                    cursor.execute(
+                        "UPDATE claims_and_billing SET billed_amount = %s WHERE billing_id = %s AND billed_amount = %s",
+                        (row['expected_amount'], row['billing_id'], row['billed_amount'])
+                    )
+                    if cursor.rowcount:
+                        fixed.append(row['billing_id'])
+                conn.commit()
+                for billing_id in fixed:
+                    cache.invalidate('claims', billing_id)
+
+            return {
+                "checked": len(rows),
+                "mismatched": len(mismatched),
+                "fixed": len(fixed),
+                "claims": [{
+                    "billing_id": row['billing_id'],
+                    "encounter_id": row['encounter_id'],
+                    "billed_amount": float(row['billed_amount'] or 0),
+                    "expected_amount": float(row['expected_amount'])
+                } for row in mismatched[:limit]]
+            }
+        except Error as e:
+            if conn: conn.rollback()
+            raise Error(f"Error reconciling claim amounts: {e}")
+        finally:
+            if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    @staticmethod
+    def dirty_encounters(since):
+        """
+        Encounters whose claim may be stale after line items dated on or after
+        `since` (YYYY-MM-DD) were loaded: those visited since then, or with a
+        procedure or medication dated since then.
+        """
+        conn = None
+        try:
+            conn = get_db_connection()
+            cursor = get_db_cursor(conn)
+            cursor.execute("""
+                SELECT encounter_id FROM encounters WHERE visit_date >= %s
+                UNION
+                SELECT encounter_id FROM procedures WHERE procedure_date >= %s
+                UNION
+                SELECT encounter_id FROM medications WHERE prescribed_date >= %s
+            """, (since, since, since))
+            return [row['encounter_id'] for row in cursor.fetchall() if row['encounter_id']]
+        except Error as e: raise Error(f"Error finding encounters to recompute: {e}")
+        finally:
+            if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    @staticmethod
+    def recompute(encounter_ids, batch_size=500):
+        """
+        Recompute the claims of many encounters after a bulk line-item load.
+        Each batch is one transaction: the encounters are locked, their totals
+        come from one grouped aggregate, changed claims are updated with one
+        statement and missing claims (for encounters with line items) are
+        inserted together, with their billing and claim IDs reserved as blocks.
+        Returns {encounters, updated, created, unchanged, missing}.
+        """
+        encounter_ids = sorted({eid for eid in encounter_ids if eid})
+        summary = {"encounters": len(encounter_ids), "updated": 0, "created": 0, "unchanged": 0, "missing": 0}
+        batch_size = max(1, int(batch_size))
+        for start in range(0, len(encounter_ids), batch_size):
+            batch = ClaimsAndBillingModel._recompute_batch(encounter_ids[start:start + batch_size])
+            for key, value in batch.items():
+                summary[key] += value
+        return summary
+
+    @staticmethod
+    def _recompute_batch(encounter_ids):
+        conn = None
+        try:
+            conn = get_db_connection()
+            cursor = get_db_cursor(conn)
+            ClaimsAndBillingModel.lock_encounters(cursor, *encounter_ids)
+            summary, billing_ids = ClaimsAndBillingModel.recompute_locked(cursor, encounter_ids)
+            conn.commit()
+            for billing_id in billing_ids:
+                cache.invalidate('claims', billing_id)
+            return summary
+        except Error as e:
+            if conn: conn.rollback()
+            raise Error(f"Error recomputing claims: {e}")
+        finally:
+            if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    @staticmethod
+    def recompute_locked(cursor, encounter_ids):
+        """
+        Recompute the claims of `encounter_ids` on the caller's cursor, inside
+        its transaction; the caller must hold lock_encounters() for them. As in
+        apply_line_item_change(), an encounter's claim is its lowest billing_id.
+        Returns (summary counts, billing_ids to invalidate after commit).
+        """
+        encounter_ids = list(encounter_ids)
+        if not encounter_ids:
+            return {"updated": 0, "created": 0, "unchanged": 0, "missing": 0}, []
+        placeholders = ', '.join(['%s'] * len(encounter_ids))
+        cursor.execute(f"""
+            SELECT e.encounter_id, p.patient_id, p.insurance_type,
+                   cb.billing_id, cb.billed_amount,
+                   pc.encounter_id IS NOT NULL OR mc.encounter_id IS NOT NULL AS has_items,
+                   COALESCE(pc.total, 0) + COALESCE(mc.total, 0) AS total_amount
+            FROM encounters e
+            JOIN patients p ON e.patient_id = p.patient_id
+            LEFT JOIN claims_and_billing cb ON cb.billing_id = (
+                SELECT MIN(billing_id) FROM claims_and_billing WHERE encounter_id = e.encounter_id)
+            LEFT JOIN (SELECT encounter_id, SUM(procedure_cost) AS total FROM procedures
+                       WHERE encounter_id IN ({placeholders}) GROUP BY encounter_id) pc
+                ON pc.encounter_id = e.encounter_id
+            LEFT JOIN (SELECT encounter_id, SUM(cost) AS total FROM medications
+                       WHERE encounter_id IN ({placeholders}) GROUP BY encounter_id) mc
+                ON mc.encounter_id = e.encounter_id
+            WHERE e.encounter_id IN ({placeholders})
+        """, encounter_ids * 3)
+        rows = cursor.fetchall()
+
+        changed, new_claims = [], []
+        for row in rows:
+            if row['billing_id']:
+                if abs(float(row['billed_amount'] or 0) - float(row['total_amount'])) >= 0.005:
+                    changed.append(row)
+            elif row['has_items']:
+                new_claims.append(row)
+
+        if changed:
+            cursor.execute(f"""
+                UPDATE claims_and_billing
+                SET billed_amount = CASE billing_id {' '.join(['WHEN %s THEN %s'] * len(changed))} END
+                WHERE billing_id IN ({', '.join(['%s'] * len(changed))})
+            """, [value for row in changed for value in (row['billing_id'], row['total_amount'])]
+                 + [row['billing_id'] for row in changed])
+
+        created = []
+        if new_claims:
+            selfpay = [bool(row['insurance_type'] and 'self' in row['insurance_type'].lower()) for row in new_claims]
+            insured = selfpay.count(False)
+            claim_ids = iter(sequences.next_ids('claims_and_billing', 'claim_id', 'CLM', insured) if insured else [])
+            # Same IDs and defaults as _create_claim(): billing IDs come from the BILL sequence, as one block
+            billing_ids = iter(sequences.next_ids('claims_and_billing', 'billing_id', 'BILL', len(new_claims)))
+            values = []
+            for row, is_selfpay in zip(new_claims, selfpay):
+                encounter_id = row['encounter_id']
+                billing_id = next(billing_ids)
+                if not is_selfpay:
+                    values.append((billing_id, next(claim_ids), row['patient_id'], encounter_id,
+                                   row['total_amount'], 'Insurance', row['insurance_type']))
+                else:
+                    values.append((billing_id, None, row['patient_id'], encounter_id,
+                                   row['total_amount'], 'Selfpay', None))
+                created.append(billing_id)
+            cursor.executemany("""
+                INSERT INTO claims_and_billing
+                (billing_id, claim_id, patient_id, encounter_id, claim_billing_date,
+                 billed_amount, paid_amount, claim_status, payment_method, insurance_provider)
+                VALUES (%s, %s, %s, %s, NOW(), %s, 0, 'Pending', %s, %s)
+            """, values)
+            rollups.apply_change(cursor, 'claims', [], rollups.capture(cursor, 'claims', created))
+
+        found = {row['encounter_id'] for row in rows}
+        return {
+            "updated": len(changed),
+            "created": len(created),
+            "unchanged": len(found) - len(changed) - len(new_claims),
+            "missing": len(set(encounter_ids) - found)
+        }, [row['billing_id'] for row in changed]
+
     @staticmethod
     def get_claim_statistics():
         """
@@ -1114,9 +1420,36 @@ class DenialsModel:
         "claim_id": "d.claim_id",
         "denial_reason_code": "d.denial_reason_code"
     }
-    
-    @staticmethod
-    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='denial_date', sort_dir='desc'):
+    PRIMARY_KEY = "d.denial_id"
+    SEARCH = SearchSpec(
+        fulltext=[("d.denial_reason_description",)],
+        prefix=["d.denial_id", "d.claim_id", "d.denial_reason_code"],
+        related=[("cb.patient_id", PATIENT_NAME)]
+    )
+    QUERY = ListQuery(
+        "denials d",
+        columns=["d.*", "cb.billing_id", "cb.claim_billing_date", "cb.billed_amount",
+                 "cb.encounter_id", "cb.claim_status", "p.first_name", "p.last_name"],
+        fields=["claim_id", "denial_id", "denial_reason_code", "denial_reason_description", "denied_amount",
+                "denial_date", "appeal_filed", "appeal_status", "appeal_resolution_date", "final_outcome"],
+        joins=[
+            Join("cb", "LEFT JOIN claims_and_billing cb ON d.claim_id = cb.claim_id"),
+            Join("p", "LEFT JOIN patients p ON cb.patient_id = p.patient_id"),
+        ],
+        filters={
+            "denial_id": Filter("d.denial_id"),
+            "claim_id": Filter("d.claim_id"),
+            "denial_reason_code": Filter("d.denial_reason_code"),
+            "denial_date_from": Filter("d.denial_date", "gte"),
+            "denial_date_to": Filter("d.denial_date", "lte"),
+            "appeal_status": Filter("d.appeal_status", "eq"),
+        },
+        sortable=SORTABLE_COLUMNS, default_sort="d.denial_date",
+        primary_key=PRIMARY_KEY, search=SEARCH
+    )
+    
+    @staticmethod
+    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='denial_date', sort_dir='desc', after=None, count='exact', fields=None):
         """
         Get all denials with optional search, filters, sorting, and pagination.
         Uses SQL LIKE for search and filtering.
@@ -1125,110 +1458,45 @@ class DenialsModel:
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            
-            # Build base query with JOINs
-            base_query = """
-                SELECT d.*, 
-                       cb.billing_id, cb.claim_billing_date, cb.billed_amount,
-                       cb.encounter_id, cb.claim_status,
-                       p.first_name, p.last_name
-                FROM denials d
-                LEFT JOIN claims_and_billing cb ON d.claim_id = cb.claim_id
-                LEFT JOIN patients p ON cb.patient_id = p.patient_id
-                WHERE 1=1
-            """
-            params = []
-            
-            # General search (denials table only has claim_id, not billing_id)
-            if search:
-                like_term = f"%{search}%"
-                base_query += """
-                    AND (d.denial_id LIKE %s OR d.claim_id LIKE %s OR d.denial_reason_code LIKE %s
-                    OR d.denial_reason_description LIKE %s OR CONCAT(p.first_name, ' ', p.last_name) LIKE %s)
-                """
-                params.extend([like_term] * 5)
-            
-            # Detailed filters
-            filters = filters or {}
-            if filters.get('denial_id'): base_query += " AND d.denial_id LIKE %s"; params.append(f"%{filters['denial_id']}%")
-            if filters.get('claim_id'): base_query += " AND d.claim_id LIKE %s"; params.append(f"%{filters['claim_id']}%")
-            if filters.get('denial_reason_code'): base_query += " AND d.denial_reason_code LIKE %s"; params.append(f"%{filters['denial_reason_code']}%")
-            if filters.get('denial_date_from'): base_query += " AND d.denial_date >= %s"; params.append(filters['denial_date_from'])
-            if filters.get('denial_date_to'): base_query += " AND d.denial_date <= %s"; params.append(filters['denial_date_to'])
-            if filters.get('appeal_status'): base_query += " AND d.appeal_status = %s"; params.append(filters['appeal_status'])
-            
-            # Get total count - build separate count query
-            count_base = """
-                SELECT COUNT(*) as total
-                FROM denials d
-                LEFT JOIN claims_and_billing cb ON d.claim_id = cb.claim_id
-                LEFT JOIN patients p ON cb.patient_id = p.patient_id
-                WHERE 1=1
-            """
-            count_params = []
-            
-            # Apply same filters to count query
-            if search:
-                like_term = f"%{search}%"
-                count_base += """
-                    AND (d.denial_id LIKE %s OR d.claim_id LIKE %s OR d.denial_reason_code LIKE %s
-                    OR d.denial_reason_description LIKE %s OR CONCAT(p.first_name, ' ', p.last_name) LIKE %s)
-                """
-                count_params.extend([like_term] * 5)
-            
-            if filters.get('denial_id'): count_base += " AND d.denial_id LIKE %s"; count_params.append(f"%{filters['denial_id']}%")
-            if filters.get('claim_id'): count_base += " AND d.claim_id LIKE %s"; count_params.append(f"%{filters['claim_id']}%")
-            if filters.get('denial_reason_code'): count_base += " AND d.denial_reason_code LIKE %s"; count_params.append(f"%{filters['denial_reason_code']}%")
-            if filters.get('denial_date_from'): count_base += " AND d.denial_date >= %s"; count_params.append(filters['denial_date_from'])
-            if filters.get('denial_date_to'): count_base += " AND d.denial_date <= %s"; count_params.append(filters['denial_date_to'])
-            if filters.get('appeal_status'): count_base += " AND d.appeal_status = %s"; count_params.append(filters['appeal_status'])
-            
-            cursor.execute(count_base, count_params)
-            count_result = cursor.fetchone()
-            total_count = count_result['total'] if count_result else 0
-            
-            # Apply sorting and pagination
-            sort_col = DenialsModel.SORTABLE_COLUMNS.get(sort_by, 'd.denial_date')
-            sort_d = 'ASC' if str(sort_dir).lower() == 'asc' else 'DESC'
-            offset = (page - 1) * limit
-            query = f"{base_query} ORDER BY {sort_col} {sort_d} LIMIT %s OFFSET %s"
-            params.extend([limit, offset])
-            
-            cursor.execute(query, params)
-            denials = cursor.fetchall()
-            
-            return {
-                'data': denials,
-                'total': total_count,
-                'page': page,
-                'per_page': limit,
-                'total_pages': (total_count + limit - 1) // limit
-            }
+            return DenialsModel.QUERY.paginate(cursor, search, filters, sort_by, sort_dir, limit, page, after, count, fields)
         except Error as e: raise Error(f"Error fetching denials: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
-    
+
+    @staticmethod
+    def export(search=None, filters=None, sort_by='denial_date', sort_dir='desc', fields=None):
+        """Every row matching the list query, for streaming (see streaming.Export)."""
+        return streaming.Export(DenialsModel.QUERY, search, filters, sort_by, sort_dir, fields)
+    
+    ROW_QUERY = """
+        SELECT d.*,
+               cb.billing_id, cb.encounter_id, cb.billed_amount, cb.claim_status,
+               cb.claim_billing_date,
+               p.first_name, p.last_name
+        FROM denials d
+        LEFT JOIN claims_and_billing cb ON d.claim_id = cb.claim_id
+        LEFT JOIN patients p ON cb.patient_id = p.patient_id
+    """
+
     @staticmethod
+    @cache.cached('denials', lambda row: [('claims', row.get('billing_id')), ('patients', cache.ANY)])
     def get_by_id(denial_id):
         conn = None
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            query = """
-                SELECT d.*, 
-                       cb.billing_id, cb.encounter_id, cb.billed_amount, cb.claim_status,
-                       cb.claim_billing_date,
-                       p.first_name, p.last_name
-                FROM denials d
-                LEFT JOIN claims_and_billing cb ON d.claim_id = cb.claim_id
-                LEFT JOIN patients p ON cb.patient_id = p.patient_id
-                WHERE d.denial_id = %s
-            """
+            query = f"{DenialsModel.ROW_QUERY} WHERE d.denial_id = %s"
             cursor.execute(query, (denial_id,))
             return cursor.fetchone()
         except Error as e: raise Error(f"Error fetching denial: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    @staticmethod
+    @cache.cached_many('denials', lambda row: [('claims', row.get('billing_id')), ('patients', cache.ANY)])
+    def get_by_ids(denial_ids):
+        """Many denials in one query, as {denial_id: row}; IDs without a row are left out."""
+        return _rows_by_ids(DenialsModel.ROW_QUERY, 'd.denial_id', denial_ids, 'denials')
     
     @staticmethod
     def get_by_claim_id(claim_id):
@@ -1304,6 +1572,10 @@ class DenialsModel:
             
             cursor.execute(query, values)
             conn.commit()
+            catalog.denials.add({
+                'denial_reason_code': denial_data.get('denial_reason_code'),
+                'denial_reason_description': denial_data.get('denial_reason_description')
+            })
             return denial_id
         except ValueError as ve:
             if conn: conn.rollback()
@@ -1352,6 +1624,8 @@ class DenialsModel:
             values.append(denial_id)
             cursor.execute(f"UPDATE denials SET {', '.join(fields)} WHERE denial_id = %s", values)
             conn.commit()
+            cache.invalidate('denials', denial_id)
+            catalog.denials.invalidate()
             return cursor.rowcount > 0
         except ValueError as ve:
             if conn: conn.rollback()
@@ -1371,6 +1645,8 @@ class DenialsModel:
             
             cursor.execute("DELETE FROM denials WHERE denial_id = %s", (denial_id,))
             conn.commit()
+            cache.invalidate('denials', denial_id)
+            catalog.denials.invalidate()
             return cursor.rowcount > 0
         except Error as e:
             if conn: conn.rollback()
@@ -1380,15 +1656,12 @@ class DenialsModel:
     
     @staticmethod
     def get_distinct_codes():
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = get_db_cursor(conn)
-            cursor.execute("SELECT DISTINCT denial_reason_code, denial_reason_description FROM denials ORDER BY denial_reason_code")
-            return cursor.fetchall()
-        except Error as e: raise Error(f"Error fetching distinct denial reason codes: {e}")
-        finally:
-            if conn and conn.is_connected(): cursor.close(); conn.close()
+        return catalog.denials.get('denial_reason_codes')
+    
+    @staticmethod
+    def get_options():
+        """Get every dropdown vocabulary of the denial form as ({name: rows}, etag)."""
+        return catalog.denials.snapshot()
 
 
 class MedicationsModel:
@@ -1401,9 +1674,39 @@ class MedicationsModel:
         "drug_name": "m.drug_name",
         "cost": "m.cost"
     }
-    
-    @staticmethod
-    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='prescribed_date', sort_dir='desc'):
+    PRIMARY_KEY = "m.medication_id"
+    SEARCH = SearchSpec(
+        fulltext=[("m.drug_name",)],
+        prefix=["m.medication_id", "m.encounter_id"],
+        related=[("e.patient_id", PATIENT_NAME), ("m.prescriber_id", PROVIDER_SEARCH)]
+    )
+    QUERY = ListQuery(
+        "medications m",
+        columns=["m.*", "e.encounter_id", "e.visit_date", "p.patient_id", "p.first_name", "p.last_name",
+                 "pr.name as prescriber_name", "pr.specialty as prescriber_specialty"],
+        fields=["medication_id", "encounter_id", "drug_name", "dosage", "route", "frequency", "duration",
+                "prescribed_date", "prescriber_id", "cost"],
+        joins=[
+            Join("e", "LEFT JOIN encounters e ON m.encounter_id = e.encounter_id"),
+            Join("p", "LEFT JOIN patients p ON e.patient_id = p.patient_id"),
+            Join("pr", "LEFT JOIN providers pr ON m.prescriber_id = pr.provider_id"),
+        ],
+        filters={
+            "medication_id": Filter("m.medication_id"),
+            "encounter_id": Filter("m.encounter_id"),
+            "drug_name": Filter("m.drug_name"),
+            "prescriber_id": Filter("m.prescriber_id"),
+            "prescribed_date_from": Filter("m.prescribed_date", "gte"),
+            "prescribed_date_to": Filter("m.prescribed_date", "lte"),
+            "cost_min": Filter("m.cost", "gte", float, keep_falsy=True),
+            "cost_max": Filter("m.cost", "lte", float, keep_falsy=True),
+        },
+        sortable=SORTABLE_COLUMNS, default_sort="m.prescribed_date",
+        primary_key=PRIMARY_KEY, search=SEARCH
+    )
+    
+    @staticmethod
+    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='prescribed_date', sort_dir='desc', after=None, count='exact', fields=None):
         """
         Get all medications with optional search, filters, sorting, and pagination.
         Uses SQL LIKE for search and filtering.
@@ -1412,117 +1715,48 @@ class MedicationsModel:
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            
-            # Build base query with JOINs
-            base_query = """
-                SELECT m.*, 
-                       e.encounter_id, e.visit_date,
-                       p.patient_id, p.first_name, p.last_name,
-                       pr.name as prescriber_name, pr.specialty as prescriber_specialty
-                FROM medications m
-                LEFT JOIN encounters e ON m.encounter_id = e.encounter_id
-                LEFT JOIN patients p ON e.patient_id = p.patient_id
-                LEFT JOIN providers pr ON m.prescriber_id = pr.provider_id
-                WHERE 1=1
-            """
-            params = []
-            
-            # General search
-            if search:
-                like_term = f"%{search}%"
-                base_query += """
-                    AND (m.medication_id LIKE %s OR m.drug_name LIKE %s OR m.encounter_id LIKE %s
-                    OR CONCAT(p.first_name, ' ', p.last_name) LIKE %s OR pr.name LIKE %s)
-                """
-                params.extend([like_term] * 5)
-            
-            # Detailed filters
-            filters = filters or {}
-            if filters.get('medication_id'): base_query += " AND m.medication_id LIKE %s"; params.append(f"%{filters['medication_id']}%")
-            if filters.get('encounter_id'): base_query += " AND m.encounter_id LIKE %s"; params.append(f"%{filters['encounter_id']}%")
-            if filters.get('drug_name'): base_query += " AND m.drug_name LIKE %s"; params.append(f"%{filters['drug_name']}%")
-            if filters.get('prescriber_id'): base_query += " AND m.prescriber_id LIKE %s"; params.append(f"%{filters['prescriber_id']}%")
-            if filters.get('prescribed_date_from'): base_query += " AND m.prescribed_date >= %s"; params.append(filters['prescribed_date_from'])
-            if filters.get('prescribed_date_to'): base_query += " AND m.prescribed_date <= %s"; params.append(filters['prescribed_date_to'])
-            if filters.get('cost_min') is not None: base_query += " AND m.cost >= %s"; params.append(float(filters['cost_min']))
-            if filters.get('cost_max') is not None: base_query += " AND m.cost <= %s"; params.append(float(filters['cost_max']))
-            
-            # Get total count - build separate count query
-            count_base = """
-                SELECT COUNT(*) as total
-                FROM medications m
-                LEFT JOIN encounters e ON m.encounter_id = e.encounter_id
-                LEFT JOIN patients p ON e.patient_id = p.patient_id
-                LEFT JOIN providers pr ON m.prescriber_id = pr.provider_id
-                WHERE 1=1
-            """
-            count_params = []
-            
-            # Apply same filters to count query
-            if search:
-                like_term = f"%{search}%"
-                count_base += """
-                    AND (m.medication_id LIKE %s OR m.drug_name LIKE %s OR m.encounter_id LIKE %s
-                    OR CONCAT(p.first_name, ' ', p.last_name) LIKE %s OR pr.name LIKE %s)
-                """
-                count_params.extend([like_term] * 5)
-            
-            if filters.get('medication_id'): count_base += " AND m.medication_id LIKE %s"; count_params.append(f"%{filters['medication_id']}%")
-            if filters.get('encounter_id'): count_base += " AND m.encounter_id LIKE %s"; count_params.append(f"%{filters['encounter_id']}%")
-            if filters.get('drug_name'): count_base += " AND m.drug_name LIKE %s"; count_params.append(f"%{filters['drug_name']}%")
-            if filters.get('prescriber_id'): count_base += " AND m.prescriber_id LIKE %s"; count_params.append(f"%{filters['prescriber_id']}%")
-            if filters.get('prescribed_date_from'): count_base += " AND m.prescribed_date >= %s"; count_params.append(filters['prescribed_date_from'])
-            if filters.get('prescribed_date_to'): count_base += " AND m.prescribed_date <= %s"; count_params.append(filters['prescribed_date_to'])
-            if filters.get('cost_min') is not None: count_base += " AND m.cost >= %s"; count_params.append(float(filters['cost_min']))
-            if filters.get('cost_max') is not None: count_base += " AND m.cost <= %s"; count_params.append(float(filters['cost_max']))
-            
-            cursor.execute(count_base, count_params)
-            count_result = cursor.fetchone()
-            total_count = count_result['total'] if count_result else 0
-            
-            # Apply sorting and pagination
-            sort_col = MedicationsModel.SORTABLE_COLUMNS.get(sort_by, 'm.prescribed_date')
-            sort_d = 'ASC' if str(sort_dir).lower() == 'asc' else 'DESC'
-            offset = (page - 1) * limit
-            query = f"{base_query} ORDER BY {sort_col} {sort_d} LIMIT %s OFFSET %s"
-            params.extend([limit, offset])
-            
-            cursor.execute(query, params)
-            medications = cursor.fetchall()
-            
-            return {
-                'data': medications,
-                'total': total_count,
-                'page': page,
-                'per_page': limit,
-                'total_pages': (total_count + limit - 1) // limit
-            }
+            return MedicationsModel.QUERY.paginate(cursor, search, filters, sort_by, sort_dir, limit, page, after, count, fields)
         except Error as e: raise Error(f"Error fetching medications: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
-    
+
     @staticmethod
-    def get_by_id(medication_id):
+    def export(search=None, filters=None, sort_by='prescribed_date', sort_dir='desc', fields=None):
+        """Every row matching the list query, for streaming (see streaming.Export)."""
+        return streaming.Export(MedicationsModel.QUERY, search, filters, sort_by, sort_dir, fields)
+    
+    ROW_QUERY = """
+        SELECT m.*,
+               e.encounter_id, e.visit_date,
+               p.patient_id, p.first_name, p.last_name,
+               pr.name as prescriber_name, pr.specialty as prescriber_specialty
+        FROM medications m
+        LEFT JOIN encounters e ON m.encounter_id = e.encounter_id
+        LEFT JOIN patients p ON e.patient_id = p.patient_id
+        LEFT JOIN providers pr ON m.prescriber_id = pr.provider_id
+    """
+
+    @staticmethod
+    @cache.cached('medications', lambda row: [('encounters', row.get('encounter_id')), ('patients', row.get('patient_id')),
+                                         ('providers', row.get('prescriber_id'))])
+    def get_by_id(medication_id):
         conn = None
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            query = """
-                SELECT m.*, 
-                       e.encounter_id, e.visit_date,
-                       p.patient_id, p.first_name, p.last_name,
-                       pr.name as prescriber_name, pr.specialty as prescriber_specialty
-                FROM medications m
-                LEFT JOIN encounters e ON m.encounter_id = e.encounter_id
-                LEFT JOIN patients p ON e.patient_id = p.patient_id
-                LEFT JOIN providers pr ON m.prescriber_id = pr.provider_id
-                WHERE m.medication_id = %s
-            """
+            query = f"{MedicationsModel.ROW_QUERY} WHERE m.medication_id = %s"
             cursor.execute(query, (medication_id,))
             return cursor.fetchone()
         except Error as e: raise Error(f"Error fetching medication: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    @staticmethod
+    @cache.cached_many('medications', lambda row: [('encounters', row.get('encounter_id')), ('patients', row.get('patient_id')),
+                                              ('providers', row.get('prescriber_id'))])
+    def get_by_ids(medication_ids):
+        """Many medications in one query, as {medication_id: row}; IDs without a row are left out."""
+        return _rows_by_ids(MedicationsModel.ROW_QUERY, 'm.medication_id', medication_ids, 'medications')
     
     @staticmethod
     def add(medication_data):
@@ -1544,8 +1778,9 @@ class MedicationsModel:
             
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
+            ClaimsAndBillingModel.lock_encounters(cursor, medication_data.get('encounter_id'))
             
-            medication_id = medication_data.get('medication_id') or generate_new_id(cursor, 'medications', 'medication_id', 'MED', 6)
+            medication_id = use_or_generate_id(cursor, medication_data.get('medication_id'), 'medications', 'medication_id', 'MED', 6)
             
             query = """
                 INSERT INTO medications 
@@ -1565,10 +1800,13 @@ class MedicationsModel:
                 float(medication_data.get('cost', 0)) if medication_data.get('cost') else 0.0
             )
             cursor.execute(query, values)
+            # Add the cost to the encounter's claim in the same transaction
+            billing_ids = ClaimsAndBillingModel.apply_line_item_change(
+                cursor, None, ClaimsAndBillingModel.line_item(cursor, 'medications', medication_id))
+            rollups.apply_change(cursor, 'medications', [], rollups.capture(cursor, 'medications', [medication_id]))
             conn.commit()
-            
-            # Sync claim amount
-            ClaimsAndBillingModel.sync_claim_amount(medication_data.get('encounter_id'))
+            for billing_id in billing_ids:
+                cache.invalidate('claims', billing_id)
             
             return medication_id
         except ValueError as ve:
@@ -1580,6 +1818,51 @@ class MedicationsModel:
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
     
+    @staticmethod
+    def add_many(records):
+        """
+        Add many medications in one transaction (POST /api/medications/bulk).
+        Every record is validated first, medication IDs are reserved as one
+        block, the rows go in with multi-row INSERTs and the claims of the
+        affected encounters are recomputed once at the end.
+        Returns the medication IDs in the order of `records`.
+        """
+        bulk.validate(records, ('encounter_id', 'drug_name', 'prescribed_date', 'prescriber_id'))
+        conn = None
+        try:
+            conn = get_db_connection()
+            cursor = get_db_cursor(conn)
+            encounter_ids = sorted({record['encounter_id'] for record in records})
+            ClaimsAndBillingModel.lock_encounters(cursor, *encounter_ids)
+
+            medication_ids = bulk.assign_ids(records, 'medications', 'medication_id', 'MED')
+            rows = [(
+                medication_id,
+                record.get('encounter_id'),
+                record.get('drug_name'),
+                record.get('dosage'),
+                record.get('route'),
+                record.get('frequency'),
+                record.get('duration'),
+                record.get('prescribed_date'),
+                record.get('prescriber_id'),
+                float(record.get('cost', 0)) if record.get('cost') else 0.0
+            ) for medication_id, record in zip(medication_ids, records)]
+            bulk.insert_rows(cursor, 'medications',
+                             ('medication_id', 'encounter_id', 'drug_name', 'dosage', 'route', 'frequency',
+                              'duration', 'prescribed_date', 'prescriber_id', 'cost'), rows)
+            _, billing_ids = ClaimsAndBillingModel.recompute_locked(cursor, encounter_ids)
+            rollups.apply_change(cursor, 'medications', [], rollups.capture(cursor, 'medications', medication_ids))
+            conn.commit()
+            for billing_id in billing_ids:
+                cache.invalidate('claims', billing_id)
+            return medication_ids
+        except Error as e:
+            if conn: conn.rollback()
+            raise Error(f"Error adding medications: {e}")
+        finally:
+            if conn and conn.is_connected(): cursor.close(); conn.close()
+
     @staticmethod
     def update(medication_id, medication_data):
         conn = None
@@ -1602,21 +1885,21 @@ class MedicationsModel:
             if not fields: return False
             
             values.append(medication_id)
+            before = ClaimsAndBillingModel.line_item(cursor, 'medications', medication_id, lock=True)
+            ClaimsAndBillingModel.lock_encounters(cursor, before and before['encounter_id'], medication_data.get('encounter_id'))
+            counted = rollups.capture(cursor, 'medications', [medication_id])
             cursor.execute(f"UPDATE medications SET {', '.join(fields)} WHERE medication_id = %s", values)
+            updated = cursor.rowcount
+            # Move the cost difference (or the whole cost, if the encounter changed) between claims
+            billing_ids = ClaimsAndBillingModel.apply_line_item_change(
+                cursor, before, ClaimsAndBillingModel.line_item(cursor, 'medications', medication_id))
+            rollups.apply_change(cursor, 'medications', counted, rollups.capture(cursor, 'medications', [medication_id]))
             conn.commit()
+            cache.invalidate('medications', medication_id)
+            for billing_id in billing_ids:
+                cache.invalidate('claims', billing_id)
             
-            # Fetch encounter_id if not in data, to sync claim amount
-            if 'encounter_id' in medication_data:
-                encounter_id = medication_data['encounter_id']
-            else:
-                cursor.execute("SELECT encounter_id FROM medications WHERE medication_id = %s", (medication_id,))
-                res = cursor.fetchone()
-                encounter_id = res['encounter_id'] if res else None
-                
-            if encounter_id:
-                ClaimsAndBillingModel.sync_claim_amount(encounter_id)
-                
-            return cursor.rowcount > 0
+            return updated > 0
         except ValueError as ve:
             if conn: conn.rollback()
             raise ve
@@ -1632,18 +1915,21 @@ class MedicationsModel:
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            # Fetch encounter_id before delete to sync claim amount
-            cursor.execute("SELECT encounter_id FROM medications WHERE medication_id = %s", (medication_id,))
-            res = cursor.fetchone()
-            encounter_id = res['encounter_id'] if res else None
+            # Fetch the row before delete to take its cost off the claim
+            before = ClaimsAndBillingModel.line_item(cursor, 'medications', medication_id, lock=True)
+            ClaimsAndBillingModel.lock_encounters(cursor, before and before['encounter_id'])
             
+            counted = rollups.capture(cursor, 'medications', [medication_id])
             cursor.execute("DELETE FROM medications WHERE medication_id = %s", (medication_id,))
+            deleted = cursor.rowcount
+            billing_ids = ClaimsAndBillingModel.apply_line_item_change(cursor, before, None)
+            rollups.apply_change(cursor, 'medications', counted, [])
             conn.commit()
+            cache.invalidate('medications', medication_id)
+            for billing_id in billing_ids:
+                cache.invalidate('claims', billing_id)
             
-            if encounter_id:
-                ClaimsAndBillingModel.sync_claim_amount(encounter_id)
-                
-            return cursor.rowcount > 0
+            return deleted > 0
         except Error as e:
             if conn: conn.rollback()
             raise Error(f"Error deleting medication: {e}")
@@ -1661,9 +1947,39 @@ class ProceduresModel:
         "procedure_code": "pr.procedure_code",
         "procedure_cost": "pr.procedure_cost"
     }
-    
-    @staticmethod
-    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='procedure_date', sort_dir='desc'):
+    PRIMARY_KEY = "pr.procedure_id"
+    SEARCH = SearchSpec(
+        fulltext=[("pr.procedure_description",)],
+        prefix=["pr.procedure_id", "pr.procedure_code", "pr.encounter_id"],
+        related=[("e.patient_id", PATIENT_NAME), ("pr.provider_id", PROVIDER_SEARCH)]
+    )
+    QUERY = ListQuery(
+        "procedures pr",
+        columns=["pr.*", "e.encounter_id", "e.visit_date", "p.patient_id", "p.first_name", "p.last_name",
+                 "prov.name as provider_name", "prov.specialty as provider_specialty"],
+        fields=["procedure_id", "encounter_id", "procedure_code", "procedure_description", "procedure_date",
+                "provider_id", "procedure_cost"],
+        joins=[
+            Join("e", "LEFT JOIN encounters e ON pr.encounter_id = e.encounter_id"),
+            Join("p", "LEFT JOIN patients p ON e.patient_id = p.patient_id"),
+            Join("prov", "LEFT JOIN providers prov ON pr.provider_id = prov.provider_id"),
+        ],
+        filters={
+            "procedure_id": Filter("pr.procedure_id"),
+            "encounter_id": Filter("pr.encounter_id"),
+            "procedure_code": Filter("pr.procedure_code"),
+            "provider_id": Filter("pr.provider_id"),
+            "procedure_date_from": Filter("pr.procedure_date", "gte"),
+            "procedure_date_to": Filter("pr.procedure_date", "lte"),
+            "procedure_cost_min": Filter("pr.procedure_cost", "gte", float, keep_falsy=True),
+            "procedure_cost_max": Filter("pr.procedure_cost", "lte", float, keep_falsy=True),
+        },
+        sortable=SORTABLE_COLUMNS, default_sort="pr.procedure_date",
+        primary_key=PRIMARY_KEY, search=SEARCH
+    )
+    
+    @staticmethod
+    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='procedure_date', sort_dir='desc', after=None, count='exact', fields=None):
         """
         Get all procedures with optional search, filters, sorting, and pagination.
         Uses SQL LIKE for search and filtering.
@@ -1672,119 +1988,48 @@ class ProceduresModel:
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            
-            # Build base query with JOINs
-            base_query = """
-                SELECT pr.*, 
-                       e.encounter_id, e.visit_date,
-                       p.patient_id, p.first_name, p.last_name,
-                       prov.name as provider_name, prov.specialty as provider_specialty
-                FROM procedures pr
-                LEFT JOIN encounters e ON pr.encounter_id = e.encounter_id
-                LEFT JOIN patients p ON e.patient_id = p.patient_id
-                LEFT JOIN providers prov ON pr.provider_id = prov.provider_id
-                WHERE 1=1
-            """
-            params = []
-            
-            # General search
-            if search:
-                like_term = f"%{search}%"
-                base_query += """
-                    AND (pr.procedure_id LIKE %s OR pr.procedure_code LIKE %s OR pr.encounter_id LIKE %s
-                    OR pr.procedure_description LIKE %s OR CONCAT(p.first_name, ' ', p.last_name) LIKE %s 
-                    OR prov.name LIKE %s)
-                """
-                params.extend([like_term] * 6)
-            
-            # Detailed filters
-            filters = filters or {}
-            if filters.get('procedure_id'): base_query += " AND pr.procedure_id LIKE %s"; params.append(f"%{filters['procedure_id']}%")
-            if filters.get('encounter_id'): base_query += " AND pr.encounter_id LIKE %s"; params.append(f"%{filters['encounter_id']}%")
-            if filters.get('procedure_code'): base_query += " AND pr.procedure_code LIKE %s"; params.append(f"%{filters['procedure_code']}%")
-            if filters.get('provider_id'): base_query += " AND pr.provider_id LIKE %s"; params.append(f"%{filters['provider_id']}%")
-            if filters.get('procedure_date_from'): base_query += " AND pr.procedure_date >= %s"; params.append(filters['procedure_date_from'])
-            if filters.get('procedure_date_to'): base_query += " AND pr.procedure_date <= %s"; params.append(filters['procedure_date_to'])
-            if filters.get('procedure_cost_min') is not None: base_query += " AND pr.procedure_cost >= %s"; params.append(float(filters['procedure_cost_min']))
-            if filters.get('procedure_cost_max') is not None: base_query += " AND pr.procedure_cost <= %s"; params.append(float(filters['procedure_cost_max']))
-            
-            # Get total count - build separate count query
-            count_base = """
-                SELECT COUNT(*) as total
-                FROM procedures pr
-                LEFT JOIN encounters e ON pr.encounter_id = e.encounter_id
-                LEFT JOIN patients p ON e.patient_id = p.patient_id
-                LEFT JOIN providers prov ON pr.provider_id = prov.provider_id
-                WHERE 1=1
-            """
-            count_params = []
-            
-            # Apply same filters to count query
-            if search:
-                like_term = f"%{search}%"
-                count_base += """
-                    AND (pr.procedure_id LIKE %s OR pr.procedure_code LIKE %s OR pr.encounter_id LIKE %s
-                    OR pr.procedure_description LIKE %s OR CONCAT(p.first_name, ' ', p.last_name) LIKE %s 
-                    OR prov.name LIKE %s)
-                """
-                count_params.extend([like_term] * 6)
-            
-            if filters.get('procedure_id'): count_base += " AND pr.procedure_id LIKE %s"; count_params.append(f"%{filters['procedure_id']}%")
-            if filters.get('encounter_id'): count_base += " AND pr.encounter_id LIKE %s"; count_params.append(f"%{filters['encounter_id']}%")
-            if filters.get('procedure_code'): count_base += " AND pr.procedure_code LIKE %s"; count_params.append(f"%{filters['procedure_code']}%")
-            if filters.get('provider_id'): count_base += " AND pr.provider_id LIKE %s"; count_params.append(f"%{filters['provider_id']}%")
-            if filters.get('procedure_date_from'): count_base += " AND pr.procedure_date >= %s"; count_params.append(filters['procedure_date_from'])
-            if filters.get('procedure_date_to'): count_base += " AND pr.procedure_date <= %s"; count_params.append(filters['procedure_date_to'])
-            if filters.get('procedure_cost_min') is not None: count_base += " AND pr.procedure_cost >= %s"; count_params.append(float(filters['procedure_cost_min']))
-            if filters.get('procedure_cost_max') is not None: count_base += " AND pr.procedure_cost <= %s"; count_params.append(float(filters['procedure_cost_max']))
-            
-            cursor.execute(count_base, count_params)
-            count_result = cursor.fetchone()
-            total_count = count_result['total'] if count_result else 0
-            
-            # Apply sorting and pagination
-            sort_col = ProceduresModel.SORTABLE_COLUMNS.get(sort_by, 'pr.procedure_date')
-            sort_d = 'ASC' if str(sort_dir).lower() == 'asc' else 'DESC'
-            offset = (page - 1) * limit
-            query = f"{base_query} ORDER BY {sort_col} {sort_d} LIMIT %s OFFSET %s"
-            params.extend([limit, offset])
-            
-            cursor.execute(query, params)
-            procedures = cursor.fetchall()
-            
-            return {
-                'data': procedures,
-                'total': total_count,
-                'page': page,
-                'per_page': limit,
-                'total_pages': (total_count + limit - 1) // limit
-            }
+            return ProceduresModel.QUERY.paginate(cursor, search, filters, sort_by, sort_dir, limit, page, after, count, fields)
         except Error as e: raise Error(f"Error fetching procedures: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
-    
+
     @staticmethod
+    def export(search=None, filters=None, sort_by='procedure_date', sort_dir='desc', fields=None):
+        """Every row matching the list query, for streaming (see streaming.Export)."""
+        return streaming.Export(ProceduresModel.QUERY, search, filters, sort_by, sort_dir, fields)
+    
+    ROW_QUERY = """
+        SELECT pr.*,
+               e.encounter_id, e.visit_date,
+               p.patient_id, p.first_name, p.last_name,
+               prov.name as provider_name, prov.specialty as provider_specialty
+        FROM procedures pr
+        LEFT JOIN encounters e ON pr.encounter_id = e.encounter_id
+        LEFT JOIN patients p ON e.patient_id = p.patient_id
+        LEFT JOIN providers prov ON pr.provider_id = prov.provider_id
+    """
+
+    @staticmethod
+    @cache.cached('procedures', lambda row: [('encounters', row.get('encounter_id')), ('patients', row.get('patient_id')),
+                                        ('providers', row.get('provider_id'))])
     def get_by_id(procedure_id):
         conn = None
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            query = """
-                SELECT pr.*, 
-                       e.encounter_id, e.visit_date,
-                       p.patient_id, p.first_name, p.last_name,
-                       prov.name as provider_name, prov.specialty as provider_specialty
-                FROM procedures pr
-                LEFT JOIN encounters e ON pr.encounter_id = e.encounter_id
-                LEFT JOIN patients p ON e.patient_id = p.patient_id
-                LEFT JOIN providers prov ON pr.provider_id = prov.provider_id
-                WHERE pr.procedure_id = %s
-            """
+            query = f"{ProceduresModel.ROW_QUERY} WHERE pr.procedure_id = %s"
             cursor.execute(query, (procedure_id,))
             return cursor.fetchone()
         except Error as e: raise Error(f"Error fetching procedure: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    @staticmethod
+    @cache.cached_many('procedures', lambda row: [('encounters', row.get('encounter_id')), ('patients', row.get('patient_id')),
+                                             ('providers', row.get('provider_id'))])
+    def get_by_ids(procedure_ids):
+        """Many procedures in one query, as {procedure_id: row}; IDs without a row are left out."""
+        return _rows_by_ids(ProceduresModel.ROW_QUERY, 'pr.procedure_id', procedure_ids, 'procedures')
     
     @staticmethod
     def add(procedure_data):
@@ -1804,9 +2049,10 @@ class ProceduresModel:
             
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
+            ClaimsAndBillingModel.lock_encounters(cursor, procedure_data.get('encounter_id'))
             
             # Fix: Correct order of arguments for generate_new_id (cursor, table, column, prefix)
-            procedure_id = procedure_data.get('procedure_id') or generate_new_id(cursor, 'procedures', 'procedure_id', 'PROC', 6)
+            procedure_id = use_or_generate_id(cursor, procedure_data.get('procedure_id'), 'procedures', 'procedure_id', 'PROC', 6)
             
             query = """
                 INSERT INTO procedures 
@@ -1823,10 +2069,17 @@ class ProceduresModel:
                 float(procedure_data.get('procedure_cost', 0)) if procedure_data.get('procedure_cost') else 0.0
             )
             cursor.execute(query, values)
+            # Add the cost to the encounter's claim in the same transaction
+            billing_ids = ClaimsAndBillingModel.apply_line_item_change(
+                cursor, None, ClaimsAndBillingModel.line_item(cursor, 'procedures', procedure_id))
+            rollups.apply_change(cursor, 'procedures', [], rollups.capture(cursor, 'procedures', [procedure_id]))
             conn.commit()
-            
-            # Sync claim amount
-            ClaimsAndBillingModel.sync_claim_amount(procedure_data.get('encounter_id'))
+            catalog.procedures.add({
+                'procedure_code': procedure_data.get('procedure_code'),
+                'procedure_description': procedure_data.get('procedure_description')
+            })
+            for billing_id in billing_ids:
+                cache.invalidate('claims', billing_id)
             
             return procedure_id
         except ValueError as ve:
@@ -1838,6 +2091,53 @@ class ProceduresModel:
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
     
+    @staticmethod
+    def add_many(records):
+        """
+        Add many procedures in one transaction (POST /api/procedures/bulk).
+        Every record is validated first, procedure IDs are reserved as one
+        block, the rows go in with multi-row INSERTs and the claims of the
+        affected encounters are recomputed once at the end.
+        Returns the procedure IDs in the order of `records`.
+        """
+        bulk.validate(records, ('encounter_id', 'procedure_code', 'procedure_date'))
+        conn = None
+        try:
+            conn = get_db_connection()
+            cursor = get_db_cursor(conn)
+            encounter_ids = sorted({record['encounter_id'] for record in records})
+            ClaimsAndBillingModel.lock_encounters(cursor, *encounter_ids)
+
+            procedure_ids = bulk.assign_ids(records, 'procedures', 'procedure_id', 'PROC')
+            rows = [(
+                procedure_id,
+                record.get('encounter_id'),
+                record.get('procedure_code'),
+                record.get('procedure_description'),
+                record.get('procedure_date'),
+                record.get('provider_id'),
+                float(record.get('procedure_cost', 0)) if record.get('procedure_cost') else 0.0
+            ) for procedure_id, record in zip(procedure_ids, records)]
+            bulk.insert_rows(cursor, 'procedures',
+                             ('procedure_id', 'encounter_id', 'procedure_code', 'procedure_description',
+                              'procedure_date', 'provider_id', 'procedure_cost'), rows)
+            _, billing_ids = ClaimsAndBillingModel.recompute_locked(cursor, encounter_ids)
+            rollups.apply_change(cursor, 'procedures', [], rollups.capture(cursor, 'procedures', procedure_ids))
+            conn.commit()
+            for record in records:
+                catalog.procedures.add({
+                    'procedure_code': record.get('procedure_code'),
+                    'procedure_description': record.get('procedure_description')
+                })
+            for billing_id in billing_ids:
+                cache.invalidate('claims', billing_id)
+            return procedure_ids
+        except Error as e:
+            if conn: conn.rollback()
+            raise Error(f"Error adding procedures: {e}")
+        finally:
+            if conn and conn.is_connected(): cursor.close(); conn.close()
+
     @staticmethod
     def update(procedure_id, procedure_data):
         conn = None
@@ -1860,21 +2160,21 @@ class ProceduresModel:
             if not fields: return False
             
             values.append(procedure_id)
+            before = ClaimsAndBillingModel.line_item(cursor, 'procedures', procedure_id, lock=True)
+            ClaimsAndBillingModel.lock_encounters(cursor, before and before['encounter_id'], procedure_data.get('encounter_id'))
+            counted = rollups.capture(cursor, 'procedures', [procedure_id])
             cursor.execute(f"UPDATE procedures SET {', '.join(fields)} WHERE procedure_id = %s", values)
+            updated = cursor.rowcount
+            # Move the cost difference (or the whole cost, if the encounter changed) between claims
+            billing_ids = ClaimsAndBillingModel.apply_line_item_change(
+                cursor, before, ClaimsAndBillingModel.line_item(cursor, 'procedures', procedure_id))
+            rollups.apply_change(cursor, 'procedures', counted, rollups.capture(cursor, 'procedures', [procedure_id]))
             conn.commit()
+            cache.invalidate('procedures', procedure_id)
+            for billing_id in billing_ids:
+                cache.invalidate('claims', billing_id)
             
-            # Fetch encounter_id if not in data, to sync claim amount
-            if 'encounter_id' in procedure_data:
-                encounter_id = procedure_data['encounter_id']
-            else:
-                cursor.execute("SELECT encounter_id FROM procedures WHERE procedure_id = %s", (procedure_id,))
-                res = cursor.fetchone()
-                encounter_id = res['encounter_id'] if res else None
-            
-            if encounter_id:
-                ClaimsAndBillingModel.sync_claim_amount(encounter_id)
-            
-            return cursor.rowcount > 0
+            return updated > 0
         except ValueError as ve:
             if conn: conn.rollback()
             raise ve
@@ -1890,18 +2190,21 @@ class ProceduresModel:
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            # Fetch encounter_id before delete to sync claim amount
-            cursor.execute("SELECT encounter_id FROM procedures WHERE procedure_id = %s", (procedure_id,))
-            res = cursor.fetchone()
-            encounter_id = res['encounter_id'] if res else None
+            # Fetch the row before delete to take its cost off the claim
+            before = ClaimsAndBillingModel.line_item(cursor, 'procedures', procedure_id, lock=True)
+            ClaimsAndBillingModel.lock_encounters(cursor, before and before['encounter_id'])
             
+            counted = rollups.capture(cursor, 'procedures', [procedure_id])
             cursor.execute("DELETE FROM procedures WHERE procedure_id = %s", (procedure_id,))
+            deleted = cursor.rowcount
+            billing_ids = ClaimsAndBillingModel.apply_line_item_change(cursor, before, None)
+            rollups.apply_change(cursor, 'procedures', counted, [])
             conn.commit()
+            cache.invalidate('procedures', procedure_id)
+            for billing_id in billing_ids:
+                cache.invalidate('claims', billing_id)
             
-            if encounter_id:
-                ClaimsAndBillingModel.sync_claim_amount(encounter_id)
-                
-            return cursor.rowcount > 0
+            return deleted > 0
         except Error as e:
             if conn: conn.rollback()
             raise Error(f"Error deleting procedure: {e}")
@@ -1910,15 +2213,12 @@ class ProceduresModel:
             
     @staticmethod
     def get_distinct_codes():
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = get_db_cursor(conn)
-            cursor.execute("SELECT DISTINCT procedure_code, procedure_description FROM procedures ORDER BY procedure_code")
-            return cursor.fetchall()
-        except Error as e: raise Error(f"Error fetching distinct procedure codes: {e}")
-        finally:
-            if conn and conn.is_connected(): cursor.close(); conn.close()
+        return catalog.procedures.get('procedure_codes')
+    
+    @staticmethod
+    def get_options():
+        """Get every dropdown vocabulary of the procedure form as ({name: rows}, etag)."""
+        return catalog.procedures.snapshot()
 
 
 class LabTestsModel:
@@ -1931,9 +2231,37 @@ class LabTestsModel:
         "test_code": "lt.test_code",
         "status": "lt.status"
     }
-    
-    @staticmethod
-    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='test_date', sort_dir='desc'):
+    PRIMARY_KEY = "lt.test_id"
+    SEARCH = SearchSpec(
+        fulltext=[("lt.test_name",)],
+        prefix=["lt.test_id", "lt.test_code", "lt.encounter_id", "lt.lab_id", "lt.status"],
+        related=[("e.patient_id", PATIENT_NAME)]
+    )
+    QUERY = ListQuery(
+        "lab_tests lt",
+        columns=["lt.*", "e.encounter_id", "e.visit_date", "p.patient_id", "p.first_name", "p.last_name"],
+        fields=["test_id", "lab_id", "encounter_id", "test_name", "test_code", "specimen_type", "test_result",
+                "units", "normal_range", "test_date", "status"],
+        joins=[
+            Join("e", "LEFT JOIN encounters e ON lt.encounter_id = e.encounter_id"),
+            Join("p", "LEFT JOIN patients p ON e.patient_id = p.patient_id"),
+        ],
+        filters={
+            "test_id": Filter("lt.test_id"),
+            "encounter_id": Filter("lt.encounter_id"),
+            "test_code": Filter("lt.test_code"),
+            "lab_id": Filter("lt.lab_id"),
+            "test_date_from": Filter("lt.test_date", "gte"),
+            "test_date_to": Filter("lt.test_date", "lte"),
+            "status": Filter("lt.status"),
+            "specimen_type": Filter("lt.specimen_type"),
+        },
+        sortable=SORTABLE_COLUMNS, default_sort="lt.test_date",
+        primary_key=PRIMARY_KEY, search=SEARCH
+    )
+    
+    @staticmethod
+    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='test_date', sort_dir='desc', after=None, count='exact', fields=None):
         """
         Get all lab tests with optional search, filters, sorting, and pagination.
         Uses SQL LIKE for search and filtering.
@@ -1942,114 +2270,44 @@ class LabTestsModel:
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            
-            # Build base query with JOINs
-            base_query = """
-                SELECT lt.*, 
-                       e.encounter_id, e.visit_date,
-                       p.patient_id, p.first_name, p.last_name
-                FROM lab_tests lt
-                LEFT JOIN encounters e ON lt.encounter_id = e.encounter_id
-                LEFT JOIN patients p ON e.patient_id = p.patient_id
-                WHERE 1=1
-            """
-            params = []
-            
-            # General search
-            if search:
-                like_term = f"%{search}%"
-                base_query += """
-                    AND (lt.test_id LIKE %s OR lt.test_code LIKE %s OR lt.encounter_id LIKE %s
-                    OR lt.test_name LIKE %s OR CONCAT(p.first_name, ' ', p.last_name) LIKE %s 
-                    OR lt.lab_id LIKE %s OR lt.status LIKE %s)
-                """
-                params.extend([like_term] * 7)
-            
-            # Detailed filters
-            filters = filters or {}
-            if filters.get('test_id'): base_query += " AND lt.test_id LIKE %s"; params.append(f"%{filters['test_id']}%")
-            if filters.get('encounter_id'): base_query += " AND lt.encounter_id LIKE %s"; params.append(f"%{filters['encounter_id']}%")
-            if filters.get('test_code'): base_query += " AND lt.test_code LIKE %s"; params.append(f"%{filters['test_code']}%")
-            if filters.get('lab_id'): base_query += " AND lt.lab_id LIKE %s"; params.append(f"%{filters['lab_id']}%")
-            if filters.get('test_date_from'): base_query += " AND lt.test_date >= %s"; params.append(filters['test_date_from'])
-            if filters.get('test_date_to'): base_query += " AND lt.test_date <= %s"; params.append(filters['test_date_to'])
-            if filters.get('status'): base_query += " AND lt.status LIKE %s"; params.append(f"%{filters['status']}%")
-            if filters.get('specimen_type'): base_query += " AND lt.specimen_type LIKE %s"; params.append(f"%{filters['specimen_type']}%")
-            
-            # Get total count - build separate count query
-            count_base = """
-                SELECT COUNT(*) as total
-                FROM lab_tests lt
-                LEFT JOIN encounters e ON lt.encounter_id = e.encounter_id
-                LEFT JOIN patients p ON e.patient_id = p.patient_id
-                WHERE 1=1
-            """
-            count_params = []
-            
-            # Apply same filters to count query
-            if search:
-                like_term = f"%{search}%"
-                count_base += """
-                    AND (lt.test_id LIKE %s OR lt.test_code LIKE %s OR lt.encounter_id LIKE %s
-                    OR lt.test_name LIKE %s OR CONCAT(p.first_name, ' ', p.last_name) LIKE %s 
-                    OR lt.lab_id LIKE %s OR lt.status LIKE %s)
-                """
-                count_params.extend([like_term] * 7)
-            
-            if filters.get('test_id'): count_base += " AND lt.test_id LIKE %s"; count_params.append(f"%{filters['test_id']}%")
-            if filters.get('encounter_id'): count_base += " AND lt.encounter_id LIKE %s"; count_params.append(f"%{filters['encounter_id']}%")
-            if filters.get('test_code'): count_base += " AND lt.test_code LIKE %s"; count_params.append(f"%{filters['test_code']}%")
-            if filters.get('lab_id'): count_base += " AND lt.lab_id LIKE %s"; count_params.append(f"%{filters['lab_id']}%")
-            if filters.get('test_date_from'): count_base += " AND lt.test_date >= %s"; count_params.append(filters['test_date_from'])
-            if filters.get('test_date_to'): count_base += " AND lt.test_date <= %s"; count_params.append(filters['test_date_to'])
-            if filters.get('status'): count_base += " AND lt.status LIKE %s"; count_params.append(f"%{filters['status']}%")
-            if filters.get('specimen_type'): count_base += " AND lt.specimen_type LIKE %s"; count_params.append(f"%{filters['specimen_type']}%")
-            
-            cursor.execute(count_base, count_params)
-            count_result = cursor.fetchone()
-            total_count = count_result['total'] if count_result else 0
-            
-            # Apply sorting and pagination
-            sort_col = LabTestsModel.SORTABLE_COLUMNS.get(sort_by, 'lt.test_date')
-            sort_d = 'ASC' if str(sort_dir).lower() == 'asc' else 'DESC'
-            offset = (page - 1) * limit
-            query = f"{base_query} ORDER BY {sort_col} {sort_d} LIMIT %s OFFSET %s"
-            params.extend([limit, offset])
-            
-            cursor.execute(query, params)
-            lab_tests = cursor.fetchall()
-            
-            return {
-                'data': lab_tests,
-                'total': total_count,
-                'page': page,
-                'per_page': limit,
-                'total_pages': (total_count + limit - 1) // limit
-            }
+            return LabTestsModel.QUERY.paginate(cursor, search, filters, sort_by, sort_dir, limit, page, after, count, fields)
         except Error as e: raise Error(f"Error fetching lab tests: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
-    
+
     @staticmethod
+    def export(search=None, filters=None, sort_by='test_date', sort_dir='desc', fields=None):
+        """Every row matching the list query, for streaming (see streaming.Export)."""
+        return streaming.Export(LabTestsModel.QUERY, search, filters, sort_by, sort_dir, fields)
+    
+    ROW_QUERY = """
+        SELECT lt.*,
+               e.encounter_id, e.visit_date,
+               p.patient_id, p.first_name, p.last_name
+        FROM lab_tests lt
+        LEFT JOIN encounters e ON lt.encounter_id = e.encounter_id
+        LEFT JOIN patients p ON e.patient_id = p.patient_id
+    """
+
+    @staticmethod
+    @cache.cached('lab_tests', lambda row: [('encounters', row.get('encounter_id')), ('patients', row.get('patient_id'))])
     def get_by_id(test_id):
         conn = None
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            query = """
-                SELECT lt.*, 
-                       e.encounter_id, e.visit_date,
-                       p.patient_id, p.first_name, p.last_name
-                FROM lab_tests lt
-                LEFT JOIN encounters e ON lt.encounter_id = e.encounter_id
-                LEFT JOIN patients p ON e.patient_id = p.patient_id
-                WHERE lt.test_id = %s
-            """
+            query = f"{LabTestsModel.ROW_QUERY} WHERE lt.test_id = %s"
             cursor.execute(query, (test_id,))
             return cursor.fetchone()
         except Error as e: raise Error(f"Error fetching lab test: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    @staticmethod
+    @cache.cached_many('lab_tests', lambda row: [('encounters', row.get('encounter_id')), ('patients', row.get('patient_id'))])
+    def get_by_ids(test_ids):
+        """Many lab tests in one query, as {test_id: row}; IDs without a row are left out."""
+        return _rows_by_ids(LabTestsModel.ROW_QUERY, 'lt.test_id', test_ids, 'lab tests')
     
     @staticmethod
     def add(lab_test_data):
@@ -2075,7 +2333,7 @@ class LabTestsModel:
             cursor = get_db_cursor(conn)
             
             # Generate test_id with T prefix and 5 digit padding (T00000 format)
-            test_id = lab_test_data.get('test_id') or generate_new_id(cursor, 'lab_tests', 'test_id', 'T', 5)
+            test_id = use_or_generate_id(cursor, lab_test_data.get('test_id'), 'lab_tests', 'test_id', 'T', 5)
             
             query = """
                 INSERT INTO lab_tests 
@@ -2097,6 +2355,9 @@ class LabTestsModel:
             )
             cursor.execute(query, values)
             conn.commit()
+            catalog.lab_tests.add(dict(zip(
+                ('test_id', 'lab_id', 'encounter_id', 'test_name', 'test_code', 'specimen_type', 'test_result',
+                 'units', 'normal_range', 'test_date', 'status'), values)))
             return test_id
         except ValueError as ve:
             if conn: conn.rollback()
@@ -2107,6 +2368,47 @@ class LabTestsModel:
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
     
+    @staticmethod
+    def add_many(records):
+        """
+        Add many lab tests in one transaction (POST /api/lab-tests/bulk).
+        Every record is validated first, test IDs are reserved as one block
+        and the rows go in with multi-row INSERTs.
+        Returns the test IDs in the order of `records`.
+        """
+        bulk.validate(records, ('encounter_id', 'test_code', 'test_name', 'test_date', 'status'))
+        columns = ('test_id', 'lab_id', 'encounter_id', 'test_name', 'test_code', 'specimen_type', 'test_result',
+                   'units', 'normal_range', 'test_date', 'status')
+        conn = None
+        try:
+            conn = get_db_connection()
+            cursor = get_db_cursor(conn)
+
+            test_ids = bulk.assign_ids(records, 'lab_tests', 'test_id', 'T', 5)
+            rows = [(
+                test_id,
+                record.get('lab_id'),
+                record.get('encounter_id'),
+                record.get('test_name'),
+                record.get('test_code'),
+                record.get('specimen_type'),
+                record.get('test_result'),
+                record.get('units') or 'N/A',
+                record.get('normal_range') or 'N/A',
+                record.get('test_date'),
+                record.get('status')
+            ) for test_id, record in zip(test_ids, records)]
+            bulk.insert_rows(cursor, 'lab_tests', columns, rows)
+            conn.commit()
+            for row in rows:
+                catalog.lab_tests.add(dict(zip(columns, row)))
+            return test_ids
+        except Error as e:
+            if conn: conn.rollback()
+            raise Error(f"Error adding lab tests: {e}")
+        finally:
+            if conn and conn.is_connected(): cursor.close(); conn.close()
+
     @staticmethod
     def update(test_id, lab_test_data):
         conn = None
@@ -2127,6 +2429,8 @@ class LabTestsModel:
             values.append(test_id)
             cursor.execute(f"UPDATE lab_tests SET {', '.join(fields)} WHERE test_id = %s", values)
             conn.commit()
+            cache.invalidate('lab_tests', test_id)
+            catalog.lab_tests.invalidate()
             return cursor.rowcount > 0
         except ValueError as ve:
             if conn: conn.rollback()
@@ -2145,6 +2449,8 @@ class LabTestsModel:
             cursor = get_db_cursor(conn)
             cursor.execute("DELETE FROM lab_tests WHERE test_id = %s", (test_id,))
             conn.commit()
+            cache.invalidate('lab_tests', test_id)
+            catalog.lab_tests.invalidate()
             return cursor.rowcount > 0
         except Error as e:
             if conn: conn.rollback()
@@ -2155,80 +2461,37 @@ class LabTestsModel:
     @staticmethod
     def get_distinct_codes():
         """Get all distinct test codes with test names."""
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = get_db_cursor(conn)
-            cursor.execute("SELECT DISTINCT test_code, test_name FROM lab_tests ORDER BY test_code")
-            return cursor.fetchall()
-        except Error as e: raise Error(f"Error fetching distinct test codes: {e}")
-        finally:
-            if conn and conn.is_connected(): cursor.close(); conn.close()
+        return catalog.lab_tests.get('test_codes')
     
     @staticmethod
     def get_distinct_lab_ids():
         """Get all distinct lab IDs."""
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = get_db_cursor(conn)
-            cursor.execute("SELECT DISTINCT lab_id FROM lab_tests WHERE lab_id IS NOT NULL AND lab_id != '' ORDER BY lab_id")
-            return cursor.fetchall()
-        except Error as e: raise Error(f"Error fetching distinct lab IDs: {e}")
-        finally:
-            if conn and conn.is_connected(): cursor.close(); conn.close()
+        return catalog.lab_tests.get('lab_ids')
     
     @staticmethod
     def get_distinct_specimen_types():
         """Get all distinct specimen types."""
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = get_db_cursor(conn)
-            cursor.execute("SELECT DISTINCT specimen_type FROM lab_tests WHERE specimen_type IS NOT NULL AND specimen_type != '' ORDER BY specimen_type")
-            return cursor.fetchall()
-        except Error as e: raise Error(f"Error fetching distinct specimen types: {e}")
-        finally:
-            if conn and conn.is_connected(): cursor.close(); conn.close()
+        return catalog.lab_tests.get('specimen_types')
     
     @staticmethod
     def get_distinct_units():
         """Get all distinct units."""
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = get_db_cursor(conn)
-            cursor.execute("SELECT DISTINCT units FROM lab_tests WHERE units IS NOT NULL AND units != '' ORDER BY units")
-            return cursor.fetchall()
-        except Error as e: raise Error(f"Error fetching distinct units: {e}")
-        finally:
-            if conn and conn.is_connected(): cursor.close(); conn.close()
+        return catalog.lab_tests.get('units')
     
     @staticmethod
     def get_distinct_normal_ranges():
         """Get all distinct normal ranges."""
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = get_db_cursor(conn)
-            cursor.execute("SELECT DISTINCT normal_range FROM lab_tests WHERE normal_range IS NOT NULL AND normal_range != '' ORDER BY normal_range")
-            return cursor.fetchall()
-        except Error as e: raise Error(f"Error fetching distinct normal ranges: {e}")
-        finally:
-            if conn and conn.is_connected(): cursor.close(); conn.close()
+        return catalog.lab_tests.get('normal_ranges')
     
     @staticmethod
     def get_distinct_test_results():
         """Get all distinct test results."""
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = get_db_cursor(conn)
-            cursor.execute("SELECT DISTINCT test_result FROM lab_tests WHERE test_result IS NOT NULL AND test_result != '' ORDER BY test_result")
-            return cursor.fetchall()
-        except Error as e: raise Error(f"Error fetching distinct test results: {e}")
-        finally:
-            if conn and conn.is_connected(): cursor.close(); conn.close()
+        return catalog.lab_tests.get('test_results')
+    
+    @staticmethod
+    def get_options():
+        """Get every dropdown vocabulary of the lab test form as ({name: rows}, etag)."""
+        return catalog.lab_tests.snapshot()
 
 
 class DiagnosesModel:
@@ -2240,9 +2503,34 @@ class DiagnosesModel:
         "diagnosis_code": "d.diagnosis_code",
         "primary_flag": "d.primary_flag"
     }
-    
-    @staticmethod
-    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='diagnosis_id', sort_dir='desc'):
+    PRIMARY_KEY = "d.diagnosis_id"
+    SEARCH = SearchSpec(
+        fulltext=[("d.diagnosis_description",)],
+        prefix=["d.diagnosis_id", "d.diagnosis_code", "d.encounter_id"],
+        related=[("e.patient_id", PATIENT_NAME)]
+    )
+    QUERY = ListQuery(
+        "diagnoses d",
+        columns=["d.*", "e.encounter_id", "e.visit_date", "p.patient_id", "p.first_name", "p.last_name"],
+        fields=["diagnosis_id", "encounter_id", "diagnosis_code", "diagnosis_description", "primary_flag",
+                "chronic_flag"],
+        joins=[
+            Join("e", "LEFT JOIN encounters e ON d.encounter_id = e.encounter_id"),
+            Join("p", "LEFT JOIN patients p ON e.patient_id = p.patient_id"),
+        ],
+        filters={
+            "diagnosis_id": Filter("d.diagnosis_id"),
+            "encounter_id": Filter("d.encounter_id"),
+            "diagnosis_code": Filter("d.diagnosis_code"),
+            "primary_flag": Filter("d.primary_flag", "flag"),
+            "chronic_flag": Filter("d.chronic_flag", "flag"),
+        },
+        sortable=SORTABLE_COLUMNS, default_sort="d.diagnosis_id",
+        primary_key=PRIMARY_KEY, search=SEARCH
+    )
+    
+    @staticmethod
+    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='diagnosis_id', sort_dir='desc', after=None, count='exact', fields=None):
         """
         Get all diagnoses with optional search, filters, sorting, and pagination.
         Uses SQL LIKE for search and filtering.
@@ -2251,122 +2539,44 @@ class DiagnosesModel:
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            
-            # Build base query with JOINs
-            base_query = """
-                SELECT d.*, 
-                       e.encounter_id, e.visit_date,
-                       p.patient_id, p.first_name, p.last_name
-                FROM diagnoses d
-                LEFT JOIN encounters e ON d.encounter_id = e.encounter_id
-                LEFT JOIN patients p ON e.patient_id = p.patient_id
-                WHERE 1=1
-            """
-            params = []
-            
-            # General search
-            if search:
-                like_term = f"%{search}%"
-                base_query += """
-                    AND (d.diagnosis_id LIKE %s OR d.diagnosis_code LIKE %s OR d.encounter_id LIKE %s
-                    OR d.diagnosis_description LIKE %s OR CONCAT(p.first_name, ' ', p.last_name) LIKE %s)
-                """
-                params.extend([like_term] * 5)
-            
-            # Detailed filters
-            filters = filters or {}
-            if filters.get('diagnosis_id'): base_query += " AND d.diagnosis_id LIKE %s"; params.append(f"%{filters['diagnosis_id']}%")
-            if filters.get('encounter_id'): base_query += " AND d.encounter_id LIKE %s"; params.append(f"%{filters['encounter_id']}%")
-            if filters.get('diagnosis_code'): base_query += " AND d.diagnosis_code LIKE %s"; params.append(f"%{filters['diagnosis_code']}%")
-            if filters.get('primary_flag') is not None:
-                if str(filters['primary_flag']).lower() in ['true', '1', 'yes']:
-                    base_query += " AND d.primary_flag = 1"
-                elif str(filters['primary_flag']).lower() in ['false', '0', 'no']:
-                    base_query += " AND d.primary_flag = 0"
-            if filters.get('chronic_flag') is not None:
-                if str(filters['chronic_flag']).lower() in ['true', '1', 'yes']:
-                    base_query += " AND d.chronic_flag = 1"
-                elif str(filters['chronic_flag']).lower() in ['false', '0', 'no']:
-                    base_query += " AND d.chronic_flag = 0"
-            
-            # Get total count - build separate count query
-            count_base = """
-                SELECT COUNT(*) as total
-                FROM diagnoses d
-                LEFT JOIN encounters e ON d.encounter_id = e.encounter_id
-                LEFT JOIN patients p ON e.patient_id = p.patient_id
-                WHERE 1=1
-            """
-            count_params = []
-            
-            # Apply same filters to count query
-            if search:
-                like_term = f"%{search}%"
-                count_base += """
-                    AND (d.diagnosis_id LIKE %s OR d.diagnosis_code LIKE %s OR d.encounter_id LIKE %s
-                    OR d.diagnosis_description LIKE %s OR CONCAT(p.first_name, ' ', p.last_name) LIKE %s)
-                """
-                count_params.extend([like_term] * 5)
-            
-            if filters.get('diagnosis_id'): count_base += " AND d.diagnosis_id LIKE %s"; count_params.append(f"%{filters['diagnosis_id']}%")
-            if filters.get('encounter_id'): count_base += " AND d.encounter_id LIKE %s"; count_params.append(f"%{filters['encounter_id']}%")
-            if filters.get('diagnosis_code'): count_base += " AND d.diagnosis_code LIKE %s"; count_params.append(f"%{filters['diagnosis_code']}%")
-            if filters.get('primary_flag') is not None:
-                if str(filters['primary_flag']).lower() in ['true', '1', 'yes']:
-                    count_base += " AND d.primary_flag = 1"
-                elif str(filters['primary_flag']).lower() in ['false', '0', 'no']:
-                    count_base += " AND d.primary_flag = 0"
-            if filters.get('chronic_flag') is not None:
-                if str(filters['chronic_flag']).lower() in ['true', '1', 'yes']:
-                    count_base += " AND d.chronic_flag = 1"
-                elif str(filters['chronic_flag']).lower() in ['false', '0', 'no']:
-                    count_base += " AND d.chronic_flag = 0"
-            
-            cursor.execute(count_base, count_params)
-            count_result = cursor.fetchone()
-            total_count = count_result['total'] if count_result else 0
-            
-            # Apply sorting and pagination
-            sort_col = DiagnosesModel.SORTABLE_COLUMNS.get(sort_by, 'd.diagnosis_id')
-            sort_d = 'ASC' if str(sort_dir).lower() == 'asc' else 'DESC'
-            offset = (page - 1) * limit
-            query = f"{base_query} ORDER BY {sort_col} {sort_d} LIMIT %s OFFSET %s"
-            params.extend([limit, offset])
-            
-            cursor.execute(query, params)
-            diagnoses = cursor.fetchall()
-            
-            return {
-                'data': diagnoses,
-                'total': total_count,
-                'page': page,
-                'per_page': limit,
-                'total_pages': (total_count + limit - 1) // limit
-            }
+            return DiagnosesModel.QUERY.paginate(cursor, search, filters, sort_by, sort_dir, limit, page, after, count, fields)
         except Error as e: raise Error(f"Error fetching diagnoses: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
-    
+
+    @staticmethod
+    def export(search=None, filters=None, sort_by='diagnosis_id', sort_dir='desc', fields=None):
+        """Every row matching the list query, for streaming (see streaming.Export)."""
+        return streaming.Export(DiagnosesModel.QUERY, search, filters, sort_by, sort_dir, fields)
+    
+    ROW_QUERY = """
+        SELECT d.*,
+               e.encounter_id, e.visit_date,
+               p.patient_id, p.first_name, p.last_name
+        FROM diagnoses d
+        LEFT JOIN encounters e ON d.encounter_id = e.encounter_id
+        LEFT JOIN patients p ON e.patient_id = p.patient_id
+    """
+
     @staticmethod
+    @cache.cached('diagnoses', lambda row: [('encounters', row.get('encounter_id')), ('patients', row.get('patient_id'))])
     def get_by_id(diagnosis_id):
         conn = None
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            query = """
-                SELECT d.*, 
-                       e.encounter_id, e.visit_date,
-                       p.patient_id, p.first_name, p.last_name
-                FROM diagnoses d
-                LEFT JOIN encounters e ON d.encounter_id = e.encounter_id
-                LEFT JOIN patients p ON e.patient_id = p.patient_id
-                WHERE d.diagnosis_id = %s
-            """
+            query = f"{DiagnosesModel.ROW_QUERY} WHERE d.diagnosis_id = %s"
             cursor.execute(query, (diagnosis_id,))
             return cursor.fetchone()
         except Error as e: raise Error(f"Error fetching diagnosis: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    @staticmethod
+    @cache.cached_many('diagnoses', lambda row: [('encounters', row.get('encounter_id')), ('patients', row.get('patient_id'))])
+    def get_by_ids(diagnosis_ids):
+        """Many diagnoses in one query, as {diagnosis_id: row}; IDs without a row are left out."""
+        return _rows_by_ids(DiagnosesModel.ROW_QUERY, 'd.diagnosis_id', diagnosis_ids, 'diagnoses')
     
     @staticmethod
     def add(diagnosis_data):
@@ -2385,7 +2595,7 @@ class DiagnosesModel:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
             
-            diagnosis_id = diagnosis_data.get('diagnosis_id') or generate_new_id(cursor, 'diagnoses', 'diagnosis_id', 'DIA', 6)
+            diagnosis_id = use_or_generate_id(cursor, diagnosis_data.get('diagnosis_id'), 'diagnoses', 'diagnosis_id', 'DIA', 6)
             
             query = """
                 INSERT INTO diagnoses 
@@ -2410,6 +2620,10 @@ class DiagnosesModel:
                 )
             
             conn.commit()
+            catalog.diagnoses.add(diagnosis_data)
+            if diagnosis_data.get('diagnosis_code'):
+                cache.invalidate('encounters', diagnosis_data.get('encounter_id'))
+            encounter_lookup.undiagnosed.discard(diagnosis_data.get('encounter_id'))
             return diagnosis_id
         except ValueError as ve:
             if conn: conn.rollback()
@@ -2420,6 +2634,55 @@ class DiagnosesModel:
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
     
+    @staticmethod
+    def add_many(records):
+        """
+        Add many diagnoses in one transaction (POST /api/diagnoses/bulk).
+        Every record is validated first, diagnosis IDs are reserved as one
+        block and the rows go in with multi-row INSERTs. Each encounter's
+        diagnosis_code is set once, to the last of its records, as add() would.
+        Returns the diagnosis IDs in the order of `records`.
+        """
+        bulk.validate(records, ('encounter_id', 'diagnosis_code'))
+        conn = None
+        try:
+            conn = get_db_connection()
+            cursor = get_db_cursor(conn)
+
+            diagnosis_ids = bulk.assign_ids(records, 'diagnoses', 'diagnosis_id', 'DIA')
+            rows = [(
+                diagnosis_id,
+                record.get('encounter_id'),
+                record.get('diagnosis_code'),
+                record.get('diagnosis_description'),
+                1 if str(record.get('primary_flag', '1')).lower() in ['true', '1', 'yes'] else 0,
+                1 if str(record.get('chronic_flag', '0')).lower() in ['true', '1', 'yes'] else 0 if record.get('chronic_flag') is not None else None
+            ) for diagnosis_id, record in zip(diagnosis_ids, records)]
+            bulk.insert_rows(cursor, 'diagnoses',
+                             ('diagnosis_id', 'encounter_id', 'diagnosis_code', 'diagnosis_description',
+                              'primary_flag', 'chronic_flag'), rows)
+
+            # Update the encounters with their (last) diagnosis code in one statement
+            codes = {record['encounter_id']: record['diagnosis_code'] for record in records}
+            cursor.execute(f"""
+                UPDATE encounters
+                SET diagnosis_code = CASE encounter_id {' '.join(['WHEN %s THEN %s'] * len(codes))} END
+                WHERE encounter_id IN ({', '.join(['%s'] * len(codes))})
+            """, [value for item in codes.items() for value in item] + list(codes))
+
+            conn.commit()
+            for record in records:
+                catalog.diagnoses.add(record)
+            for encounter_id in codes:
+                cache.invalidate('encounters', encounter_id)
+                encounter_lookup.undiagnosed.discard(encounter_id)
+            return diagnosis_ids
+        except Error as e:
+            if conn: conn.rollback()
+            raise Error(f"Error adding diagnoses: {e}")
+        finally:
+            if conn and conn.is_connected(): cursor.close(); conn.close()
+
     @staticmethod
     def update(diagnosis_id, diagnosis_data):
         conn = None
@@ -2448,10 +2711,17 @@ class DiagnosesModel:
             
             if not fields: return False
             
+            old_encounter_id = None
+            if 'encounter_id' in diagnosis_data:
+                cursor.execute("SELECT encounter_id FROM diagnoses WHERE diagnosis_id = %s", (diagnosis_id,))
+                res = cursor.fetchone()
+                old_encounter_id = res['encounter_id'] if res else None
+            
             values.append(diagnosis_id)
             cursor.execute(f"UPDATE diagnoses SET {', '.join(fields)} WHERE diagnosis_id = %s", values)
             
             # If diagnosis_code is updated, update the encounter as well
+            enc_id = None
             if 'diagnosis_code' in diagnosis_data and diagnosis_data['diagnosis_code']:
                  # Need to fetch encounter_id for this diagnosis first or if it's in data
                 enc_id = diagnosis_data.get('encounter_id')
@@ -2470,6 +2740,12 @@ class DiagnosesModel:
                     )
 
             conn.commit()
+            cache.invalidate('diagnoses', diagnosis_id)
+            if enc_id:
+                cache.invalidate('encounters', enc_id)
+            catalog.diagnoses.invalidate()
+            if old_encounter_id is not None:
+                encounter_lookup.undiagnosed.refresh(old_encounter_id, diagnosis_data.get('encounter_id'))
             return cursor.rowcount > 0
         except ValueError as ve:
             if conn: conn.rollback()
@@ -2486,9 +2762,16 @@ class DiagnosesModel:
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
+            cursor.execute("SELECT encounter_id FROM diagnoses WHERE diagnosis_id = %s", (diagnosis_id,))
+            res = cursor.fetchone()
             cursor.execute("DELETE FROM diagnoses WHERE diagnosis_id = %s", (diagnosis_id,))
+            deleted = cursor.rowcount
             conn.commit()
-            return cursor.rowcount > 0
+            cache.invalidate('diagnoses', diagnosis_id)
+            catalog.diagnoses.invalidate()
+            if res:
+                encounter_lookup.undiagnosed.refresh(res['encounter_id'])
+            return deleted > 0
         except Error as e:
             if conn: conn.rollback()
             raise Error(f"Error deleting diagnosis: {e}")
@@ -2497,54 +2780,18 @@ class DiagnosesModel:
             
     @staticmethod
     def get_available_encounters(search=None, limit=50):
-        """Get encounters that do NOT have a diagnosis yet."""
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = get_db_cursor(conn)
-            
-            query = """
-                SELECT e.encounter_id, e.visit_date, 
-                       p.first_name as patient_first_name, p.last_name as patient_last_name,
-                       e.diagnosis_code
-                FROM encounters e
-                LEFT JOIN diagnoses d ON e.encounter_id = d.encounter_id
-                LEFT JOIN patients p ON e.patient_id = p.patient_id
-                WHERE d.encounter_id IS NULL
-            """
-            params = []
-            
-            if search:
-                query += " AND (e.encounter_id LIKE %s OR CONCAT(p.first_name, ' ', p.last_name) LIKE %s)"
-                params.extend([f"%{search}%", f"%{search}%"])
-                
-            query += " ORDER BY e.visit_date DESC LIMIT %s"
-            params.append(limit)
-            
-            cursor.execute(query, params)
-            return cursor.fetchall()
-        except Error as e: raise Error(f"Error fetching available encounters: {e}")
-        finally:
-            if conn and conn.is_connected(): cursor.close(); conn.close()
+        """Get encounters that do NOT have a diagnosis yet (from the maintained in-memory set)."""
+        return encounter_lookup.undiagnosed.search(search, limit)
 
     @staticmethod
     def get_distinct_codes():
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = get_db_cursor(conn)
-            # Fetch distinct codes. Use GROUP BY to ensure unique codes, picking one description.
-            cursor.execute("""
-                SELECT diagnosis_code, MAX(diagnosis_description) as diagnosis_description
-                FROM diagnoses
-                WHERE diagnosis_code IS NOT NULL AND diagnosis_code != ''
-                GROUP BY diagnosis_code
-                ORDER BY diagnosis_code
-            """)
-            return cursor.fetchall()
-        except Error as e: raise Error(f"Error fetching distinct diagnosis codes: {e}")
-        finally:
-            if conn and conn.is_connected(): cursor.close(); conn.close()
+        """Get all distinct diagnosis codes, one description per code."""
+        return catalog.diagnoses.get('diagnosis_codes')
+    
+    @staticmethod
+    def get_options():
+        """Get every dropdown vocabulary of the diagnosis form as ({name: rows}, etag)."""
+        return catalog.diagnoses.snapshot()
 
 
 class ProvidersModel:
@@ -2558,9 +2805,36 @@ class ProvidersModel:
         "npi": "pr.npi",
         "years_experience": "pr.years_experience"
     }
-    
-    @staticmethod
-    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='name', sort_dir='asc'):
+    PRIMARY_KEY = "pr.provider_id"
+    SEARCH = SearchSpec(
+        fulltext=[("pr.name", "pr.department", "pr.specialty")],
+        prefix=["pr.provider_id", "pr.npi"],
+        related=[("pr.head_id", DEPARTMENT_HEAD_NAME)]
+    )
+    QUERY = ListQuery(
+        "providers pr",
+        columns=["pr.*"],
+        fields=["provider_id", "name", "department", "specialty", "npi", "inhouse", "location",
+                "years_experience", "contact_info", "email", "head_id"],
+        lookups=[
+            Lookup("head_department", "pr.head_id", refdata.head_department),
+            Lookup("head_name", "pr.head_id", refdata.head_name),
+        ],
+        filters={
+            "provider_id": Filter("pr.provider_id"),
+            "name": Filter("pr.name"),
+            "department": Filter("pr.department"),
+            "specialty": Filter("pr.specialty"),
+            "npi": Filter("pr.npi"),
+            "inhouse": Filter("pr.inhouse", "flag"),
+            "head_id": Filter("pr.head_id", "eq", int),
+        },
+        sortable=SORTABLE_COLUMNS, default_sort="pr.name",
+        primary_key=PRIMARY_KEY, search=SEARCH
+    )
+    
+    @staticmethod
+    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='name', sort_dir='asc', after=None, count='exact', fields=None):
         """
         Get all providers with optional search, filters, sorting, and pagination.
         Uses SQL LIKE for search and filtering.
@@ -2569,91 +2843,7 @@ class ProvidersModel:
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            
-            # Build base query with JOINs
-            base_query = """
-                SELECT pr.*, 
-                       dh.head_id, dh.department as head_department, dh.head_name
-                FROM providers pr
-                LEFT JOIN department_heads dh ON pr.head_id = dh.head_id
-                WHERE 1=1
-            """
-            params = []
-            
-            # General search
-            if search:
-                like_term = f"%{search}%"
-                base_query += """
-                    AND (pr.provider_id LIKE %s OR pr.name LIKE %s OR pr.department LIKE %s
-                    OR pr.specialty LIKE %s OR pr.npi LIKE %s OR dh.head_name LIKE %s)
-                """
-                params.extend([like_term] * 6)
-            
-            # Detailed filters
-            filters = filters or {}
-            if filters.get('provider_id'): base_query += " AND pr.provider_id LIKE %s"; params.append(f"%{filters['provider_id']}%")
-            if filters.get('name'): base_query += " AND pr.name LIKE %s"; params.append(f"%{filters['name']}%")
-            if filters.get('department'): base_query += " AND pr.department LIKE %s"; params.append(f"%{filters['department']}%")
-            if filters.get('specialty'): base_query += " AND pr.specialty LIKE %s"; params.append(f"%{filters['specialty']}%")
-            if filters.get('npi'): base_query += " AND pr.npi LIKE %s"; params.append(f"%{filters['npi']}%")
-            if filters.get('inhouse') is not None:
-                if str(filters['inhouse']).lower() in ['true', '1', 'yes']:
-                    base_query += " AND pr.inhouse = 1"
-                elif str(filters['inhouse']).lower() in ['false', '0', 'no']:
-                    base_query += " AND pr.inhouse = 0"
-            if filters.get('head_id'): base_query += " AND pr.head_id = %s"; params.append(int(filters['head_id']))
-            
-            # Get total count - build separate count query
-            count_base = """
-                SELECT COUNT(*) as total
-                FROM providers pr
-                LEFT JOIN department_heads dh ON pr.head_id = dh.head_id
-                WHERE 1=1
-            """
-            count_params = []
-            
-            # Apply same filters to count query
-            if search:
-                like_term = f"%{search}%"
-                count_base += """
-                    AND (pr.provider_id LIKE %s OR pr.name LIKE %s OR pr.department LIKE %s
-                    OR pr.specialty LIKE %s OR pr.npi LIKE %s OR dh.head_name LIKE %s)
-                """
-                count_params.extend([like_term] * 6)
-            
-            if filters.get('provider_id'): count_base += " AND pr.provider_id LIKE %s"; count_params.append(f"%{filters['provider_id']}%")
-            if filters.get('name'): count_base += " AND pr.name LIKE %s"; count_params.append(f"%{filters['name']}%")
-            if filters.get('department'): count_base += " AND pr.department LIKE %s"; count_params.append(f"%{filters['department']}%")
-            if filters.get('specialty'): count_base += " AND pr.specialty LIKE %s"; count_params.append(f"%{filters['specialty']}%")
-            if filters.get('npi'): count_base += " AND pr.npi LIKE %s"; count_params.append(f"%{filters['npi']}%")
-            if filters.get('inhouse') is not None:
-                if str(filters['inhouse']).lower() in ['true', '1', 'yes']:
-                    count_base += " AND pr.inhouse = 1"
-                elif str(filters['inhouse']).lower() in ['false', '0', 'no']:
-                    count_base += " AND pr.inhouse = 0"
-            if filters.get('head_id'): count_base += " AND pr.head_id = %s"; count_params.append(int(filters['head_id']))
-            
-            cursor.execute(count_base, count_params)
-            count_result = cursor.fetchone()
-            total_count = count_result['total'] if count_result else 0
-            
-            # Apply sorting and pagination
-            sort_col = ProvidersModel.SORTABLE_COLUMNS.get(sort_by, 'pr.name')
-            sort_d = 'ASC' if str(sort_dir).lower() == 'asc' else 'DESC'
-            offset = (page - 1) * limit
-            query = f"{base_query} ORDER BY {sort_col} {sort_d} LIMIT %s OFFSET %s"
-            params.extend([limit, offset])
-            
-            cursor.execute(query, params)
-            providers = cursor.fetchall()
-            
-            return {
-                'data': providers,
-                'total': total_count,
-                'page': page,
-                'per_page': limit,
-                'total_pages': (total_count + limit - 1) // limit
-            }
+            return ProvidersModel.QUERY.paginate(cursor, search, filters, sort_by, sort_dir, limit, page, after, count, fields)
         except Error as e: raise Error(f"Error fetching providers: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
@@ -2685,54 +2875,40 @@ class ProvidersModel:
     
     @staticmethod
     def get_departments():
-        """Get all distinct departments."""
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = get_db_cursor(conn)
-            query = "SELECT DISTINCT department FROM providers WHERE department IS NOT NULL AND department != '' ORDER BY department"
-            cursor.execute(query)
-            return [row['department'] for row in cursor.fetchall()]
-        except Error as e: raise Error(f"Error fetching departments: {e}")
-        finally:
-            if conn and conn.is_connected(): cursor.close(); conn.close()
+        """Get all distinct departments (from the reference data snapshot)."""
+        return refdata.departments()
     
     @staticmethod
     def get_specialties(department=None):
-        """Get all distinct specialties, optionally filtered by department."""
-        conn = None
-        try:
-            conn = get_db_connection()
-            cursor = get_db_cursor(conn)
-            if department:
-                query = "SELECT DISTINCT specialty FROM providers WHERE department = %s AND specialty IS NOT NULL AND specialty != '' ORDER BY specialty"
-                cursor.execute(query, (department,))
-            else:
-                query = "SELECT DISTINCT specialty FROM providers WHERE specialty IS NOT NULL AND specialty != '' ORDER BY specialty"
-                cursor.execute(query)
-            return [row['specialty'] for row in cursor.fetchall()]
-        except Error as e: raise Error(f"Error fetching specialties: {e}")
-        finally:
-            if conn and conn.is_connected(): cursor.close(); conn.close()
-    
+        """Get all distinct specialties, optionally filtered by department (from the reference data snapshot)."""
+        return refdata.specialties(department)
+    
+    ROW_QUERY = """
+        SELECT pr.*,
+               dh.head_id, dh.department as head_department, dh.head_name
+        FROM providers pr
+        LEFT JOIN department_heads dh ON pr.head_id = dh.head_id
+    """
+
     @staticmethod
+    @cache.cached('providers', lambda row: [('department_heads', row.get('head_id'))])
     def get_by_id(provider_id):
         conn = None
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            query = """
-                SELECT pr.*, 
-                       dh.head_id, dh.department as head_department, dh.head_name
-                FROM providers pr
-                LEFT JOIN department_heads dh ON pr.head_id = dh.head_id
-                WHERE pr.provider_id = %s
-            """
+            query = f"{ProvidersModel.ROW_QUERY} WHERE pr.provider_id = %s"
             cursor.execute(query, (provider_id,))
             return cursor.fetchone()
         except Error as e: raise Error(f"Error fetching provider: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    @staticmethod
+    @cache.cached_many('providers', lambda row: [('department_heads', row.get('head_id'))])
+    def get_by_ids(provider_ids):
+        """Many providers in one query, as {provider_id: row}; IDs without a row are left out."""
+        return _rows_by_ids(ProvidersModel.ROW_QUERY, 'pr.provider_id', provider_ids, 'providers')
     
     @staticmethod
     def add(provider_data):
@@ -2755,7 +2931,7 @@ class ProvidersModel:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
             
-            provider_id = provider_data.get('provider_id') or generate_new_id(cursor, 'providers', 'provider_id', 'PRO', 6)
+            provider_id = use_or_generate_id(cursor, provider_data.get('provider_id'), 'providers', 'provider_id', 'PRO', 6)
             
             query = """
                 INSERT INTO providers 
@@ -2777,6 +2953,8 @@ class ProvidersModel:
             )
             cursor.execute(query, values)
             conn.commit()
+            typeahead.providers.refresh(provider_id)
+            refdata.refresh_after_write()
             return provider_id
         except ValueError as ve:
             if conn: conn.rollback()
@@ -2827,6 +3005,9 @@ class ProvidersModel:
             values.append(provider_id)
             cursor.execute(f"UPDATE providers SET {', '.join(fields)} WHERE provider_id = %s", values)
             conn.commit()
+            cache.invalidate('providers', provider_id)
+            typeahead.providers.refresh(provider_id)
+            refdata.refresh_after_write()
             return cursor.rowcount > 0
         except ValueError as ve:
             if conn: conn.rollback()
@@ -2849,6 +3030,9 @@ class ProvidersModel:
                 raise Error("Cannot delete provider: It has linked encounter records.")
             cursor.execute("DELETE FROM providers WHERE provider_id = %s", (provider_id,))
             conn.commit()
+            cache.invalidate('providers', provider_id)
+            typeahead.providers.remove(provider_id)
+            refdata.refresh_after_write()
             return cursor.rowcount > 0
         except Error as e:
             if conn: conn.rollback()
@@ -2866,9 +3050,30 @@ class DepartmentHeadsModel:
         "head_provider_id": "dh.head_provider_id",
         "head_name": "dh.head_name"
     }
-    
-    @staticmethod
-    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='department', sort_dir='asc'):
+    PRIMARY_KEY = "dh.head_id"
+    SEARCH = SearchSpec(
+        fulltext=[("dh.department",)],
+        prefix=["CAST(dh.head_id AS CHAR)", "dh.head_provider_id", "p.email"],
+        related=[("dh.head_provider_id", PROVIDER_SEARCH)]
+    )
+    QUERY = ListQuery(
+        "department_heads dh",
+        columns=["dh.head_id", "dh.department", "dh.head_provider_id",
+                 "p.name as head_name", "p.email as head_email"],
+        joins=[Join("p", "INNER JOIN providers p ON dh.head_provider_id = p.provider_id")],
+        filters={
+            "head_id": Filter("dh.head_id", "eq", int),
+            "department": Filter("dh.department"),
+            "head_provider_id": Filter("dh.head_provider_id"),
+            "head_name": Filter("p.name"),
+            "head_email": Filter("p.email"),
+        },
+        sortable=SORTABLE_COLUMNS, default_sort="dh.department",
+        primary_key=PRIMARY_KEY, search=SEARCH
+    )
+    
+    @staticmethod
+    def get_all(limit=1000, page=1, search=None, filters=None, sort_by='department', sort_dir='asc', after=None, count='exact', fields=None):
         """
         Get all department heads with optional search, filters, sorting, and pagination.
         Uses SQL LIKE for search and filtering.
@@ -2877,104 +3082,39 @@ class DepartmentHeadsModel:
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
-            
-            # Build base query with JOIN to providers to get name and email dynamically
-            base_query = """
-                SELECT dh.head_id, dh.department, dh.head_provider_id,
-                       p.name as head_name,
-                       p.email as head_email
-                FROM department_heads dh
-                INNER JOIN providers p ON dh.head_provider_id = p.provider_id
-                WHERE 1=1
-            """
-            params = []
-            
-            # General search (search in both department_heads and providers)
-            if search:
-                like_term = f"%{search}%"
-                base_query += """
-                    AND (dh.head_id LIKE %s OR dh.department LIKE %s OR dh.head_provider_id LIKE %s
-                    OR p.name LIKE %s OR p.email LIKE %s)
-                """
-                params.extend([like_term] * 5)
-            
-            # Detailed filters
-            filters = filters or {}
-            if filters.get('head_id'): base_query += " AND dh.head_id = %s"; params.append(int(filters['head_id']))
-            if filters.get('department'): base_query += " AND dh.department LIKE %s"; params.append(f"%{filters['department']}%")
-            if filters.get('head_provider_id'): base_query += " AND dh.head_provider_id LIKE %s"; params.append(f"%{filters['head_provider_id']}%")
-            if filters.get('head_name'): base_query += " AND p.name LIKE %s"; params.append(f"%{filters['head_name']}%")
-            if filters.get('head_email'): base_query += " AND p.email LIKE %s"; params.append(f"%{filters['head_email']}%")
-            
-            # Get total count - build separate count query with JOIN
-            count_base = """
-                SELECT COUNT(*) as total
-                FROM department_heads dh
-                INNER JOIN providers p ON dh.head_provider_id = p.provider_id
-                WHERE 1=1
-            """
-            count_params = []
-            
-            # Apply same filters to count query
-            if search:
-                like_term = f"%{search}%"
-                count_base += """
-                    AND (dh.head_id LIKE %s OR dh.department LIKE %s OR dh.head_provider_id LIKE %s
-                    OR p.name LIKE %s OR p.email LIKE %s)
-                """
-                count_params.extend([like_term] * 5)
-            
-            if filters.get('head_id'): count_base += " AND dh.head_id = %s"; count_params.append(int(filters['head_id']))
-            if filters.get('department'): count_base += " AND dh.department LIKE %s"; count_params.append(f"%{filters['department']}%")
-            if filters.get('head_provider_id'): count_base += " AND dh.head_provider_id LIKE %s"; count_params.append(f"%{filters['head_provider_id']}%")
-            if filters.get('head_name'): count_base += " AND p.name LIKE %s"; count_params.append(f"%{filters['head_name']}%")
-            if filters.get('head_email'): count_base += " AND p.email LIKE %s"; count_params.append(f"%{filters['head_email']}%")
-            
-            cursor.execute(count_base, count_params)
-            count_result = cursor.fetchone()
-            total_count = count_result['total'] if count_result else 0
-            
-            # Apply sorting and pagination
-            sort_col = DepartmentHeadsModel.SORTABLE_COLUMNS.get(sort_by, 'dh.department')
-            sort_d = 'ASC' if str(sort_dir).lower() == 'asc' else 'DESC'
-            offset = (page - 1) * limit
-            query = f"{base_query} ORDER BY {sort_col} {sort_d} LIMIT %s OFFSET %s"
-            params.extend([limit, offset])
-            
-            cursor.execute(query, params)
-            department_heads = cursor.fetchall()
-            
-            return {
-                'data': department_heads,
-                'total': total_count,
-                'page': page,
-                'per_page': limit,
-                'total_pages': (total_count + limit - 1) // limit
-            }
+            return DepartmentHeadsModel.QUERY.paginate(cursor, search, filters, sort_by, sort_dir, limit, page, after, count, fields)
         except Error as e: raise Error(f"Error fetching department heads: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
     
+    ROW_QUERY = """
+        SELECT dh.head_id, dh.department, dh.head_provider_id,
+               p.name as head_name,
+               p.email as head_email
+        FROM department_heads dh
+        INNER JOIN providers p ON dh.head_provider_id = p.provider_id
+    """
+
     @staticmethod
+    @cache.cached('department_heads', lambda row: [('providers', row.get('head_provider_id'))])
     def get_by_id(head_id):
         conn = None
         try:
             conn = get_db_connection()
             cursor = get_db_cursor(conn)
             # JOIN with providers to get name and email dynamically
-            query = """
-                SELECT dh.head_id, dh.department, dh.head_provider_id,
-                       p.name as head_name,
-                       p.email as head_email
-                FROM department_heads dh
-                INNER JOIN providers p ON dh.head_provider_id = p.provider_id
-                WHERE dh.head_id = %s
-            """
+            query = f"{DepartmentHeadsModel.ROW_QUERY} WHERE dh.head_id = %s"
             cursor.execute(query, (head_id,))
             return cursor.fetchone()
         except Error as e: raise Error(f"Error fetching department head: {e}")
         finally:
             if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    @staticmethod
+    @cache.cached_many('department_heads', lambda row: [('providers', row.get('head_provider_id'))])
+    def get_by_ids(head_ids):
+        """Many department heads in one query, as {head_id: row}; IDs without a row are left out."""
+        return _rows_by_ids(DepartmentHeadsModel.ROW_QUERY, 'dh.head_id', head_ids, 'department heads')
     
     @staticmethod
     def add(head_data):
@@ -3031,6 +3171,7 @@ class DepartmentHeadsModel:
             )
             cursor.execute(query, values)
             conn.commit()
+            refdata.refresh_after_write()
             return head_id
         except ValueError as ve:
             if conn: conn.rollback()
@@ -3106,6 +3247,8 @@ class DepartmentHeadsModel:
             values.append(head_id)
             cursor.execute(f"UPDATE department_heads SET {', '.join(fields)} WHERE head_id = %s", values)
             conn.commit()
+            cache.invalidate('department_heads', head_id)
+            refdata.refresh_after_write()
             return cursor.rowcount > 0
         except ValueError as ve:
             if conn: conn.rollback()
@@ -3128,6 +3271,8 @@ class DepartmentHeadsModel:
                 raise Error("Cannot delete department head: It has linked provider records.")
             cursor.execute("DELETE FROM department_heads WHERE head_id = %s", (head_id,))
             conn.commit()
+            cache.invalidate('department_heads', head_id)
+            refdata.refresh_after_write()
             return cursor.rowcount > 0
         except Error as e:
             if conn: conn.rollback()
@@ -0,0 +1,160 @@
+# Pagination helpers shared by the list models
+import base64
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from mysql.connector import Error
+
+# Alias a list query selects its sort column under, so the `after` token holds
+# the sorted value even when a joined column shares the sort column's name
+SORT_KEY = '_sort_key'
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, timedelta):
+        return str(value)
+    return value
+
+
+def encode_cursor(sort_value, pk_value):
+    """Build an opaque `after` token from the last row's sort value and primary key."""
+    payload = json.dumps([_json_value(sort_value), _json_value(pk_value)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode an `after` token into (sort_value, pk_value). Raises ValueError if malformed."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError("Invalid pagination cursor")
+    return values[0], values[1]
+
+
+def keyset_condition(sort_col, pk_col, sort_dir, sort_value, pk_value):
+    """
+    Build the WHERE fragment that continues after (sort_value, pk_value).
+    MySQL sorts NULLs first in ASC and last in DESC, so NULL sort values are
+    handled explicitly to keep the order stable across pages.
+    """
+    if sort_dir == 'ASC':
+        if sort_value is None:
+            return (f" AND (({sort_col} IS NULL AND {pk_col} > %s) OR {sort_col} IS NOT NULL)",
+                    [pk_value])
+        return (f" AND ({sort_col} > %s OR ({sort_col} = %s AND {pk_col} > %s))",
+                [sort_value, sort_value, pk_value])
+    if sort_value is None:
+        return f" AND ({sort_col} IS NULL AND {pk_col} < %s)", [pk_value]
+    return (f" AND ({sort_col} < %s OR ({sort_col} = %s AND {pk_col} < %s) OR {sort_col} IS NULL)",
+            [sort_value, sort_value, pk_value])
+
+
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+
+def page_order(sort_col, pk_col, sort_dir):
+    """ORDER BY and LIMIT placeholder of a page; the primary key breaks ties."""
+    return f" ORDER BY {sort_col} {sort_dir}, {pk_col} {sort_dir} LIMIT %s"
+
+
+def estimate_count(cursor, base_query, params):
+    """
+    Approximate the number of rows matched by base_query from the optimizer's
+    EXPLAIN output (rows examined x filtered %) of the driving table.
+    Returns None if the plan can't be read.
+    """
+    try:
+        cursor.execute(f"EXPLAIN {base_query}", params)
+        plan = cursor.fetchall()
+    except Error:
+        return None
+    if not plan:
+        return None
+    first = plan[0]
+    rows = first.get('rows')
+    if rows is None:
+        return None
+    filtered = first.get('filtered')
+    filtered = float(filtered) if filtered is not None else 100.0
+    return int(round(float(rows) * filtered / 100))
+
+
+def paginate(cursor, base_query, params, count_query, count_params, sort_col, pk_col, sort_dir,
+             limit, page, after=None, count='exact', sort_params=()):
+    """
+    Run the count and page queries for a list endpoint.
+
+    Without `after` the page is selected with LIMIT/OFFSET. With an `after`
+    token (from a previous response's `next_cursor`) the query seeks directly
+    past the last row seen, so deep pages cost the same as the first one.
+    The primary key is always used as a tiebreaker to keep the order stable.
+    When sorting by an expression that takes parameters (sort_params, e.g. a
+    full-text relevance score) only page/offset pagination is available.
+
+    `count` controls how `total` is produced:
+        exact    - run count_query (default)
+        estimate - use the optimizer's row estimate; `total_is_estimate` is set
+        none     - skip counting; `total` and `total_pages` are None and only
+                   `has_more` tells whether another page exists
+    """
+    if count not in COUNT_MODES:
+        raise ValueError(f"Invalid count mode '{count}'. Use one of: {', '.join(COUNT_MODES)}")
+
+    total_count = None
+    total_is_estimate = False
+    if count == 'estimate':
+        total_count = estimate_count(cursor, base_query, params)
+        total_is_estimate = total_count is not None
+    if count == 'exact' or (count == 'estimate' and total_count is None):
+        cursor.execute(count_query, count_params)
+        count_result = cursor.fetchone()
+        total_count = count_result['total'] if count_result else 0
+
+    sort_d = 'ASC' if str(sort_dir).lower() == 'asc' else 'DESC'
+    query = base_query
+    params = list(params)
+
+    if after and sort_params:
+        raise ValueError("Cursor pagination is not available for this sort order")
+    if after:
+        sort_value, pk_value = decode_cursor(after)
+        condition, condition_params = keyset_condition(sort_col, pk_col, sort_d, sort_value, pk_value)
+        query += condition
+        params.extend(condition_params)
+
+    # Fetch one extra row to know whether another page exists without counting
+    query += page_order(sort_col, pk_col, sort_d)
+    params.extend(sort_params)
+    params.append(limit + 1)
+    if not after:
+        query += " OFFSET %s"
+        params.append((page - 1) * limit)
+
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more and not sort_params:
+        last = rows[-1]
+        sort_value = last[SORT_KEY] if SORT_KEY in last else last.get(sort_col.split('.')[-1])
+        next_cursor = encode_cursor(sort_value, last.get(pk_col.split('.')[-1]))
+
+    return {
+        'data': rows,
+        'total': total_count,
+        'total_is_estimate': total_is_estimate,
+        'page': page,
+        'per_page': limit,
+        'total_pages': (total_count + limit - 1) // limit if total_count is not None else None,
+        'has_more': has_more,
+        'next_cursor': next_cursor
+    }
@@ -0,0 +1,280 @@
+# Declarative list queries shared by the models
+#
+# Each list model describes its query once - selected columns, the joins they
+# come from, the filters it accepts and how it sorts - and ListQuery compiles
+# the data and count SQL from that description. Compiled templates are cached
+# per query shape (which filters are set, the form of the search clause, the
+# sort column and the requested fields), so a request only has to collect its
+# parameter values.
+import re
+import threading
+from collections import namedtuple
+from .pagination import paginate, page_order, SORT_KEY
+from .search import relevance_sort
+
+# alias - table alias used in column/filter expressions
+# sql   - the JOIN clause. LEFT JOINs must be to-one (they never add or remove
+#         rows), so they can be dropped whenever nothing selected or filtered
+#         needs them; INNER JOINs are always kept.
+Join = namedtuple('Join', ['alias', 'sql'])
+
+# column     - SQL expression the filter applies to
+# op         - contains (LIKE %value%), eq, ieq (case-insensitive eq), gte, lte,
+#              or flag (true/1/yes -> = 1, false/0/no -> = 0, anything else ignored)
+# cast       - optional callable applied to the value (e.g. int, float)
+# keep_falsy - apply the filter for any value that is not None (0, False, ...)
+#              instead of only for truthy values
+Filter = namedtuple('Filter', ['column', 'op', 'cast', 'keep_falsy'], defaults=('contains', None, False))
+
+# name    - field added to each row, e.g. insurance_name
+# column  - SQL expression holding the lookup key, e.g. p.insurance_type
+# resolve - callable turning a key into the value (e.g. a reference data lookup)
+# Lookups fill in names of small reference tables in Python instead of joining them.
+Lookup = namedtuple('Lookup', ['name', 'column', 'resolve'])
+
+_CONDITIONS = {
+    'contains': "{column} LIKE %s",
+    'eq': "{column} = %s",
+    'ieq': "LOWER({column}) = LOWER(%s)",
+    'gte': "{column} >= %s",
+    'lte': "{column} <= %s",
+}
+
+_FLAG_VALUES = {'true': 1, '1': 1, 'yes': 1, 'false': 0, '0': 0, 'no': 0}
+
+_ALIAS_REF = re.compile(r'\b([A-Za-z_]\w*)\.')
+
+_PLAIN_COLUMN = re.compile(r'^(?:\w+\.)?\w+$')
+_COLUMN_NAME = re.compile(r'(?:\s+AS\s+|\.|^)(\w+)$', re.IGNORECASE)
+
+# Compiled templates kept per ListQuery before the cache is reset
+MAX_TEMPLATES = 256
+
+# IDs accepted by one batch lookup (?ids=... or POST /batch)
+MAX_IDS = 1000
+
+
+def _aliases(sql):
+    return set(_ALIAS_REF.findall(sql))
+
+
+def _column_name(expression):
+    """Name a selected expression shows up under in the row ('i.name AS insurer' -> 'insurer')."""
+    match = _COLUMN_NAME.search(expression.strip())
+    return match.group(1) if match else None
+
+
+def parse_fields(value):
+    """Parse a `fields=a,b,c` request parameter. Returns None when it is absent or empty."""
+    if not value:
+        return None
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    return fields or None
+
+
+def parse_ids(value, cast=None):
+    """
+    Parse the IDs of a batch lookup: an `ids=A,B,C` request parameter or a
+    JSON list. `cast` converts each ID (e.g. int for numeric keys). Returns
+    None when absent; duplicates are dropped.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list):
+        raise ValueError("ids must be a comma-separated string or a list")
+    ids = [str(item).strip() for item in value if item is not None and str(item).strip()]
+    if cast:
+        try:
+            ids = [cast(item) for item in ids]
+        except ValueError:
+            raise ValueError(f"Invalid ids: {', '.join(ids)}")
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_IDS:
+        raise ValueError(f"Too many ids: {len(ids)} (at most {MAX_IDS} per request)")
+    return ids
+
+
+def batch_result(ids, rows):
+    """Response of a batch lookup: the rows in the order of `ids`, and the IDs that were not found."""
+    return {
+        "data": [rows[key] for key in ids if key in rows],
+        "missing": [key for key in ids if key not in rows]
+    }
+
+
+class ListQuery:
+    """
+    Compiles the data and count queries of a list endpoint.
+
+    table    - FROM clause of the base table, e.g. "patients p"
+    columns  - selected expressions, e.g. ["p.*", "i.name AS insurance_name"]
+    fields   - the base table's columns; with the named columns above they make
+               up the fields a request can pick with `fields=` (sparse fieldsets)
+    joins    - Join entries in the order they must appear
+    filters  - {filter name: Filter}
+    sortable - {sort name: column}; default_sort is used for unknown names
+    lookups  - Lookup entries; they are fields too and can't be filtered or sorted on
+    """
+
+    def __init__(self, table, columns, fields=(), joins=(), filters=None, sortable=None, default_sort=None,
+                 primary_key=None, search=None, lookups=()):
+        self.table = table
+        self.columns = list(columns)
+        self.joins = list(joins)
+        self.filters = filters or {}
+        self.sortable = sortable or {}
+        self.default_sort = default_sort
+        self.primary_key = primary_key
+        self.search = search
+        self.lookups = {lookup.name: lookup for lookup in lookups}
+
+        aliases = {join.alias for join in self.joins}
+        # Joins a join depends on through its ON clause (e.g. patients via encounters)
+        self._depends = {join.alias: (_aliases(join.sql) & aliases) - {join.alias} for join in self.joins}
+        self._inner = {join.alias for join in self.joins if join.sql.lstrip().upper().startswith('INNER')}
+
+        # field name -> expression. Base table columns win over joined copies of the
+        # same key (m.encounter_id over e.encounter_id), so picking them needs no join.
+        table_alias = table.split()[-1]
+        self.fields = {name: name if table_alias == table.strip() else f"{table_alias}.{name}" for name in fields}
+        for expression in self.columns:
+            name = _column_name(expression)
+            if name:
+                self.fields.setdefault(name, expression)
+        for name in self.lookups:
+            self.fields.setdefault(name, None)
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def _shape(self, filters):
+        """Reduce filter values to the (name, variant) pairs that decide the SQL, plus their parameters."""
+        shape, params = [], []
+        for name, spec in self.filters.items():
+            value = filters.get(name)
+            if value is None or (not spec.keep_falsy and not value):
+                continue
+            if spec.op == 'flag':
+                flag = _FLAG_VALUES.get(str(value).lower())
+                if flag is not None:
+                    shape.append((name, flag))
+                continue
+            if spec.cast:
+                value = spec.cast(value)
+            params.append(f"%{value}%" if spec.op == 'contains' else value)
+            shape.append((name, None))
+        return tuple(shape), params
+
+    def _required_joins(self, sql):
+        """Joins referenced by `sql`, plus the joins those depend on and all INNER joins."""
+        needed = set()
+        pending = list((_aliases(sql) & set(self._depends)) | self._inner)
+        while pending:
+            alias = pending.pop()
+            if alias not in needed:
+                needed.add(alias)
+                pending.extend(self._depends[alias])
+        return ''.join(f"\n{join.sql}" for join in self.joins if join.alias in needed)
+
+    @staticmethod
+    def _lookup_key(name):
+        return f"_{name}_key"
+
+    def _active_lookups(self, fields):
+        if not fields:
+            return list(self.lookups.values())
+        return [self.lookups[name] for name in fields if name in self.lookups]
+
+    def _select(self, fields, sort_col):
+        """
+        Expressions selected for a sparse fieldset. The primary key is always
+        kept and the sort column is selected as SORT_KEY, for cursors.
+        """
+        keys = [f"{lookup.column} AS {self._lookup_key(lookup.name)}" for lookup in self._active_lookups(fields)]
+        # A relevance sort takes parameters and can't be continued with a cursor anyway
+        if sort_col and '%s' not in sort_col:
+            keys.append(f"{sort_col} AS {SORT_KEY}")
+        if not fields:
+            return self.columns + keys
+        unknown = [name for name in fields if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(self.fields)}")
+        selected = [self.fields[name] for name in fields if name not in self.lookups] + keys
+        if self.primary_key and _PLAIN_COLUMN.match(self.primary_key) and _column_name(self.primary_key) not in fields:
+            selected.append(self.primary_key)
+        return selected
+
+    def _compile(self, shape, search_sql, sort_col, fields):
+        conditions = []
+        for name, flag in shape:
+            spec = self.filters[name]
+            if spec.op == 'flag':
+                conditions.append(f" AND {spec.column} = {flag}")
+            else:
+                conditions.append(" AND " + _CONDITIONS[spec.op].format(column=spec.column))
+        where = f"\nWHERE 1=1{search_sql}{''.join(conditions)}"
+
+        columns = ', '.join(self._select(fields, sort_col))
+        data_joins = self._required_joins(f"{columns} {where} {sort_col}")
+        count_joins = self._required_joins(where)
+        data_query = f"SELECT {columns}\nFROM {self.table}{data_joins}{where}"
+        count_query = f"SELECT COUNT(*) as total\nFROM {self.table}{count_joins}{where}"
+        return data_query, count_query
+
+    def compile(self, search=None, filters=None, sort_by=None, fields=None):
+        """
+        Return (data_query, count_query, params, sort_col, sort_params) for the
+        given search term, filters, sort and optional list of fields. Both
+        queries take `params`. Unknown field names raise ValueError.
+        """
+        search_clause = self.search.build(search) if self.search else None
+        shape, filter_params = self._shape(filters or {})
+        sort_col, sort_params = relevance_sort(search_clause, sort_by,
+                                               self.sortable.get(sort_by, self.default_sort))
+
+        key = (shape, search_clause.sql if search_clause else '', sort_col, tuple(fields or ()))
+        template = self._templates.get(key)
+        if template is None:
+            template = self._compile(*key)
+            with self._lock:
+                if len(self._templates) >= MAX_TEMPLATES:
+                    self._templates.clear()
+                self._templates[key] = template
+
+        params = (list(search_clause.params) if search_clause else []) + filter_params
+        return template[0], template[1], params, sort_col, sort_params
+
+    def paginate(self, cursor, search=None, filters=None, sort_by=None, sort_dir='desc',
+                 limit=1000, page=1, after=None, count='exact', fields=None):
+        """Run the list query through pagination.paginate()."""
+        data_query, count_query, params, sort_col, sort_params = self.compile(search, filters, sort_by, fields)
+        result = paginate(cursor, data_query, params, count_query, params, sort_col, self.primary_key,
+                          sort_dir, limit, page, after, count, sort_params)
+        self.resolve(result['data'], fields)
+        return result
+
+    def first_page(self, search=None, filters=None, sort_by=None, sort_dir='desc', limit=50):
+        """(query, params) of the first page exactly as paginate() runs it, e.g. to EXPLAIN it."""
+        data_query, _, params, sort_col, sort_params = self.compile(search, filters, sort_by)
+        sort_d = 'ASC' if str(sort_dir).lower() == 'asc' else 'DESC'
+        return (f"{data_query}{page_order(sort_col, self.primary_key, sort_d)} OFFSET %s",
+                params + list(sort_params) + [limit + 1, 0])
+
+    def row_fields(self, column_names, fields=None):
+        """Field names of rows read with compile()'s data query after resolve(), in order."""
+        if fields:
+            return list(fields)
+        keys = {self._lookup_key(lookup.name) for lookup in self._active_lookups(fields)} | {SORT_KEY}
+        names = list(dict.fromkeys(name for name in column_names if name not in keys))
+        return names + [lookup.name for lookup in self._active_lookups(fields) if lookup.name not in names]
+
+    def resolve(self, rows, fields=None):
+        """Fill in the lookup fields of rows read with compile()'s data query (and drop SORT_KEY)."""
+        lookups = self._active_lookups(fields)
+        for row in rows:
+            row.pop(SORT_KEY, None)
+            for lookup in lookups:
+                key = row.pop(self._lookup_key(lookup.name), None)
+                row[lookup.name] = lookup.resolve(key) if key is not None else None
+        return rows
@@ -0,0 +1,140 @@
+# In-memory snapshot of the small reference tables
+#
+# insurers, department_heads and the department/specialty pairs of providers
+# change rarely and are tiny, yet almost every list query joined them just to
+# show a name. They are loaded once into an immutable, versioned Snapshot;
+# list endpoints fill those names in from it (see query.Lookup), and the
+# dropdown options are read from it instead of scanning providers.
+#
+# The Insurers/Providers/DepartmentHeads write paths call refresh() after they
+# commit. Snapshots older than REFDATA_MAX_AGE seconds are reloaded on next
+# use, so writes made through another worker show up within that window.
+import threading
+import time
+from collections import namedtuple
+from mysql.connector import Error
+from .db import get_db_connection, get_db_cursor, after_commit
+import settings
+
+REFDATA_MAX_AGE = getattr(settings, 'REFDATA_MAX_AGE', 300)
+
+# version     - increases with every reload in this process
+# insurers    - {code: insurer row}
+# heads       - {head_id: department head row}
+# departments - sorted department names of providers
+# specialties - {lower-cased department: sorted specialty names}; None holds every specialty
+Snapshot = namedtuple('Snapshot', ['version', 'loaded_at', 'insurers', 'heads', 'departments', 'specialties'])
+
+_snapshot = None
+_version = 0
+_lock = threading.Lock()
+# Serializes reloads so an older load can never replace a newer snapshot
+_refresh_lock = threading.Lock()
+
+
+def _load():
+    conn = None
+    try:
+        conn = get_db_connection(shared=False)
+        cursor = get_db_cursor(conn)
+        cursor.execute("SELECT insurer_id, code, name, payer_type, phone FROM insurers")
+        insurers = {row['code']: row for row in cursor.fetchall()}
+        cursor.execute("SELECT head_id, department, head_provider_id, head_name FROM department_heads")
+        heads = {row['head_id']: row for row in cursor.fetchall()}
+        cursor.execute("""
+            SELECT DISTINCT department, specialty
+            FROM providers
+            WHERE department IS NOT NULL AND department != ''
+               OR specialty IS NOT NULL AND specialty != ''
+        """)
+        pairs = cursor.fetchall()
+    except Error as e: raise Error(f"Error loading reference data: {e}")
+    finally:
+        if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    departments = sorted({row['department'] for row in pairs if row['department']})
+    specialties = {None: set()}
+    for row in pairs:
+        if row['specialty']:
+            specialties[None].add(row['specialty'])
+            if row['department']:
+                specialties.setdefault(row['department'].lower(), set()).add(row['specialty'])
+    specialties = {department: sorted(names) for department, names in specialties.items()}
+    return insurers, heads, departments, specialties
+
+
+def refresh():
+    """Reload the snapshot from the database and return it."""
+    global _snapshot, _version
+    with _refresh_lock:
+        insurers, heads, departments, specialties = _load()
+        with _lock:
+            _version += 1
+            _snapshot = Snapshot(_version, time.monotonic(), insurers, heads, departments, specialties)
+            return _snapshot
+
+
+def invalidate():
+    """Drop the snapshot so the next read reloads it (used when a refresh after a write fails)."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+@after_commit
+def refresh_after_write():
+    """Reload after a committed write; never fails the write itself."""
+    try:
+        refresh()
+    except Error as e:
+        print(f"Reference data refresh failed: {e}")
+        invalidate()
+
+
+def current():
+    """The current snapshot, loading it first if needed or if it is older than REFDATA_MAX_AGE."""
+    snapshot = _snapshot
+    if snapshot is None or time.monotonic() - snapshot.loaded_at > REFDATA_MAX_AGE:
+        snapshot = refresh()
+    return snapshot
+
+
+def insurer_name(code):
+    insurer = current().insurers.get(code) if code is not None else None
+    return insurer['name'] if insurer else None
+
+
+def _head(head_id):
+    return current().heads.get(int(head_id)) if head_id is not None else None
+
+
+def head_department(head_id):
+    head = _head(head_id)
+    return head['department'] if head else None
+
+
+def head_name(head_id):
+    head = _head(head_id)
+    return head['head_name'] if head else None
+
+
+def departments():
+    return list(current().departments)
+
+
+def specialties(department=None):
+    return list(current().specialties.get(department.lower() if department else None, ()))
+
+
+def stats():
+    snapshot = _snapshot
+    if snapshot is None:
+        return {'loaded': False}
+    return {
+        'loaded': True,
+        'version': snapshot.version,
+        'age_seconds': round(time.monotonic() - snapshot.loaded_at, 1),
+        'insurers': len(snapshot.insurers),
+        'department_heads': len(snapshot.heads),
+        'departments': len(snapshot.departments)
+    }
@@ -0,0 +1,274 @@
+# Precomputed dashboard statistics
+#
+# dashboard_daily_rollups holds one row per day with the per-day counts shown
+# on the dashboard. dashboard_encounter_rollups holds per-day, per-status
+# encounter figures (open encounters, length-of-stay sums) and
+# dashboard_open_patients the number of open encounters per patient; the
+# current-state figures are summed from those small tables when read.
+#
+# Write paths don't recount anything: they capture() the rows they change
+# before and after the write and apply_change() adds the difference to the
+# affected rollup rows, inside their own transaction. apply_change() is the
+# last statement of every write path, so the rollup rows are always locked
+# after the source, claim and encounter rows (and in key order within one
+# call; a line-item write that creates a claim applies the claim's change
+# just before its own), and a write only touches the rows of the days it
+# moves.
+import threading
+from mysql.connector import Error
+from .db import get_db_connection, get_db_cursor
+
+# Bump to have ensure_ready() rebuild rollups written by an older layout
+ROLLUP_VERSION = 2
+
+ROLLUP_TABLES_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS dashboard_daily_rollups (
+        stat_date DATE PRIMARY KEY,
+        procedures INT NOT NULL DEFAULT 0,
+        medications INT NOT NULL DEFAULT 0,
+        claims_total INT NOT NULL DEFAULT 0,
+        claims_paid INT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dashboard_encounter_rollups (
+        stat_date DATE NOT NULL,
+        status VARCHAR(100) NOT NULL,
+        open_encounters INT NOT NULL DEFAULT 0,
+        stay_sum BIGINT NOT NULL DEFAULT 0,
+        stay_count INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (stat_date, status)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dashboard_open_patients (
+        patient_id VARCHAR(50) PRIMARY KEY,
+        open_encounters INT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dashboard_rollup_state (
+        id TINYINT PRIMARY KEY,
+        version INT NOT NULL,
+        built_at DATETIME NOT NULL
+    )
+    """
+]
+
+# source -> (table, key column, targets). Each target is
+# (rollup table, ((key column, expression), ...), ((value column, expression), ...), prune):
+# every source row adds its value expressions to the rollup row its key
+# expressions name. Rows of a `prune` target are deleted once their first
+# value drops to zero.
+SOURCES = {
+    'procedures': ('procedures', 'procedure_id', (
+        ('dashboard_daily_rollups', (('stat_date', 'DATE(procedure_date)'),),
+         (('procedures', '1'),), False),
+    )),
+    'medications': ('medications', 'medication_id', (
+        ('dashboard_daily_rollups', (('stat_date', 'DATE(prescribed_date)'),),
+         (('medications', '1'),), False),
+    )),
+    'claims': ('claims_and_billing', 'billing_id', (
+        ('dashboard_daily_rollups', (('stat_date', 'DATE(claim_billing_date)'),),
+         (('claims_total', 'claim_status IS NOT NULL'),
+          ('claims_paid', "COALESCE(claim_status = 'Paid', 0)")), False),
+    )),
+    'encounters': ('encounters', 'encounter_id', (
+        ('dashboard_encounter_rollups',
+         (('stat_date', 'DATE(visit_date)'), ('status', "COALESCE(status, '')")),
+         (('open_encounters', "COALESCE(status != 'Completed', 0)"),
+          ('stay_sum', 'IF(length_of_stay > 0, length_of_stay, 0)'),
+          ('stay_count', 'COALESCE(length_of_stay > 0, 0)')), False),
+        ('dashboard_open_patients', (('patient_id', 'patient_id'),),
+         (('open_encounters', "COALESCE(status != 'Completed', 0)"),), True),
+    )),
+}
+
+_tables_ready = False
+_built = False
+_ready_lock = threading.Lock()
+
+
+def _ensure_tables():
+    """Create the rollup tables on a separate connection if this process hasn't yet."""
+    global _tables_ready
+    if _tables_ready:
+        return
+    with _ready_lock:
+        if _tables_ready:
+            return
+        conn = None
+        try:
+            conn = get_db_connection(shared=False)
+            cursor = get_db_cursor(conn)
+            for statement in ROLLUP_TABLES_SQL:
+                cursor.execute(statement)
+            _tables_ready = True
+        except Error as e: raise Error(f"Error preparing dashboard rollups: {e}")
+        finally:
+            if conn and conn.is_connected(): cursor.close(); conn.close()
+
+
+def _is_built(cursor):
+    """True once the rollups have been filled; until then write paths leave them alone."""
+    global _built
+    if not _built:
+        cursor.execute("SELECT version FROM dashboard_rollup_state WHERE id = 1")
+        row = cursor.fetchone()
+        _built = row is not None and row['version'] == ROLLUP_VERSION
+    return _built
+
+
+def ensure_ready():
+    """Create the rollup tables and build them once if they have never been filled."""
+    if _built:
+        return
+    _ensure_tables()
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = get_db_cursor(conn)
+        built = _is_built(cursor)
+    except Error as e: raise Error(f"Error preparing dashboard rollups: {e}")
+    finally:
+        if conn and conn.is_connected(): cursor.close(); conn.close()
+    if not built:
+        rebuild()
+
+
+def capture(cursor, source, keys):
+    """
+    Lock the rows of `source` with the given keys and return what they
+    contribute to the rollups; pass the result from before and after a
+    write to apply_change(). Rows that don't exist contribute nothing.
+    """
+    keys = [key for key in keys if key is not None]
+    if not keys:
+        return []
+    table, key_col, targets = SOURCES[source]
+    columns = [f"{expr} AS t{i}_{col}"
+               for i, (_, group, values, _) in enumerate(targets)
+               for col, expr in group + values]
+    cursor.execute(
+        f"SELECT {', '.join(columns)} FROM {table} "
+        f"WHERE {key_col} IN ({', '.join(['%s'] * len(keys))}) FOR UPDATE",
+        keys
+    )
+    return cursor.fetchall()
+
+
+def apply_change(cursor, source, before, after):
+    """
+    Add the difference between the captured `before` and `after` rows to
+    the rollups. Runs on the caller's cursor/transaction; call it last.
+    """
+    if not before and not after:
+        return
+    _ensure_tables()
+    if not _is_built(cursor):
+        return
+    for i, (rollup, group, values, prune) in enumerate(SOURCES[source][2]):
+        deltas = {}
+        for rows, sign in ((before, -1), (after, 1)):
+            for row in rows:
+                key = tuple(row[f"t{i}_{col}"] for col, _ in group)
+                if None in key:
+                    continue
+                current = deltas.setdefault(key, [0] * len(values))
+                for j, (col, _) in enumerate(values):
+                    current[j] += sign * (row[f"t{i}_{col}"] or 0)
+        changed = sorted(key for key, delta in deltas.items() if any(delta))
+        if not changed:
+            continue
+        names = [col for col, _ in group] + [col for col, _ in values]
+        row_sql = f"({', '.join(['%s'] * len(names))})"
+        cursor.execute(
+            f"INSERT INTO {rollup} ({', '.join(names)}) VALUES {', '.join([row_sql] * len(changed))} "
+            f"ON DUPLICATE KEY UPDATE {', '.join(f'{col} = {col} + VALUES({col})' for col, _ in values)}",
+            [value for key in changed for value in key + tuple(deltas[key])]
+        )
+        if prune:
+            key_sql = f"({', '.join(['%s'] * len(group))})"
+            cursor.execute(
+                f"DELETE FROM {rollup} WHERE ({', '.join(col for col, _ in group)}) "
+                f"IN ({', '.join([key_sql] * len(changed))}) AND {values[0][0]} <= 0",
+                [value for key in changed for value in key]
+            )
+
+
+def rebuild():
+    """Recompute every rollup from the base tables (bootstrap, or a periodic consistency job)."""
+    conn = None
+    try:
+        conn = get_db_connection(shared=False)
+        cursor = get_db_cursor(conn)
+        for statement in ROLLUP_TABLES_SQL:
+            cursor.execute(statement)
+        rollup_tables = {rollup for _, _, targets in SOURCES.values() for rollup, _, _, _ in targets}
+        for rollup in sorted(rollup_tables):
+            cursor.execute(f"DELETE FROM {rollup}")
+        for table, _, targets in SOURCES.values():
+            for rollup, group, values, prune in targets:
+                names = [col for col, _ in group] + [col for col, _ in values]
+                keys = [expr for _, expr in group]
+                having = f"HAVING SUM({values[0][1]}) > 0" if prune else ""
+                cursor.execute(f"""
+                    INSERT INTO {rollup} ({', '.join(names)})
+                    SELECT {', '.join(keys)}, {', '.join(f'SUM({expr})' for _, expr in values)}
+                    FROM {table}
+                    WHERE {' AND '.join(f'{expr} IS NOT NULL' for expr in keys)}
+                    GROUP BY {', '.join(keys)}
+                    {having}
+                    ON DUPLICATE KEY UPDATE {', '.join(f'{col} = VALUES({col})' for col, _ in values)}
+                """)
+        cursor.execute("""
+            INSERT INTO dashboard_rollup_state (id, version, built_at) VALUES (1, %s, NOW())
+            ON DUPLICATE KEY UPDATE version = VALUES(version), built_at = VALUES(built_at)
+        """, (ROLLUP_VERSION,))
+        cursor.execute("SELECT COUNT(*) AS days FROM dashboard_daily_rollups")
+        days = cursor.fetchone()['days']
+        conn.commit()
+        global _tables_ready, _built
+        _tables_ready = _built = True
+        return {'days': days}
+    except Error as e:
+        if conn: conn.rollback()
+        raise Error(f"Error rebuilding dashboard rollups: {e}")
+    finally:
+        if conn and conn.is_connected(): cursor.close(); conn.close()
+
+
+def get_stats(day):
+    """Read the dashboard figures for `day` (YYYY-MM-DD) from the rollups."""
+    ensure_ready()
+    conn = None
+    try:
+        conn = get_db_connection()
+        cursor = get_db_cursor(conn)
+        cursor.execute("""
+            SELECT procedures, medications, claims_total, claims_paid
+            FROM dashboard_daily_rollups
+            WHERE stat_date = %s
+        """, (day,))
+        stats = cursor.fetchone() or {'procedures': 0, 'medications': 0, 'claims_total': 0, 'claims_paid': 0}
+
+        cursor.execute("""
+            SELECT SUM(open_encounters) AS open_encounters,
+                   SUM(stay_sum) AS stay_sum, SUM(stay_count) AS stay_count
+            FROM dashboard_encounter_rollups
+            GROUP BY status
+        """)
+        by_status = cursor.fetchall()
+        stats['open_encounters'] = int(sum(row['open_encounters'] or 0 for row in by_status))
+        # Average of the per-status averages, as the dashboard has always shown it
+        averages = [float(row['stay_sum']) / float(row['stay_count']) for row in by_status if row['stay_count']]
+        stats['avg_stay'] = round(sum(averages) / len(averages), 1) if averages else 0.0
+
+        cursor.execute("SELECT COUNT(*) AS active_patients FROM dashboard_open_patients")
+        stats['active_patients'] = cursor.fetchone()['active_patients']
+        return stats
+    except Error as e: raise Error(f"Error reading dashboard rollups: {e}")
+    finally:
+        if conn and conn.is_connected(): cursor.close(); conn.close()
@@ -0,0 +1,98 @@
+# Full-text search helpers shared by the list models
+import re
+from collections import namedtuple
+
+# InnoDB's default ngram_token_size; shorter words can't be found through the index
+NGRAM_TOKEN_SIZE = 2
+
+_BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]')
+
+SearchClause = namedtuple('SearchClause', ['sql', 'params', 'relevance', 'relevance_params'])
+
+# Related tables searched through an indexed subquery: (table, key column, FULLTEXT columns)
+PATIENT_NAME = ('patients', 'patient_id', ('first_name', 'last_name'))
+PROVIDER_SEARCH = ('providers', 'provider_id', ('name', 'department', 'specialty'))
+DEPARTMENT_HEAD_NAME = ('department_heads', 'head_id', ('head_name',))
+
+
+def boolean_query(term):
+    """
+    Turn a user search term into a BOOLEAN MODE query requiring every word,
+    e.g. 'john smi' -> '+"john" +"smi"'. Words shorter than the ngram token
+    size are dropped. Returns None if nothing searchable is left.
+    """
+    words = [w for w in _BOOLEAN_OPERATORS.sub(' ', term).split() if len(w) >= NGRAM_TOKEN_SIZE]
+    if not words:
+        return None
+    return ' '.join(f'+"{w}"' for w in words)
+
+
+def _match(columns):
+    return f"MATCH({', '.join(columns)}) AGAINST (%s IN BOOLEAN MODE)"
+
+
+class SearchSpec:
+    """
+    Describes how the global `q` parameter is matched for one list query.
+
+    fulltext - column groups of the listed tables, each backed by a FULLTEXT index
+    prefix   - ID/code columns matched with LIKE 'term%' so their B-tree index is used.
+               IDs match from the start only ('PAT0001' finds PAT000123, '0001'
+               doesn't): a '%term%' branch in the OR would scan the whole table.
+    related  - (outer column, related table) pairs; the related table is searched
+               through its own FULLTEXT index in a subquery
+    """
+
+    def __init__(self, fulltext=(), prefix=(), related=()):
+        self.fulltext = fulltext
+        self.prefix = prefix
+        self.related = related
+
+    def build(self, term):
+        term = (term or '').strip()
+        if not term:
+            return None
+
+        query = boolean_query(term)
+        like_term = f"%{term}%"
+        conditions, params = [], []
+
+        for columns in self.fulltext:
+            if query:
+                conditions.append(_match(columns))
+                params.append(query)
+            else:
+                # Too short for the index; fall back to a substring match
+                conditions.extend(f"{col} LIKE %s" for col in columns)
+                params.extend([like_term] * len(columns))
+
+        for col in self.prefix:
+            conditions.append(f"{col} LIKE %s")
+            params.append(f"{term}%")
+
+        for outer_col, (table, key_col, columns) in self.related:
+            if query:
+                inner, inner_params = _match(columns), [query]
+            else:
+                inner = ' OR '.join(f"{col} LIKE %s" for col in columns)
+                inner_params = [like_term] * len(columns)
+            conditions.append(f"{outer_col} IN (SELECT {key_col} FROM {table} WHERE {inner})")
+            params.extend(inner_params)
+
+        relevance, relevance_params = None, []
+        if query and self.fulltext:
+            relevance = ' + '.join(_match(columns) for columns in self.fulltext)
+            relevance_params = [query] * len(self.fulltext)
+
+        return SearchClause(f" AND ({' OR '.join(conditions)})", params, relevance, relevance_params)
+
+
+def relevance_sort(search_clause, sort_by, sort_col):
+    """
+    Resolve the ORDER BY expression for a list query. `sort=relevance` orders
+    by full-text score when the search used the index; otherwise sort_col is kept.
+    Returns (sort_col, sort_params).
+    """
+    if sort_by == 'relevance' and search_clause and search_clause.relevance:
+        return search_clause.relevance, search_clause.relevance_params
+    return sort_col, []
@@ -0,0 +1,158 @@
+# Sequence-based ID allocation
+import threading
+from mysql.connector import Error
+from .db import get_db_connection, get_db_cursor
+import settings
+
+# Numbers reserved from the database per round trip. Unused numbers of a
+# block are skipped when the process restarts, so IDs can have gaps.
+ID_BLOCK_SIZE = getattr(settings, 'ID_BLOCK_SIZE', 20)
+
+SEQUENCES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS sequences (
+        name VARCHAR(100) PRIMARY KEY,
+        value BIGINT NOT NULL DEFAULT 0
+    )
+"""
+
+
+class BlockAllocator:
+    """
+    Hands out numbers for one sequence from a block reserved in the
+    `sequences` table. The reservation is a single
+    UPDATE ... SET value = LAST_INSERT_ID(value + n), committed on its own
+    connection, so parallel writers (threads or processes) never receive
+    the same number and callers' transactions are not held up by it.
+    """
+
+    _table_ready = False
+    _table_lock = threading.Lock()
+
+    def __init__(self, table_name, column_name, prefix, block_size=ID_BLOCK_SIZE):
+        self.name = f"{table_name}.{column_name}"
+        self.table_name = table_name
+        self.column_name = column_name
+        self.prefix = prefix
+        self.block_size = max(1, int(block_size))
+        self._next = 0
+        self._last = -1
+        self._lock = threading.Lock()
+
+    def _ensure_sequence(self, cursor):
+        """Create the sequences table and seed this sequence from the existing IDs."""
+        if not BlockAllocator._table_ready:
+            with BlockAllocator._table_lock:
+                if not BlockAllocator._table_ready:
+                    cursor.execute(SEQUENCES_TABLE_SQL)
+                    BlockAllocator._table_ready = True
+
+        cursor.execute("SELECT value FROM sequences WHERE name = %s", (self.name,))
+        if cursor.fetchone():
+            return
+        # One-time scan for the highest number already used with this prefix
+        cursor.execute(
+            f"SELECT MAX(CAST(SUBSTRING(`{self.column_name}`, %s) AS UNSIGNED)) AS max_value "
+            f"FROM `{self.table_name}` WHERE `{self.column_name}` LIKE %s",
+            (len(self.prefix) + 1, f"{self.prefix}%")
+        )
+        result = cursor.fetchone()
+        start = int(result['max_value'] or 0) if result else 0
+        # INSERT IGNORE: another process may have seeded it in the meantime
+        cursor.execute("INSERT IGNORE INTO sequences (name, value) VALUES (%s, %s)", (self.name, start))
+
+    def reserve(self, count):
+        """Reserve `count` consecutive numbers and return the first one."""
+        conn = None
+        try:
+            # Never the caller's unit of work: the block is committed on its own
+            conn = get_db_connection(shared=False)
+            cursor = get_db_cursor(conn)
+            self._ensure_sequence(cursor)
+            cursor.execute(
+                "UPDATE sequences SET value = LAST_INSERT_ID(value + %s) WHERE name = %s",
+                (count, self.name)
+            )
+            cursor.execute("SELECT LAST_INSERT_ID() AS last_value")
+            last_value = cursor.fetchone()['last_value']
+            conn.commit()
+            return last_value - count + 1
+        except Error as e:
+            if conn: conn.rollback()
+            raise Error(f"Error reserving IDs for {self.name}: {e}")
+        finally:
+            if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    def next_value(self):
+        with self._lock:
+            if self._next > self._last:
+                self._next = self.reserve(self.block_size)
+                self._last = self._next + self.block_size - 1
+            value = self._next
+            self._next += 1
+            return value
+
+    def advance(self, number):
+        """
+        Move the sequence past `number`, an ID that was written without being
+        reserved (e.g. one supplied by the client), so it is never handed out.
+        """
+        with self._lock:
+            if number <= self._last:
+                # Already reserved up to _last; only this process's block needs skipping
+                self._next = max(self._next, number + 1)
+                return
+        conn = None
+        try:
+            # Committed on its own like reserve(), so it never waits on the caller's transaction
+            conn = get_db_connection(shared=False)
+            cursor = get_db_cursor(conn)
+            self._ensure_sequence(cursor)
+            cursor.execute("UPDATE sequences SET value = GREATEST(value, %s) WHERE name = %s", (number, self.name))
+            conn.commit()
+        except Error as e:
+            if conn: conn.rollback()
+            raise Error(f"Error advancing {self.name}: {e}")
+        finally:
+            if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    def take(self, count):
+        """Return `count` consecutive numbers in one reservation (used for bulk inserts)."""
+        first = self.reserve(count)
+        return list(range(first, first + count))
+
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+
+def get_allocator(table_name, column_name, prefix):
+    key = (table_name, column_name)
+    allocator = _allocators.get(key)
+    if allocator is None:
+        with _allocators_lock:
+            allocator = _allocators.get(key)
+            if allocator is None:
+                allocator = BlockAllocator(table_name, column_name, prefix)
+                _allocators[key] = allocator
+    return allocator
+
+
+def format_id(prefix, number, padding=6):
+    return f"{prefix}{str(number).zfill(padding)}"
+
+
+def next_id(table_name, column_name, prefix, padding=6):
+    return format_id(prefix, get_allocator(table_name, column_name, prefix).next_value(), padding)
+
+
+def next_ids(table_name, column_name, prefix, count, padding=6):
+    numbers = get_allocator(table_name, column_name, prefix).take(count)
+    return [format_id(prefix, number, padding) for number in numbers]
+
+
+def advance(table_name, column_name, prefix, ids):
+    """Keep the sequence ahead of IDs inserted as given (`<prefix><digits>`; other formats are ignored)."""
+    numbers = [int(value[len(prefix):]) for value in ids
+               if value and value.startswith(prefix) and value[len(prefix):].isdigit()]
+    if numbers:
+        get_allocator(table_name, column_name, prefix).advance(max(numbers))
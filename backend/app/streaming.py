@@ -0,0 +1,148 @@
+# Streaming exports of the list queries
+#
+# The /export endpoints send every row a list query matches - same search,
+# filters, sort and fields as the list endpoint, without pagination - as CSV
+# or NDJSON. Rows are read from an unbuffered cursor FETCH_SIZE at a time and
+# written to the response as they arrive, so memory use stays the same however
+# many rows are exported. The query runs before the response starts, so bad
+# parameters and SQL errors still get a JSON error response.
+#
+# The export holds its own pooled connection until the download ends, with a
+# longer net_write_timeout that is reset before the connection goes back to the
+# pool. If the client goes away part way, the rows left unread make the pool
+# close that connection rather than reuse it.
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from flask import Response
+from mysql.connector import Error
+from .db import get_db_connection
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+FETCH_SIZE = 1000
+# Seconds MySQL waits on a slow reader before dropping the connection; a
+# download is only as fast as the client reading it
+NET_WRITE_TIMEOUT = 600
+_RESET_NET_WRITE_TIMEOUT = "SET SESSION net_write_timeout = @@GLOBAL.net_write_timeout"
+
+
+def parse_format(value):
+    fmt = (value or 'csv').strip().lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format '{fmt}'. Use one of: {', '.join(FORMATS)}")
+    return fmt
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, timedelta)):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(f"Cannot export {type(value).__name__} values")
+
+
+def release(conn, cursor):
+    """Close an export's cursor and return its connection with the server's net_write_timeout again."""
+    try:
+        cursor.close()
+    except (Error, AttributeError):
+        # An unbuffered cursor with unread rows refuses to close; the pool drops the connection
+        conn.close()
+        return
+    try:
+        reset = conn.cursor()
+        reset.execute(_RESET_NET_WRITE_TIMEOUT)
+        reset.close()
+    except Error:
+        # Never hand the next request a connection with the export's timeout
+        conn.discard()
+        return
+    conn.close()
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    return value
+
+
+class Export:
+    """An executed list query whose rows are read in batches as the response is sent."""
+
+    def __init__(self, query, search=None, filters=None, sort_by=None, sort_dir='desc', fields=None):
+        data_query, _, params, sort_col, sort_params = query.compile(search, filters, sort_by, fields)
+        sort_d = 'ASC' if str(sort_dir).lower() == 'asc' else 'DESC'
+        self._query = query
+        self._fields = fields
+        self._conn = None
+        try:
+            self._conn = get_db_connection(shared=False)
+            # Unbuffered: rows stay on the server side of the socket until fetched
+            self._cursor = self._conn.cursor(dictionary=True)
+            self._cursor.execute(f"SET SESSION net_write_timeout = {int(NET_WRITE_TIMEOUT)}")
+            self._cursor.execute(
+                f"{data_query} ORDER BY {sort_col} {sort_d}, {query.primary_key} {sort_d}",
+                list(params) + list(sort_params)
+            )
+            self.columns = query.row_fields(self._cursor.column_names, fields)
+        except Error as e:
+            self.close()
+            raise Error(f"Error exporting rows: {e}")
+
+    def batches(self):
+        """Yield lists of up to FETCH_SIZE rows, with lookups resolved; closes the export when done."""
+        try:
+            while self._conn is not None:
+                rows = self._cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                yield self._query.resolve(rows, self._fields)
+        finally:
+            self.close()
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            release(conn, getattr(self, '_cursor', None))
+
+
+def _csv_chunks(export):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(export.columns)
+    yield buffer.getvalue()
+    for rows in export.batches():
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            writer.writerow([_csv_value(row.get(column)) for column in export.columns])
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(export):
+    for rows in export.batches():
+        yield ''.join(
+            json.dumps({column: row.get(column) for column in export.columns}, default=_json_value) + '\n'
+            for row in rows
+        )
+
+
+def response(export, fmt, name):
+    """Stream an Export as a file download (`<name>.<fmt>`)."""
+    chunks = _csv_chunks(export) if fmt == 'csv' else _ndjson_chunks(export)
+    resp = Response(chunks, content_type=FORMATS[fmt])
+    resp.headers['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+    resp.headers['Cache-Control'] = 'no-store'
+    # Also runs when the body is never iterated (e.g. the request is cut off first)
+    resp.call_on_close(export.close)
+    return resp
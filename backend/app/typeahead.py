@@ -0,0 +1,218 @@
+# In-memory trigram index for the patient/provider typeahead dropdowns
+#
+# Each worker keeps its own index. Writes made through this worker update it
+# right after they commit; writes made through another worker show up when the
+# index is reloaded, at least every TYPEAHEAD_MAX_AGE seconds.
+import threading
+import time
+from collections import defaultdict
+from mysql.connector import Error
+from .db import get_db_connection, get_db_cursor, after_commit
+import settings
+
+GRAM_SIZE = 3
+# Fraction of the query's trigrams a candidate must share to be returned
+MIN_GRAM_OVERLAP = 0.5
+TYPEAHEAD_MAX_AGE = getattr(settings, 'TYPEAHEAD_MAX_AGE', 60)
+
+
+def _normalize(value):
+    return ' '.join(str(value).lower().split()) if value is not None else ''
+
+
+def _trigrams(text):
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - GRAM_SIZE + 1):
+            grams.add(padded[i:i + GRAM_SIZE])
+    return grams
+
+
+class TrigramIndex:
+    """
+    Trigram index over a small set of rows kept fully in memory.
+
+    Rows are loaded with `load_sql` on first use (or by build()), kept up to
+    date through refresh()/remove(), which the model write paths call after
+    they commit, and reloaded once older than TYPEAHEAD_MAX_AGE. search() ranks exact ID matches first, then prefix and
+    substring matches, then fuzzy matches by shared trigrams.
+    """
+
+    def __init__(self, name, key, fields, load_sql, default_order):
+        self.name = name
+        self.key = key
+        self.fields = fields
+        self.load_sql = load_sql
+        self.default_order = default_order
+        self._lock = threading.RLock()
+        # Serializes reloads; searches keep using the current rows meanwhile
+        self._build_lock = threading.Lock()
+        self._docs = {}
+        self._text = {}
+        self._grams = defaultdict(set)
+        self._loaded = False
+        self._loaded_at = 0
+        self._changes = 0   # bumped by every write, to detect writes during a load
+
+    def _fetch(self, key_value=None):
+        conn = None
+        try:
+            conn = get_db_connection(shared=False)
+            cursor = get_db_cursor(conn)
+            if key_value is None:
+                cursor.execute(self.load_sql)
+                return cursor.fetchall()
+            cursor.execute(f"{self.load_sql} WHERE {self.key} = %s", (key_value,))
+            return cursor.fetchall()
+        except Error as e: raise Error(f"Error loading {self.name} typeahead index: {e}")
+        finally:
+            if conn and conn.is_connected(): cursor.close(); conn.close()
+
+    def build(self):
+        with self._lock:
+            changes = self._changes
+        rows = self._fetch()
+        docs, text, grams = {}, {}, defaultdict(set)
+        for row in rows:
+            self._add(row, docs, text, grams)
+        with self._lock:
+            self._docs, self._text, self._grams = docs, text, grams
+            self._loaded = True
+            # A write during the load may be missing from it; use it once and reload next time
+            self._loaded_at = time.monotonic() if changes == self._changes else 0
+        return len(rows)
+
+    def _is_fresh(self):
+        return self._loaded and time.monotonic() - self._loaded_at <= TYPEAHEAD_MAX_AGE
+
+    def _ensure_loaded(self):
+        if self._is_fresh():
+            return
+        with self._build_lock:
+            if not self._is_fresh():
+                self.build()
+
+    def _add(self, row, docs=None, texts=None, grams=None):
+        docs = self._docs if docs is None else docs
+        texts = self._text if texts is None else texts
+        grams = self._grams if grams is None else grams
+        key_value = row[self.key]
+        text = ' '.join(_normalize(row.get(field)) for field in self.fields)
+        docs[key_value] = row
+        texts[key_value] = text
+        for gram in _trigrams(text):
+            grams[gram].add(key_value)
+
+    def _discard(self, key_value):
+        text = self._text.pop(key_value, None)
+        self._docs.pop(key_value, None)
+        if text is None:
+            return
+        for gram in _trigrams(text):
+            keys = self._grams.get(gram)
+            if keys is not None:
+                keys.discard(key_value)
+                if not keys:
+                    del self._grams[gram]
+
+    @after_commit
+    def refresh(self, key_value):
+        """Reload one row after an insert/update. Marks the index stale if the reload fails."""
+        with self._lock:
+            self._changes += 1
+        if not self._loaded:
+            return
+        try:
+            rows = self._fetch(key_value)
+        except Error:
+            self.invalidate()
+            return
+        with self._lock:
+            self._discard(key_value)
+            for row in rows:
+                self._add(row)
+
+    @after_commit
+    def remove(self, key_value):
+        with self._lock:
+            self._changes += 1
+            self._discard(key_value)
+
+    @after_commit
+    def invalidate(self):
+        with self._lock:
+            self._changes += 1
+            self._loaded = False
+
+    def search(self, term=None, limit=50):
+        self._ensure_loaded()
+        query = _normalize(term)
+        with self._lock:
+            if not query:
+                return sorted(self._docs.values(), key=self.default_order)[:limit]
+
+            if len(query) < GRAM_SIZE:
+                # Too short for trigrams: prefix match on any word
+                matches = [k for k, text in self._text.items()
+                           if any(word.startswith(query) for word in text.split())]
+                ranked = [(0 if str(k).lower() == query else 1, 0, k) for k in matches]
+            else:
+                query_grams = _trigrams(query)
+                hits = defaultdict(int)
+                for gram in query_grams:
+                    for k in self._grams.get(gram, ()):
+                        hits[k] += 1
+                needed = max(1, int(len(query_grams) * MIN_GRAM_OVERLAP))
+                ranked = []
+                for k, shared in hits.items():
+                    if shared < needed:
+                        continue
+                    text = self._text[k]
+                    if str(k).lower() == query:
+                        tier = 0
+                    elif text.startswith(query) or f" {query}" in text:
+                        tier = 1
+                    elif query in text:
+                        tier = 2
+                    else:
+                        tier = 3
+                    ranked.append((tier, -shared / len(query_grams), k))
+
+            ranked.sort(key=lambda item: (item[0], item[1], self.default_order(self._docs[item[2]])))
+            return [self._docs[k] for _, _, k in ranked[:limit]]
+
+    def stats(self):
+        with self._lock:
+            return {'name': self.name, 'loaded': self._loaded, 'rows': len(self._docs), 'trigrams': len(self._grams)}
+
+
+def _patient_order(row):
+    # Most recently registered first, matching the patients list default
+    registered = row.get('registration_date')
+    return (-registered.toordinal() if registered else 0, row['patient_id'])
+
+
+patients = TrigramIndex(
+    name='patients',
+    key='patient_id',
+    fields=('patient_id', 'first_name', 'last_name', 'phone'),
+    load_sql="""
+        SELECT patient_id, first_name, last_name, age, gender, phone, email, registration_date
+        FROM patients
+    """,
+    default_order=_patient_order
+)
+
+providers = TrigramIndex(
+    name='providers',
+    key='provider_id',
+    fields=('provider_id', 'name', 'specialty', 'department'),
+    load_sql="SELECT provider_id, name, specialty, department FROM providers",
+    default_order=lambda row: ((row.get('name') or '').lower(), row['provider_id'])
+)
+
+
+def build_all():
+    """Load every typeahead index; called at application startup."""
+    return {index.name: index.build() for index in (patients, providers)}
@@ -1,5 +1,6 @@
 # Utility functions for ID generation
 from mysql.connector import Error
+from . import sequences
 
 # Whitelist of allowed table and column names for security
 ALLOWED_TABLES = {'patients', 'encounters', 'claims_and_billing', 'medications', 'providers', 'denials', 'procedures', 'diagnoses', 'department_heads', 'lab_tests'}
@@ -12,35 +13,15 @@ def generate_new_id(cursor, table_name, column_name, prefix, padding=6):
     if column_name not in ALLOWED_ID_COLUMNS:
         raise Error(f"Invalid column name: {column_name}")
     
-    try:
-        query = f"SELECT MAX(`{column_name}`) as max_id FROM `{table_name}`"
-        cursor.execute(query)
-        result = cursor.fetchone()
-        if isinstance(result, dict):
-            max_id = result.get('max_id')
-        elif result:
-            max_id = result[0]
-        else:
-            max_id = None
-        
-        if max_id is None:
-            new_number = 1
-        else:
-            if max_id.startswith(prefix):
-                numeric_part = max_id[len(prefix):]
-            else:
-                numeric_part = ''.join(filter(str.isdigit, max_id))
-            
-            try:
-                new_number = int(numeric_part) + 1
-            except ValueError:
-                new_number = 1
-        
-        formatted_number = str(new_number).zfill(padding)
-        new_id = f"{prefix}{formatted_number}"
-        
-        return new_id
-        
-    except Error as e:
-        raise Error(f"Error generating new ID: {e}")
+    # IDs come from the sequences table (see sequences.py) instead of a MAX()
+    # scan, so concurrent inserts never compute the same ID. The cursor is kept
+    # in the signature for existing callers.
+    return sequences.next_id(table_name, column_name, prefix, padding)
 
+
+def use_or_generate_id(cursor, given_id, table_name, column_name, prefix, padding=6):
+    """Return `given_id` (moving the sequence past it) or, when it is empty, a newly generated ID."""
+    if not given_id:
+        return generate_new_id(cursor, table_name, column_name, prefix, padding)
+    sequences.advance(table_name, column_name, prefix, [given_id])
+    return given_id
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The backend imports `settings` from the repository root and `app` from backend/
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.dirname(BACKEND), BACKEND):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,332 @@
+# In-process Redis-protocol stand-in for the cache tests
+#
+# Speaks RESP2, or RESP3 after HELLO 3, over a local TCP port and implements
+# the commands RedisCache and redis-py's connection setup use: GET, SET (EX),
+# DEL, INCR/INCRBY, EXPIRE, SADD, SMEMBERS, SCAN (MATCH), WATCH/UNWATCH,
+# MULTI/EXEC/DISCARD, PUBLISH, SUBSCRIBE/UNSUBSCRIBE, HELLO, PING, ECHO, SELECT
+# and CLIENT. Keys expire lazily.
+# Every write bumps the key's version, so a WATCHed transaction fails once a
+# key it watches was written by another connection, as on a real server.
+import fnmatch
+import socketserver
+import threading
+import time
+
+
+class CommandError(Exception):
+    pass
+
+
+class _Store:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data = {}        # key -> bytes or set of bytes
+        self.expires = {}     # key -> monotonic deadline
+        self.versions = {}    # key -> write counter, for WATCH
+        self.channels = {}    # channel -> {handler, ...}
+
+    def _alive(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+            self._touch(key)
+        return key in self.data
+
+    def _touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def version(self, key):
+        with self.lock:
+            self._alive(key)
+            return self.versions.get(key, 0)
+
+    def run(self, name, args):
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            raise CommandError(f"unknown command '{name}'")
+        with self.lock:
+            return handler(*args)
+
+    def cmd_get(self, key):
+        if not self._alive(key):
+            return None
+        value = self.data[key]
+        if isinstance(value, set):
+            raise CommandError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if b'EX' in options:
+            self.expires[key] = time.monotonic() + int(options[options.index(b'EX') + 1])
+        self._touch(key)
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self._alive(key):
+                del self.data[key]
+                self.expires.pop(key, None)
+                self._touch(key)
+                deleted += 1
+        return deleted
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, b'1')
+
+    def cmd_incrby(self, key, amount):
+        value = int(self.cmd_get(key) or 0) + int(amount)
+        self.data[key] = str(value).encode()
+        self._touch(key)
+        return value
+
+    def cmd_expire(self, key, seconds):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + int(seconds)
+        self._touch(key)
+        return 1
+
+    def cmd_sadd(self, key, *members):
+        members_set = self.data.setdefault(key, set()) if self._alive(key) else self.data.setdefault(key, set())
+        added = len(set(members) - members_set)
+        members_set.update(members)
+        self._touch(key)
+        return added
+
+    def cmd_smembers(self, key):
+        return sorted(self.data[key]) if self._alive(key) else []
+
+    def cmd_scan(self, cursor, *options):
+        options = list(options)
+        pattern = b'*'
+        for i, option in enumerate(options[:-1]):
+            if option.upper() == b'MATCH':
+                pattern = options[i + 1]
+        keys = [key for key in list(self.data) if self._alive(key)
+                and fnmatch.fnmatchcase(key.decode(), pattern.decode())]
+        return [b'0', keys]
+
+    def cmd_ping(self, *message):
+        return message[0] if message else 'PONG'
+
+    def cmd_echo(self, message):
+        return message
+
+    def cmd_select(self, index):
+        return 'OK'
+
+    def cmd_client(self, *args):
+        return 'OK'
+
+    def publish(self, channel, message):
+        with self.lock:
+            handlers = list(self.channels.get(channel, ()))
+        for handler in handlers:
+            handler.push(_Push([b'message', channel, message]))
+        return len(handlers)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.store = self.server.store
+        self.write_lock = threading.Lock()
+        self.watched = {}       # key -> version when watched
+        self.queued = None      # commands between MULTI and EXEC
+        self.subscribed = set()
+        self.resp3 = False
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _encode(self, value):
+        if value is None or isinstance(value, _NullArray):
+            if self.resp3:
+                return b'_\r\n'
+            return b'$-1\r\n' if value is None else b'*-1\r\n'
+        if isinstance(value, CommandError):
+            return f"-ERR {value}\r\n".encode() if not str(value).startswith('WRONGTYPE') else f"-{value}\r\n".encode()
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, int):
+            return f":{value}\r\n".encode()
+        if isinstance(value, str):
+            return f"+{value}\r\n".encode()
+        if isinstance(value, bytes):
+            return b'$%d\r\n%s\r\n' % (len(value), value)
+        if isinstance(value, dict):
+            return b'%%%d\r\n' % len(value) + b''.join(
+                self._encode(key) + self._encode(item) for key, item in value.items())
+        # Pub/sub messages are out-of-band pushes in RESP3
+        prefix = b'>' if self.resp3 and isinstance(value, _Push) else b'*'
+        return prefix + b'%d\r\n' % len(value) + b''.join(self._encode(item) for item in value)
+
+    def push(self, value):
+        with self.write_lock:
+            try:
+                self.wfile.write(self._encode(value))
+                self.wfile.flush()
+            except OSError:
+                pass
+
+    def handle(self):
+        try:
+            while True:
+                args = self._read_command()
+                if args is None:
+                    break
+                if not args:
+                    continue
+                self.push(self._dispatch(args[0].decode().upper(), args[1:]))
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            with self.store.lock:
+                for channel in self.subscribed:
+                    self.store.channels.get(channel, set()).discard(self)
+
+    def _dispatch(self, name, args):
+        try:
+            if name == 'HELLO':
+                return self._hello(args)
+            if name == 'MULTI':
+                self.queued = []
+                return 'OK'
+            if name == 'DISCARD':
+                self.queued, self.watched = None, {}
+                return 'OK'
+            if name == 'EXEC':
+                return self._exec()
+            if self.queued is not None:
+                self.queued.append((name, args))
+                return 'QUEUED'
+            if name == 'WATCH':
+                for key in args:
+                    self.watched[key] = self.store.version(key)
+                return 'OK'
+            if name == 'UNWATCH':
+                self.watched = {}
+                return 'OK'
+            if name == 'PUBLISH':
+                return self.server.store.publish(args[0], args[1])
+            if name == 'SUBSCRIBE':
+                return self._subscribe(args)
+            if name == 'UNSUBSCRIBE':
+                return self._unsubscribe(args)
+            return self.store.run(name, args)
+        except CommandError as e:
+            return e
+
+    def _hello(self, args):
+        if args and args[0] not in (b'2', b'3'):
+            return CommandError("NOPROTO unsupported protocol version")
+        self.resp3 = bool(args) and args[0] == b'3'
+        return {b'server': b'redis', b'version': b'7.0.0', b'proto': 3 if self.resp3 else 2,
+                b'id': 1, b'mode': b'standalone', b'role': b'master', b'modules': []}
+
+    def _exec(self):
+        if self.queued is None:
+            return CommandError("EXEC without MULTI")
+        queued, self.queued = self.queued, None
+        watched, self.watched = self.watched, {}
+        with self.store.lock:
+            if any(self.store.version(key) != version for key, version in watched.items()):
+                return _NullArray()
+            replies = []
+            for name, args in queued:
+                try:
+                    replies.append(self.store.run(name, args))
+                except CommandError as e:
+                    replies.append(e)
+            return replies
+
+    def _subscribe(self, channels):
+        # Each channel gets its own confirmation; the last one is returned by _dispatch
+        for channel in channels[:-1]:
+            self.push(self._confirm_subscribe(channel))
+        return self._confirm_subscribe(channels[-1])
+
+    def _confirm_subscribe(self, channel):
+        with self.store.lock:
+            self.store.channels.setdefault(channel, set()).add(self)
+            self.subscribed.add(channel)
+        return _Push([b'subscribe', channel, len(self.subscribed)])
+
+    def _unsubscribe(self, channels):
+        channels = list(channels) or sorted(self.subscribed) or [None]
+        replies = []
+        for channel in channels:
+            with self.store.lock:
+                if channel is not None:
+                    self.store.channels.get(channel, set()).discard(self)
+                    self.subscribed.discard(channel)
+            replies.append(_Push([b'unsubscribe', channel, len(self.subscribed)]))
+        for reply in replies[:-1]:
+            self.push(reply)
+        return replies[-1]
+
+
+class _NullArray:
+    """EXEC's reply when a watched key changed."""
+
+
+class _Push(list):
+    """A pub/sub message or (un)subscribe confirmation."""
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class RedisStandIn:
+    """
+    A Redis-protocol server on 127.0.0.1 running in background threads.
+
+        with RedisStandIn() as server:
+            client = redis.Redis.from_url(server.url)
+    """
+
+    def __init__(self):
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.store = _Store()
+        self._thread = threading.Thread(target=self._server.serve_forever, name="redis-standin", daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"redis://{host}:{port}/0"
+
+    def subscribers(self, channel):
+        """How many connections are subscribed to `channel`."""
+        store = self._server.store
+        with store.lock:
+            return len(store.channels.get(channel.encode(), ()))
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
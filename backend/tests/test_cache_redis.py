@@ -0,0 +1,81 @@
+import time
+import uuid
+
+import pytest
+
+redis = pytest.importorskip('redis')
+
+from app.cache import GENERATION_UNKNOWN, RedisCache
+from redis_standin import RedisStandIn
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def server():
+    with RedisStandIn() as server:
+        yield server
+
+
+@pytest.fixture
+def workers(server):
+    """Two RedisCache instances sharing one server, as two workers would."""
+    prefix = f"test-{uuid.uuid4().hex}"
+    caches = [RedisCache(url=server.url, prefix=prefix) for _ in range(2)]
+    # The listener clears the local copy when it subscribes; wait for both first
+    assert wait_for(lambda: server.subscribers(caches[0].channel) == 2)
+    yield caches
+    for cache in caches:
+        cache.client.close()
+
+
+def test_invalidation_reaches_other_workers(workers):
+    a, b = workers
+    a.set('patients', 'PAT1', {'patient_id': 'PAT1', 'first_name': 'Ada'}, generation=a.generation())
+    a.set('encounters', 'ENC1', {'encounter_id': 'ENC1', 'patient_first_name': 'Ada'},
+          depends=[('patients', 'PAT1')], generation=a.generation())
+
+    # Read through b so both rows land in its local copy
+    assert b.get('patients', 'PAT1') == (True, {'patient_id': 'PAT1', 'first_name': 'Ada'})
+    assert b.get('encounters', 'ENC1')[0]
+    assert b.local.get('patients', 'PAT1')[0] and b.local.get('encounters', 'ENC1')[0]
+
+    a.invalidate('patients', 'PAT1')
+
+    assert wait_for(lambda: not b.local.get('patients', 'PAT1')[0])
+    assert not b.local.get('encounters', 'ENC1')[0]
+    assert a.client.get(a._entry_key('patients', 'PAT1')) is None
+    assert a.client.get(a._entry_key('encounters', 'ENC1')) is None
+    assert b.get('encounters', 'ENC1') == (False, None)
+
+
+def test_read_overlapping_an_invalidation_is_not_stored(workers):
+    a, b = workers
+    generation = a.generation()
+    b.invalidate('patients', 'PAT1')
+    a.set('patients', 'PAT1', {'first_name': 'stale'}, generation=generation)
+
+    assert a.get('patients', 'PAT1') == (False, None)
+    assert b.get('patients', 'PAT1') == (False, None)
+
+
+def test_store_is_skipped_when_generation_is_unavailable(workers, monkeypatch):
+    a, _ = workers
+
+    def unavailable(*args, **kwargs):
+        raise redis.ConnectionError("server unavailable")
+
+    monkeypatch.setattr(a.client, 'get', unavailable)
+    generation = a.generation()
+    assert generation == GENERATION_UNKNOWN
+    a.set('patients', 'PAT1', {'first_name': 'Ada'}, generation=generation)
+    monkeypatch.undo()
+
+    assert a.get('patients', 'PAT1') == (False, None)
@@ -0,0 +1,45 @@
+# Columnar export - writes claims, denials or encounters as Parquet or an Arrow IPC stream
+#
+# Usage:
+#   python export_data.py claims                             claims.parquet in the current directory
+#   python export_data.py denials --format arrow             denials.arrows (Arrow IPC stream)
+#   python export_data.py encounters --from 2024-01-01 --to 2024-03-31 --output q1.parquet
+#
+# Requires pyarrow (pip install pyarrow). Column types follow the database:
+# DECIMAL columns become decimal128, DATE date32, BOOLEAN bool.
+import argparse
+import os
+import sys
+from mysql.connector import Error
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from app.columnar import ColumnarExport, FORMATS, TABLES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a table as Parquet or an Arrow IPC stream.")
+    parser.add_argument("table", choices=sorted(TABLES), help="what to export")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet", help="output format (default parquet)")
+    parser.add_argument("--from", dest="date_from", help="only rows dated on or after YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", help="only rows dated on or before YYYY-MM-DD")
+    parser.add_argument("--output", help="output file (default <table>.<extension>)")
+    args = parser.parse_args()
+
+    output = args.output or f"{args.table}.{FORMATS[args.format][1]}"
+    try:
+        export = ColumnarExport(args.table, args.date_from, args.date_to)
+        print(f"Exporting {args.table} to {output}...")
+        rows = export.write(output, args.format)
+    except RuntimeError as err:
+        print(f"\n[ERROR] {err}")
+        return False
+    except Error as err:
+        print(f"\n[ERROR] Database Error: {err}")
+        return False
+
+    print(f"  [OK] {rows} row(s) written")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
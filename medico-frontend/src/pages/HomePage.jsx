@@ -7,6 +7,8 @@ import SharedLayout from "../components/SharedLayout";
 const HomePage = () => {
   const [stats, setStats] = useState(null);
   const [activities, setActivities] = useState([]);
+  const [activitiesCursor, setActivitiesCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   // Default to today's date in YYYY-MM-DD format
@@ -28,6 +30,7 @@ const HomePage = () => {
       ]);
       setStats(statsData);
       setActivities(activitiesData.activities || []);
+      setActivitiesCursor(activitiesData.has_more ? activitiesData.next_cursor : null);
       setError(null);
     } catch (err) {
       console.error("Error fetching dashboard data:", err);
@@ -37,6 +40,21 @@ const HomePage = () => {
     }
   };
 
+  const loadMoreActivities = async () => {
+    if (!activitiesCursor) return;
+    try {
+      setLoadingMore(true);
+      const activitiesData = await api.getRecentActivities(selectedDate, activitiesCursor);
+      setActivities(prev => [...prev, ...(activitiesData.activities || [])]);
+      setActivitiesCursor(activitiesData.has_more ? activitiesData.next_cursor : null);
+    } catch (err) {
+      console.error("Error loading more activities:", err);
+      setError(err.message || "Failed to load more activities");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getActivityIcon = (type) => {
     switch (type) {
       case 'procedure':
@@ -276,6 +294,17 @@ const HomePage = () => {
                 </tbody>
               </table>
             </div>
+            {activitiesCursor && (
+              <div style={{ padding: "16px", textAlign: "center" }}>
+                <button
+                  className="hp-secondary-btn"
+                  onClick={loadMoreActivities}
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? "Loading..." : "Load more"}
+                </button>
+              </div>
+            )}
           </div>
         ) : (
           <div style={{ 
@@ -98,70 +98,25 @@ const LabTestDetailPage = () => {
     fetchLabTest();
   }, [fetchLabTest]);
 
-  const fetchTestCodes = useCallback(async () => {
+  const fetchFormOptions = useCallback(async () => {
     try {
-      const codes = await api.getTestCodes();
-      setTestCodeOptions(codes);
+      const options = await api.getLabTestOptions();
+      setTestCodeOptions(options.test_codes || []);
+      setLabIdOptions(options.lab_ids || []);
+      setSpecimenTypeOptions(options.specimen_types || []);
+      setUnitsOptions(options.units || []);
+      setNormalRangeOptions(options.normal_ranges || []);
+      setTestResultOptions(options.test_results || []);
     } catch (err) {
-      console.error("Error fetching test codes:", err);
-    }
-  }, []);
-
-  const fetchLabIds = useCallback(async () => {
-    try {
-      const labIds = await api.getLabIds();
-      setLabIdOptions(labIds);
-    } catch (err) {
-      console.error("Error fetching lab IDs:", err);
-    }
-  }, []);
-
-  const fetchSpecimenTypes = useCallback(async () => {
-    try {
-      const types = await api.getSpecimenTypes();
-      setSpecimenTypeOptions(types);
-    } catch (err) {
-      console.error("Error fetching specimen types:", err);
-    }
-  }, []);
-
-  const fetchUnits = useCallback(async () => {
-    try {
-      const units = await api.getUnits();
-      setUnitsOptions(units);
-    } catch (err) {
-      console.error("Error fetching units:", err);
-    }
-  }, []);
-
-  const fetchNormalRanges = useCallback(async () => {
-    try {
-      const ranges = await api.getNormalRanges();
-      setNormalRangeOptions(ranges);
-    } catch (err) {
-      console.error("Error fetching normal ranges:", err);
-    }
-  }, []);
-
-  const fetchTestResults = useCallback(async () => {
-    try {
-      const results = await api.getTestResults();
-      setTestResultOptions(results);
-    } catch (err) {
-      console.error("Error fetching test results:", err);
+      console.error("Error fetching form options:", err);
     }
   }, []);
 
   useEffect(() => {
     if (isEditing) {
-      fetchTestCodes();
-      fetchLabIds();
-      fetchSpecimenTypes();
-      fetchUnits();
-      fetchNormalRanges();
-      fetchTestResults();
+      fetchFormOptions();
     }
-  }, [isEditing, fetchTestCodes, fetchLabIds, fetchSpecimenTypes, fetchUnits, fetchNormalRanges, fetchTestResults]);
+  }, [isEditing, fetchFormOptions]);
 
   const handleSubmit = async (e) => {
     e.preventDefault();
@@ -380,7 +335,7 @@ const LabTestDetailPage = () => {
                   onFocus={() => {
                     setShowLabIdDropdown(true);
                     if (labIdOptions.length === 0) {
-                      fetchLabIds();
+                      fetchFormOptions();
                     }
                   }}
                   placeholder="Select or type lab ID..."
@@ -421,7 +376,7 @@ const LabTestDetailPage = () => {
                   }}
                   onFocus={() => {
                     if (specimenTypeOptions.length === 0) {
-                      fetchSpecimenTypes();
+                      fetchFormOptions();
                     }
                   }}
                   placeholder="Select or type specimen type..."
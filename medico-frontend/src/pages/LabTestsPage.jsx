@@ -150,76 +150,26 @@ const LabTestsPage = () => {
     }
   }, []);
 
-  // Fetch test codes
-  const fetchTestCodes = useCallback(async () => {
+  // Fetch every dropdown vocabulary in one request
+  const fetchFormOptions = useCallback(async () => {
     try {
-      const codes = await api.getTestCodes();
-      setTestCodeOptions(codes);
+      const options = await api.getLabTestOptions();
+      setTestCodeOptions(options.test_codes || []);
+      setLabIdOptions(options.lab_ids || []);
+      setSpecimenTypeOptions(options.specimen_types || []);
+      setUnitsOptions(options.units || []);
+      setNormalRangeOptions(options.normal_ranges || []);
+      setTestResultOptions(options.test_results || []);
     } catch (err) {
-      console.error("Error fetching test codes:", err);
-    }
-  }, []);
-
-  // Fetch lab IDs
-  const fetchLabIds = useCallback(async () => {
-    try {
-      const labIds = await api.getLabIds();
-      setLabIdOptions(labIds);
-    } catch (err) {
-      console.error("Error fetching lab IDs:", err);
-    }
-  }, []);
-
-  // Fetch specimen types
-  const fetchSpecimenTypes = useCallback(async () => {
-    try {
-      const types = await api.getSpecimenTypes();
-      setSpecimenTypeOptions(types);
-    } catch (err) {
-      console.error("Error fetching specimen types:", err);
-    }
-  }, []);
-
-  // Fetch units
-  const fetchUnits = useCallback(async () => {
-    try {
-      const units = await api.getUnits();
-      setUnitsOptions(units);
-    } catch (err) {
-      console.error("Error fetching units:", err);
-    }
-  }, []);
-
-  // Fetch normal ranges
-  const fetchNormalRanges = useCallback(async () => {
-    try {
-      const ranges = await api.getNormalRanges();
-      setNormalRangeOptions(ranges);
-    } catch (err) {
-      console.error("Error fetching normal ranges:", err);
-    }
-  }, []);
-
-  // Fetch test results
-  const fetchTestResults = useCallback(async () => {
-    try {
-      const results = await api.getTestResults();
-      setTestResultOptions(results);
-    } catch (err) {
-      console.error("Error fetching test results:", err);
+      console.error("Error fetching form options:", err);
     }
   }, []);
 
   useEffect(() => {
     if (showModal) {
-      fetchTestCodes();
-      fetchLabIds();
-      fetchSpecimenTypes();
-      fetchUnits();
-      fetchNormalRanges();
-      fetchTestResults();
+      fetchFormOptions();
     }
-  }, [showModal, fetchTestCodes, fetchLabIds, fetchSpecimenTypes, fetchUnits, fetchNormalRanges, fetchTestResults]);
+  }, [showModal, fetchFormOptions]);
 
   // Debounce encounter search
   useEffect(() => {
@@ -753,7 +703,7 @@ const LabTestsPage = () => {
                     onFocus={() => {
                       setShowLabIdDropdown(true);
                       if (labIdOptions.length === 0) {
-                        fetchLabIds();
+                        fetchFormOptions();
                       }
                     }}
                     placeholder="Select or type lab ID..."
@@ -794,7 +744,7 @@ const LabTestsPage = () => {
                     }}
                     onFocus={() => {
                       if (specimenTypeOptions.length === 0) {
-                        fetchSpecimenTypes();
+                        fetchFormOptions();
                       }
                     }}
                     placeholder="Select or type specimen type..."
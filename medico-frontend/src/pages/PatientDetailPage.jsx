@@ -10,6 +10,10 @@ const PatientDetailPage = () => {
   const navigate = useNavigate();
   const [patient, setPatient] = useState(null);
   const [encounters, setEncounters] = useState([]);
+  const [diagnoses, setDiagnoses] = useState([]);
+  const [medications, setMedications] = useState([]);
+  const [labTests, setLabTests] = useState([]);
+  const [claimsSummary, setClaimsSummary] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [isEditing, setIsEditing] = useState(false);
@@ -67,8 +71,15 @@ const PatientDetailPage = () => {
   const fetchPatient = async () => {
     try {
       setLoading(true);
-      const patientData = await api.getPatientById(id);
+      // One request for the whole chart: patient, encounters, diagnoses, medications, labs, claims
+      const summary = await api.getPatientSummary(id);
+      const patientData = summary.patient;
       setPatient(patientData);
+      setEncounters(summary.encounters || []);
+      setDiagnoses(summary.diagnoses || []);
+      setMedications(summary.medications || []);
+      setLabTests(summary.lab_tests || []);
+      setClaimsSummary(summary.claims || null);
       const dob = normalizeDate(patientData.dob);
       
       setFormData({
@@ -89,28 +100,6 @@ const PatientDetailPage = () => {
         registration_date: normalizeDate(patientData.registration_date),
       });
       
-      // Fetch encounters for this patient
-      try {
-        const queryParams = new URLSearchParams();
-        queryParams.append('limit', '10000');
-        queryParams.append('page', '1');
-        queryParams.append('patient_id', id);
-        const response = await fetch(`/api/encounters/?${queryParams}`);
-        if (response.ok) {
-          const encountersData = await response.json();
-          if (Array.isArray(encountersData)) {
-            setEncounters(encountersData);
-          } else if (encountersData && encountersData.data) {
-            setEncounters(encountersData.data);
-          } else {
-            setEncounters([]);
-          }
-        }
-      } catch (err) {
-        console.error("Error fetching encounters:", err);
-        setEncounters([]);
-      }
-      
       setError(null);
     } catch (err) {
       console.error("Error fetching patient:", err);
@@ -557,6 +546,147 @@ const PatientDetailPage = () => {
               </div>
             )}
           </div>
+
+          {/* Claims Balance */}
+          <div className="page-section" style={{ marginTop: "24px" }}>
+            <h3 style={{ marginTop: 0, marginBottom: "20px" }}>💰 Claims Balance</h3>
+            {!claimsSummary || !claimsSummary.claim_count ? (
+              <p style={{ color: "var(--hp-text-soft)" }}>No claims found for this patient.</p>
+            ) : (
+              <table style={{ width: "100%", borderCollapse: "collapse" }}>
+                <tbody>
+                  <tr>
+                    <td style={{ padding: "8px 0", color: "var(--hp-text-soft)", fontWeight: "500", fontSize: "13px", width: "40%" }}>Claims:</td>
+                    <td style={{ padding: "8px 0" }}>{claimsSummary.claim_count} ({claimsSummary.denied_count || 0} denied)</td>
+                  </tr>
+                  <tr>
+                    <td style={{ padding: "8px 0", color: "var(--hp-text-soft)", fontWeight: "500", fontSize: "13px" }}>Total Billed:</td>
+                    <td style={{ padding: "8px 0" }}>${(parseFloat(claimsSummary.total_billed) || 0).toFixed(2)}</td>
+                  </tr>
+                  <tr>
+                    <td style={{ padding: "8px 0", color: "var(--hp-text-soft)", fontWeight: "500", fontSize: "13px" }}>Total Paid:</td>
+                    <td style={{ padding: "8px 0" }}>${(parseFloat(claimsSummary.total_paid) || 0).toFixed(2)}</td>
+                  </tr>
+                  <tr>
+                    <td style={{ padding: "8px 0", color: "var(--hp-text-soft)", fontWeight: "500", fontSize: "13px" }}>Outstanding Balance:</td>
+                    <td style={{ padding: "8px 0", fontWeight: "600" }}>${(parseFloat(claimsSummary.balance) || 0).toFixed(2)}</td>
+                  </tr>
+                  <tr>
+                    <td style={{ padding: "8px 0", color: "var(--hp-text-soft)", fontWeight: "500", fontSize: "13px" }}>Last Billed:</td>
+                    <td style={{ padding: "8px 0" }}>{formatDate(claimsSummary.last_billed)}</td>
+                  </tr>
+                </tbody>
+              </table>
+            )}
+          </div>
+
+          {/* Latest Diagnoses */}
+          <div className="page-section" style={{ marginTop: "24px" }}>
+            <h3 style={{ marginTop: 0, marginBottom: "20px" }}>🩺 Latest Diagnoses</h3>
+            {diagnoses.length === 0 ? (
+              <p style={{ color: "var(--hp-text-soft)" }}>No diagnoses found for this patient.</p>
+            ) : (
+              <div style={{ overflowX: "auto" }}>
+                <table className="page-table">
+                  <thead>
+                    <tr>
+                      <th>Diagnosis Code</th>
+                      <th>Description</th>
+                      <th>Encounter</th>
+                      <th>Visit Date</th>
+                      <th>Chronic</th>
+                    </tr>
+                  </thead>
+                  <tbody>
+                    {diagnoses.map((diag) => (
+                      <tr key={diag.diagnosis_id}>
+                        <td>{diag.diagnosis_code}</td>
+                        <td>{diag.diagnosis_description || "N/A"}</td>
+                        <td>
+                          <Link
+                            to={`/encounters/${diag.encounter_id}`}
+                            style={{ color: "var(--hp-accent)", textDecoration: "none", fontWeight: "500" }}
+                          >
+                            {diag.encounter_id}
+                          </Link>
+                        </td>
+                        <td>{formatDate(diag.visit_date)}</td>
+                        <td>{diag.chronic_flag ? "Yes" : "No"}</td>
+                      </tr>
+                    ))}
+                  </tbody>
+                </table>
+              </div>
+            )}
+          </div>
+
+          {/* Recent Medications */}
+          <div className="page-section" style={{ marginTop: "24px" }}>
+            <h3 style={{ marginTop: 0, marginBottom: "20px" }}>💊 Recent Medications</h3>
+            {medications.length === 0 ? (
+              <p style={{ color: "var(--hp-text-soft)" }}>No medications found for this patient.</p>
+            ) : (
+              <div style={{ overflowX: "auto" }}>
+                <table className="page-table">
+                  <thead>
+                    <tr>
+                      <th>Drug Name</th>
+                      <th>Dosage</th>
+                      <th>Frequency</th>
+                      <th>Duration</th>
+                      <th>Prescriber</th>
+                      <th>Date</th>
+                    </tr>
+                  </thead>
+                  <tbody>
+                    {medications.map((med) => (
+                      <tr key={med.medication_id}>
+                        <td>{med.drug_name}</td>
+                        <td>{med.dosage || "N/A"}</td>
+                        <td>{med.frequency || "N/A"}</td>
+                        <td>{med.duration || "N/A"}</td>
+                        <td>{med.prescriber_name || "N/A"}</td>
+                        <td>{formatDate(med.prescribed_date)}</td>
+                      </tr>
+                    ))}
+                  </tbody>
+                </table>
+              </div>
+            )}
+          </div>
+
+          {/* Recent Lab Tests */}
+          <div className="page-section" style={{ marginTop: "24px" }}>
+            <h3 style={{ marginTop: 0, marginBottom: "20px" }}>🧪 Recent Lab Tests</h3>
+            {labTests.length === 0 ? (
+              <p style={{ color: "var(--hp-text-soft)" }}>No lab tests found for this patient.</p>
+            ) : (
+              <div style={{ overflowX: "auto" }}>
+                <table className="page-table">
+                  <thead>
+                    <tr>
+                      <th>Test Name</th>
+                      <th>Code</th>
+                      <th>Result</th>
+                      <th>Status</th>
+                      <th>Date</th>
+                    </tr>
+                  </thead>
+                  <tbody>
+                    {labTests.map((test) => (
+                      <tr key={test.test_id}>
+                        <td>{test.test_name}</td>
+                        <td>{test.test_code}</td>
+                        <td>{test.test_result || "N/A"}</td>
+                        <td>{test.status}</td>
+                        <td>{formatDate(test.test_date)}</td>
+                      </tr>
+                    ))}
+                  </tbody>
+                </table>
+              </div>
+            )}
+          </div>
         </>
       )}
     </SharedLayout>
@@ -12,6 +12,28 @@ const buildParams = (limit, offset, search) => {
   return params.toString();
 };
 
+// Longest ID list sent as ?ids=...; longer lists are POSTed to /batch
+const MAX_QUERY_IDS = 100;
+
+// Many rows of one resource by ID in a single request. Resolves to
+// { data: [rows in the order of ids], missing: [ids not found] }.
+const fetchByIds = async (resource, ids) => {
+  const unique = [...new Set((ids || []).filter((id) => id !== null && id !== undefined && id !== ''))];
+  if (unique.length === 0) return { data: [], missing: [] };
+  const response = unique.length <= MAX_QUERY_IDS
+    ? await fetch(`${API_BASE_URL}/${resource}/?ids=${unique.map(encodeURIComponent).join(',')}`)
+    : await fetch(`${API_BASE_URL}/${resource}/batch`, {
+      method: 'POST',
+      headers: jsonHeaders,
+      body: JSON.stringify({ ids: unique }),
+    });
+  if (!response.ok) {
+    const error = await response.json().catch(() => ({ error: `Failed to fetch ${resource}` }));
+    throw new Error(error.error || `Failed to fetch ${resource}`);
+  }
+  return response.json();
+};
+
 export const api = {
   // Dashboard
   getDashboardStats: async (date = null) => {
@@ -23,9 +45,13 @@ export const api = {
     return response.json();
   },
 
-  getRecentActivities: async (date = null) => {
-    const url = date 
-      ? `${API_BASE_URL}/dashboard/recent-activities?date=${date}`
+  getRecentActivities: async (date = null, after = null) => {
+    const params = new URLSearchParams();
+    if (date) params.append('date', date);
+    if (after) params.append('after', after);
+    const query = params.toString();
+    const url = query
+      ? `${API_BASE_URL}/dashboard/recent-activities?${query}`
       : `${API_BASE_URL}/dashboard/recent-activities`;
     const response = await fetch(url);
     if (!response.ok) throw new Error('Failed to fetch recent activities');
@@ -46,6 +72,9 @@ export const api = {
       if (params.search) queryParams.append('q', params.search);
       if (params.sort) queryParams.append('sort', params.sort);
       if (params.direction) queryParams.append('direction', params.direction);
+      if (params.count) queryParams.append('count', params.count);
+      if (params.after) queryParams.append('after', params.after);
+      if (params.fields) queryParams.append('fields', Array.isArray(params.fields) ? params.fields.join(',') : params.fields);
       if (params.filters) {
         Object.entries(params.filters).forEach(([key, value]) => {
           if (value) queryParams.append(key, value);
@@ -141,6 +170,20 @@ export const api = {
     }
     return response.json();
   },
+  getPatientsByIds: async (ids) => fetchByIds('patients', ids),
+  getPatientSummary: async (id, params = {}) => {
+    const queryParams = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== null && value !== undefined && value !== '') queryParams.append(key, value);
+    });
+    const query = queryParams.toString();
+    const response = await fetch(`${API_BASE_URL}/patients/${id}/summary${query ? `?${query}` : ''}`);
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({ error: 'Failed to fetch patient summary' }));
+      throw new Error(error.error || 'Failed to fetch patient summary');
+    }
+    return response.json();
+  },
   getPatientsOptions: async (search = '', limit = 100) => {
     // Use encounters/options/patients endpoint for encounter forms
     try {
@@ -199,6 +242,9 @@ export const api = {
     if (params.search) queryParams.append('q', params.search);
     if (params.sort) queryParams.append('sort', params.sort);
     if (params.direction) queryParams.append('direction', params.direction);
+    if (params.count) queryParams.append('count', params.count);
+    if (params.after) queryParams.append('after', params.after);
+    if (params.fields) queryParams.append('fields', Array.isArray(params.fields) ? params.fields.join(',') : params.fields);
     if (params.filters) {
       Object.entries(params.filters).forEach(([key, value]) => {
         if (value !== null && value !== undefined && value !== '') {
@@ -301,6 +347,7 @@ export const api = {
     return response.json();
   },
 
+  getClaimsByIds: async (ids) => fetchByIds('claims', ids),
   getClaimsByPatient: async (patientId) => {
     const response = await fetch(`${API_BASE_URL}/claims/patient/${patientId}`);
     if (!response.ok) throw new Error('Failed to fetch patient claims');
@@ -330,6 +377,9 @@ export const api = {
       if (params.search) queryParams.append('q', params.search);
       if (params.sort) queryParams.append('sort', params.sort);
       if (params.direction) queryParams.append('direction', params.direction);
+      if (params.count) queryParams.append('count', params.count);
+      if (params.after) queryParams.append('after', params.after);
+      if (params.fields) queryParams.append('fields', Array.isArray(params.fields) ? params.fields.join(',') : params.fields);
       if (params.filters) {
         Object.entries(params.filters).forEach(([key, value]) => {
           if (value) queryParams.append(key, value);
@@ -357,8 +407,10 @@ export const api = {
     if (!response.ok) throw new Error('Failed to fetch encounter');
     return response.json();
   },
-  getEncounterRelated: async (id) => {
-    const response = await fetch(`${API_BASE_URL}/encounters/${id}/related`);
+  getEncountersByIds: async (ids) => fetchByIds('encounters', ids),
+  getEncounterRelated: async (id, include = null) => {
+    const query = include && include.length ? `?include=${encodeURIComponent(include.join(','))}` : '';
+    const response = await fetch(`${API_BASE_URL}/encounters/${id}/related${query}`);
     if (!response.ok) throw new Error('Failed to fetch related data');
     return response.json();
   },
@@ -419,6 +471,9 @@ export const api = {
     if (params.search) queryParams.append('q', params.search);
     if (params.sort) queryParams.append('sort', params.sort);
     if (params.direction) queryParams.append('direction', params.direction);
+    if (params.count) queryParams.append('count', params.count);
+    if (params.after) queryParams.append('after', params.after);
+    if (params.fields) queryParams.append('fields', Array.isArray(params.fields) ? params.fields.join(',') : params.fields);
     if (params.filters) {
       Object.entries(params.filters).forEach(([key, value]) => {
         if (value !== null && value !== undefined && value !== '') {
@@ -438,6 +493,7 @@ export const api = {
     }
     return response.json();
   },
+  getProvidersByIds: async (ids) => fetchByIds('providers', ids),
   getProviderById: async (id) => {
     try {
       const response = await fetch(`${API_BASE_URL}/providers/${id}`);
@@ -597,6 +653,9 @@ export const api = {
     if (params.search) queryParams.append('q', params.search);
     if (params.sort) queryParams.append('sort', params.sort);
     if (params.direction) queryParams.append('direction', params.direction);
+    if (params.count) queryParams.append('count', params.count);
+    if (params.after) queryParams.append('after', params.after);
+    if (params.fields) queryParams.append('fields', Array.isArray(params.fields) ? params.fields.join(',') : params.fields);
     if (params.filters) {
       Object.entries(params.filters).forEach(([key, value]) => {
         if (value !== null && value !== undefined && value !== '') {
@@ -740,6 +799,9 @@ export const api = {
     if (params.search) queryParams.append('q', params.search);
     if (params.sort) queryParams.append('sort', params.sort);
     if (params.direction) queryParams.append('direction', params.direction);
+    if (params.count) queryParams.append('count', params.count);
+    if (params.after) queryParams.append('after', params.after);
+    if (params.fields) queryParams.append('fields', Array.isArray(params.fields) ? params.fields.join(',') : params.fields);
     if (params.filters) {
       Object.entries(params.filters).forEach(([key, value]) => {
         if (value !== null && value !== undefined && value !== '') {
@@ -869,6 +931,9 @@ export const api = {
     if (params.search) queryParams.append('q', params.search);
     if (params.sort) queryParams.append('sort', params.sort);
     if (params.direction) queryParams.append('direction', params.direction);
+    if (params.count) queryParams.append('count', params.count);
+    if (params.after) queryParams.append('after', params.after);
+    if (params.fields) queryParams.append('fields', Array.isArray(params.fields) ? params.fields.join(',') : params.fields);
     if (params.filters) {
       Object.entries(params.filters).forEach(([key, value]) => {
         if (value !== null && value !== undefined && value !== '') {
@@ -970,6 +1035,9 @@ export const api = {
     if (params.search) queryParams.append('q', params.search);
     if (params.sort) queryParams.append('sort', params.sort);
     if (params.direction) queryParams.append('direction', params.direction);
+    if (params.count) queryParams.append('count', params.count);
+    if (params.after) queryParams.append('after', params.after);
+    if (params.fields) queryParams.append('fields', Array.isArray(params.fields) ? params.fields.join(',') : params.fields);
     if (params.filters) {
       Object.entries(params.filters).forEach(([key, value]) => {
         if (value !== null && value !== undefined && value !== '') {
@@ -1092,6 +1160,9 @@ export const api = {
     if (params.search) queryParams.append('q', params.search);
     if (params.sort) queryParams.append('sort', params.sort);
     if (params.direction) queryParams.append('direction', params.direction);
+    if (params.count) queryParams.append('count', params.count);
+    if (params.after) queryParams.append('after', params.after);
+    if (params.fields) queryParams.append('fields', Array.isArray(params.fields) ? params.fields.join(',') : params.fields);
     if (params.filters) {
       Object.entries(params.filters).forEach(([key, value]) => {
         if (value !== null && value !== undefined && value !== '') {
@@ -1128,6 +1199,20 @@ export const api = {
       return [];
     }
   },
+  getLabTestOptions: async () => {
+    // Every form vocabulary in one request; the browser revalidates it with the ETag
+    try {
+      const response = await fetch(`${API_BASE_URL}/lab-tests/options`);
+      if (!response.ok) {
+        const error = await response.json().catch(() => ({ error: 'Failed to fetch lab test options' }));
+        throw new Error(error.error || 'Failed to fetch lab test options');
+      }
+      return await response.json();
+    } catch (err) {
+      console.error('Error fetching lab test options:', err);
+      return {};
+    }
+  },
   getTestCodes: async () => {
     try {
       const response = await fetch(`${API_BASE_URL}/lab-tests/options/test-codes`);
@@ -1283,6 +1368,9 @@ export const api = {
     if (params.search) queryParams.append('q', params.search);
     if (params.sort) queryParams.append('sort', params.sort);
     if (params.direction) queryParams.append('direction', params.direction);
+    if (params.count) queryParams.append('count', params.count);
+    if (params.after) queryParams.append('after', params.after);
+    if (params.fields) queryParams.append('fields', Array.isArray(params.fields) ? params.fields.join(',') : params.fields);
     if (params.filters) {
       Object.entries(params.filters).forEach(([key, value]) => {
         if (value !== null && value !== undefined && value !== '') {
@@ -1302,6 +1390,7 @@ export const api = {
     }
     return response.json();
   },
+  getInsurersByIds: async (ids) => fetchByIds('insurers', ids),
   getInsurerById: async (id) => {
     try {
       const response = await fetch(`${API_BASE_URL}/insurers/${id}`);
@@ -1373,6 +1462,9 @@ export const api = {
     if (params.search) queryParams.append('q', params.search);
     if (params.sort) queryParams.append('sort', params.sort);
     if (params.direction) queryParams.append('direction', params.direction);
+    if (params.count) queryParams.append('count', params.count);
+    if (params.after) queryParams.append('after', params.after);
+    if (params.fields) queryParams.append('fields', Array.isArray(params.fields) ? params.fields.join(',') : params.fields);
     if (params.filters) {
       Object.entries(params.filters).forEach(([key, value]) => {
         if (value !== null && value !== undefined && value !== '') {
@@ -0,0 +1,209 @@
+# Index migrations - versioned, idempotent index creation for an existing database
+#
+# Usage:
+#   python migrations.py           apply pending migrations, then run the EXPLAIN check
+#   python migrations.py --check   only run the EXPLAIN check
+import os
+import sys
+import mysql.connector
+from mysql.connector import errorcode
+from settings import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT
+from table_definitions import INDEX_MIGRATIONS
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from app import models
+
+MIGRATIONS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+# List queries whose plan is checked, compiled by the models exactly as the
+# list endpoints run them (joins, lookups, filters, page order and LIMIT):
+# (description, model, first_page() arguments, table alias in the plan, expected index)
+LIST_QUERY_CHECKS = [
+    ("Patients list (registration_date)", "PatientsModel", {}, "p", "idx_patients_registration_date"),
+    ("Encounters list (visit_date)", "EncountersModel", {}, "e", "idx_encounters_visit_date"),
+    ("Encounters by status", "EncountersModel", {"filters": {"status": "Completed"}},
+     "e", "idx_encounters_status_visit_date"),
+    ("Claims list (claim_billing_date)", "ClaimsAndBillingModel", {}, "cb", "idx_claims_billing_date"),
+    ("Claims by status", "ClaimsAndBillingModel", {"filters": {"claim_status": "Denied"}},
+     "cb", "idx_claims_status_billing_date"),
+    ("Denials list (denial_date)", "DenialsModel", {}, "d", "idx_denials_denial_date"),
+    ("Medications list (prescribed_date)", "MedicationsModel", {}, "m", "idx_medications_prescribed_date"),
+    ("Procedures list (procedure_date)", "ProceduresModel", {}, "pr", "idx_procedures_date"),
+    ("Lab tests list (test_date)", "LabTestsModel", {}, "lt", "idx_lab_tests_test_date"),
+    ("Diagnoses list (diagnosis_code)", "DiagnosesModel", {"sort_by": "diagnosis_code", "sort_dir": "asc"},
+     "d", "idx_diagnoses_code"),
+    ("Providers list (name)", "ProvidersModel", {"sort_by": "name", "sort_dir": "asc"}, "pr", "idx_providers_name"),
+]
+
+# Other hot statements, as the models and the activity feed run them
+# (description, table alias in the plan, query, params, expected index)
+QUERY_CHECKS = [
+    ("Claim statistics", "claims_and_billing",
+     "SELECT claim_status, COUNT(*) as count, SUM(billed_amount) as total_amount FROM claims_and_billing "
+     "GROUP BY claim_status ORDER BY total_amount DESC",
+     [], "idx_claims_status_amounts"),
+    ("Claim amount sync (procedures)", "procedures",
+     "SELECT COALESCE(SUM(procedure_cost), 0) FROM procedures WHERE encounter_id = %s",
+     ["ENC000001"], "idx_procedures_encounter_cost"),
+    ("Claim amount sync (medications)", "medications",
+     "SELECT COALESCE(SUM(cost), 0) FROM medications WHERE encounter_id = %s",
+     ["ENC000001"], "idx_medications_encounter_cost"),
+    ("Activity feed primary diagnosis", "d",
+     "SELECT NULLIF(d.diagnosis_description, '') FROM diagnoses d "
+     "WHERE d.encounter_id = %s AND d.primary_flag = TRUE LIMIT 1",
+     ["ENC000001"], "idx_diagnoses_encounter_primary"),
+]
+
+
+def index_usage_checks():
+    """(description, alias, query, params, expected index) of every checked statement."""
+    checks = []
+    for description, model, arguments, alias, expected in LIST_QUERY_CHECKS:
+        query, params = getattr(models, model).QUERY.first_page(**arguments)
+        checks.append((description, alias, query, params, expected))
+    return checks + QUERY_CHECKS
+
+
+def index_exists(cursor, table, index_name):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (DB_NAME, table, index_name))
+    return cursor.fetchone()[0] > 0
+
+
+def create_index(cursor, kind, table, index_name, columns):
+    if kind in ("FULLTEXT", "FULLTEXT_REBUILD"):
+        # ngram would drop every token containing a stopword ("a", "i", ...) from the
+        # index and the query; the setting is read when the index is created
+        cursor.execute("SET SESSION innodb_ft_enable_stopword = OFF")
+        cursor.execute(f"CREATE FULLTEXT INDEX {index_name} ON {table} ({columns}) WITH PARSER ngram")
+    else:
+        cursor.execute(f"CREATE INDEX {index_name} ON {table} ({columns})")
+
+
+def apply_migrations(cursor, conn):
+    """Apply every index migration not yet recorded in schema_migrations."""
+    print("\n" + "=" * 60)
+    print("Applying index migrations...")
+    print("=" * 60)
+
+    cursor.execute(MIGRATIONS_TABLE_SQL)
+    cursor.execute("SELECT version FROM schema_migrations")
+    applied = {row[0] for row in cursor.fetchall()}
+
+    created = set()
+    for version, description, kind, indexes in INDEX_MIGRATIONS:
+        if version in applied:
+            print(f"[{version}] {description}: already applied")
+            continue
+
+        print(f"[{version}] {description}")
+        for table, index_name, columns in indexes:
+            if kind == "FULLTEXT_REBUILD":
+                # Rebuilt in place, unless an earlier migration of this run just created it
+                if (table, index_name) in created:
+                    print(f"  [SKIP] {table}.{index_name} was created in this run")
+                    continue
+                if index_exists(cursor, table, index_name):
+                    cursor.execute(f"DROP INDEX {index_name} ON {table}")
+            # Indexes can exist without a recorded version (e.g. created by hand)
+            elif index_exists(cursor, table, index_name):
+                print(f"  [SKIP] {table}.{index_name} already exists")
+                continue
+            try:
+                create_index(cursor, kind, table, index_name, columns)
+                created.add((table, index_name))
+                print(f"  [OK] {table}.{index_name} ({columns})")
+            except mysql.connector.Error as err:
+                print(f"  [ERROR] {table}.{index_name}: {err}")
+                raise
+
+        cursor.execute(
+            "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+            (version, description)
+        )
+        conn.commit()
+
+    print("Index migrations complete!\n")
+
+
+def check_index_usage(conn):
+    """
+    EXPLAIN the list queries (as the models compile them) and the other
+    checked statements, and report whether each one uses its expected index.
+    Returns the problems found, one line each; empty if every plan is as
+    expected. On very small tables the optimizer may still prefer a full
+    scan, so run it against loaded data.
+    """
+    print("\n" + "=" * 60)
+    print("Checking index usage (EXPLAIN)...")
+    print("=" * 60)
+
+    cursor = conn.cursor(dictionary=True)
+    problems = []
+    try:
+        for description, alias, query, params, expected in index_usage_checks():
+            try:
+                cursor.execute(f"EXPLAIN {query}", params)
+                plan = cursor.fetchall()
+            except mysql.connector.Error as err:
+                print(f"  [ERROR] {description}: {err}")
+                problems.append(f"{description}: EXPLAIN failed ({err})")
+                continue
+
+            row = next((r for r in plan if r.get('table') == alias), plan[0] if plan else {})
+            used = row.get('key')
+            if used == expected:
+                print(f"  [OK] {description}: {used}")
+            else:
+                print(f"  [WARN] {description}: expected {expected}, plan uses {used or 'no index'}")
+                problems.append(f"{description}: expected {expected}, plan uses {used or 'no index'}")
+    finally:
+        cursor.close()
+
+    if problems:
+        print("\n" + "!" * 60)
+        print(f"WARNING: {len(problems)} checked quer{'y does' if len(problems) == 1 else 'ies do'} "
+              f"not use the expected index:")
+        for problem in problems:
+            print(f"  - {problem}")
+        print("!" * 60)
+    print()
+    return problems
+
+
+def main():
+    conn = None
+    try:
+        conn = mysql.connector.connect(
+            host=DB_HOST,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            database=DB_NAME,
+            port=DB_PORT,
+            autocommit=False
+        )
+        cursor = conn.cursor()
+        if "--check" not in sys.argv[1:]:
+            apply_migrations(cursor, conn)
+        cursor.close()
+        return not check_index_usage(conn)
+    except mysql.connector.Error as err:
+        print(f"\n[ERROR] Database Error: {err}")
+        if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
+            print("Check your username and password in settings.py")
+        return False
+    finally:
+        if conn and conn.is_connected():
+            conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
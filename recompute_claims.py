@@ -0,0 +1,52 @@
+# Batch claim recompute - brings claims in line with their procedures and medications
+#
+# Usage:
+#   python recompute_claims.py ENC000001 ENC000002 ...   recompute the given encounters
+#   python recompute_claims.py --since 2024-01-01        recompute encounters with line items dated since then
+#   python recompute_claims.py --file encounters.txt     recompute the encounter IDs listed in a file (one per line)
+#
+# Run it after loading procedures or medications in bulk: claims are updated
+# and created in batches instead of one sync per inserted row.
+import argparse
+import os
+import sys
+from mysql.connector import Error
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from app.models import ClaimsAndBillingModel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute claim billed amounts from procedures and medications.")
+    parser.add_argument("encounter_ids", nargs="*", help="encounter IDs to recompute")
+    parser.add_argument("--since", help="recompute encounters with line items dated on or after YYYY-MM-DD")
+    parser.add_argument("--file", help="file with one encounter ID per line")
+    parser.add_argument("--batch-size", type=int, default=500, help="encounters per transaction (default 500)")
+    args = parser.parse_args()
+
+    encounter_ids = list(args.encounter_ids)
+    if args.file:
+        with open(args.file) as f:
+            encounter_ids.extend(line.strip() for line in f if line.strip())
+    if not encounter_ids and not args.since:
+        parser.error("give encounter IDs, --file or --since")
+
+    try:
+        if args.since:
+            encounter_ids.extend(ClaimsAndBillingModel.dirty_encounters(args.since))
+        print(f"Recomputing claims of {len(set(encounter_ids))} encounter(s)...")
+        summary = ClaimsAndBillingModel.recompute(encounter_ids, batch_size=args.batch_size)
+    except Error as err:
+        print(f"\n[ERROR] Database Error: {err}")
+        return False
+
+    print(f"  Updated:   {summary['updated']}")
+    print(f"  Created:   {summary['created']}")
+    print(f"  Unchanged: {summary['unchanged']}")
+    if summary['missing']:
+        print(f"  [WARN] {summary['missing']} encounter(s) not found")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
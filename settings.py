@@ -2,4 +2,25 @@ DB_HOST = "localhost" # your database host, usually 'localhost'
 DB_USER = "root"      # your database username
 DB_PASSWORD = "your-password"  # your database password
 DB_NAME = "medico_db" 
-DB_PORT = 3306        # Default MySQL port, please check your configuration and change if necessary
\ No newline at end of file
+DB_PORT = 3306        # Default MySQL port, please check your configuration and change if necessary
+
+# Connection pool (used by the backend)
+DB_POOL_SIZE = 10           # connections kept open and reused between requests
+DB_POOL_MAX_OVERFLOW = 10   # extra connections opened under load, closed when returned
+DB_POOL_TIMEOUT = 30        # seconds to wait for a free connection before giving up
+DB_POOL_RECYCLE = 3600      # seconds after which an idle connection is replaced
+
+# ID allocation
+ID_BLOCK_SIZE = 20          # IDs reserved per database round trip (1 = no gaps after restarts)
+BULK_MAX_RECORDS = 5000     # records accepted by one POST /api/<resource>/bulk request
+
+# Entity cache (get_by_id reads)
+CACHE_MAX_ENTRIES = 5000    # rows kept in memory; least recently used are evicted first
+CACHE_TTL = 300             # seconds a cached row is served before it is read again
+CACHE_BACKEND = "local"     # "local" (this process) or "redis" (shared by all workers; pip install redis)
+REDIS_URL = "redis://localhost:6379/0"  # any Redis-protocol server, used when CACHE_BACKEND = "redis"
+DASHBOARD_CACHE_TTL = 15    # seconds the dashboard figures are served from the cache
+REFDATA_MAX_AGE = 300       # seconds before the insurers/department heads snapshot is reloaded
+UNDIAGNOSED_MAX_AGE = 60    # seconds before the set of encounters without a diagnosis is reloaded
+CATALOG_MAX_AGE = 300       # seconds before the form dropdown vocabularies (test codes, units, ...) are reloaded
+TYPEAHEAD_MAX_AGE = 60      # seconds before the patient/provider typeahead indexes are reloaded
@@ -3,6 +3,7 @@ import mysql.connector
 from mysql.connector import errorcode
 from settings import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_PORT
 from table_definitions import CREATE_TABLES_SQL
+from migrations import apply_migrations, check_index_usage
 import os
 
 def drop_existing_tables(cursor):
@@ -11,7 +12,9 @@ def drop_existing_tables(cursor):
     tables = [
         'denials', 'claims_and_billing', 'medications', 'lab_tests', 
         'procedures', 'diagnoses', 'encounters', 'department_heads',
-        'providers', 'patients', 'insurers'
+        'providers', 'patients', 'insurers', 'schema_migrations', 'sequences',
+        'dashboard_daily_rollups', 'dashboard_encounter_rollups', 'dashboard_open_patients',
+        'dashboard_rollup_state', 'dashboard_totals'
     ]
     cursor.execute('SET FOREIGN_KEY_CHECKS = 0')
     for table in tables:
@@ -488,15 +491,21 @@ def setup_database():
         script_dir = os.path.dirname(os.path.abspath(__file__))
         dataset_path = os.path.join(script_dir, 'Dataset_renewed')
         load_csv_data_with_validation(cursor, conn, dataset_path)
+        apply_migrations(cursor, conn)
         
         # Step 3: Test constraints
         test_constraints(cursor)
         
         # Step 4: Verify setup
         verify_setup(cursor)
+        index_problems = check_index_usage(conn)
         
         print("\n" + "=" * 60)
-        print("SETUP COMPLETE!")
+        if index_problems:
+            print(f"SETUP COMPLETE, BUT {len(index_problems)} CHECKED QUERIES DON'T USE THEIR INDEXES")
+            print("(see the WARNING above; re-check with: python migrations.py --check)")
+        else:
+            print("SETUP COMPLETE!")
         print("=" * 60 + "\n")
         
         return True
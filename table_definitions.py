@@ -171,6 +171,128 @@ CREATE_TABLES_SQL = [
         FOREIGN KEY (claim_id) REFERENCES claims_and_billing(claim_id) ON DELETE RESTRICT ON UPDATE CASCADE,
         CONSTRAINT chk_appeal_details CHECK (LOWER(appeal_filed) != 'yes' OR (appeal_status IS NOT NULL AND appeal_resolution_date IS NOT NULL AND final_outcome IS NOT NULL))
     );
+    """,
+    """
+    CREATE TABLE sequences (
+        name VARCHAR(100) PRIMARY KEY,
+        value BIGINT NOT NULL DEFAULT 0
+    );
+    """,
+    """
+    CREATE TABLE dashboard_daily_rollups (
+        stat_date DATE PRIMARY KEY,
+        procedures INT NOT NULL DEFAULT 0,
+        medications INT NOT NULL DEFAULT 0,
+        claims_total INT NOT NULL DEFAULT 0,
+        claims_paid INT NOT NULL DEFAULT 0
+    );
+    """,
+    """
+    CREATE TABLE dashboard_encounter_rollups (
+        stat_date DATE NOT NULL,
+        status VARCHAR(100) NOT NULL,
+        open_encounters INT NOT NULL DEFAULT 0,
+        stay_sum BIGINT NOT NULL DEFAULT 0,
+        stay_count INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (stat_date, status)
+    );
+    """,
+    """
+    CREATE TABLE dashboard_open_patients (
+        patient_id VARCHAR(50) PRIMARY KEY,
+        open_encounters INT NOT NULL DEFAULT 0
+    );
+    """,
+    """
+    CREATE TABLE dashboard_rollup_state (
+        id TINYINT PRIMARY KEY,
+        version INT NOT NULL,
+        built_at DATETIME NOT NULL
+    );
     """
 ]
 
+
+# Full-text indexes backing the global `q` search. The ngram parser indexes
+# every n-character sequence, so partial names and words can be matched.
+# They are built with innodb_ft_enable_stopword = OFF (see migrations.py):
+# with the default stopword list, ngram drops every token that contains a
+# stopword such as "a" or "i", and most of a name's tokens with it.
+# Created after the data load, which is much faster than maintaining them
+# row by row during the bulk insert.
+FULLTEXT_INDEXES = [
+    ("patients", "ft_patients_name", "first_name, last_name"),
+    ("providers", "ft_providers_search", "name, department, specialty"),
+    ("insurers", "ft_insurers_name", "name"),
+    ("department_heads", "ft_department_heads_department", "department"),
+    ("department_heads", "ft_department_heads_head_name", "head_name"),
+    ("encounters", "ft_encounters_search", "department, visit_type"),
+    ("diagnoses", "ft_diagnoses_description", "diagnosis_description"),
+    ("procedures", "ft_procedures_description", "procedure_description"),
+    ("lab_tests", "ft_lab_tests_name", "test_name"),
+    ("medications", "ft_medications_drug_name", "drug_name"),
+    ("denials", "ft_denials_reason", "denial_reason_description"),
+]
+
+# Secondary B-tree indexes for the columns the list endpoints filter and sort
+# on (see SORTABLE_COLUMNS in backend/app/models.py). InnoDB appends the
+# primary key to every secondary index, so an index on the sort column also
+# serves the "ORDER BY sort_col, primary key" used by pagination.
+LIST_INDEXES = [
+    # patients
+    ("patients", "idx_patients_registration_date", "registration_date"),
+    ("patients", "idx_patients_last_first", "last_name, first_name"),
+    ("patients", "idx_patients_age", "age"),
+    # providers
+    ("providers", "idx_providers_name", "name"),
+    ("providers", "idx_providers_department_specialty", "department, specialty"),
+    ("providers", "idx_providers_years_experience", "years_experience"),
+    # insurers
+    ("insurers", "idx_insurers_name", "name"),
+    ("insurers", "idx_insurers_payer_type", "payer_type"),
+    # department_heads
+    ("department_heads", "idx_department_heads_department", "department"),
+    # encounters
+    ("encounters", "idx_encounters_visit_date", "visit_date"),
+    ("encounters", "idx_encounters_status_visit_date", "status, visit_date"),
+    ("encounters", "idx_encounters_patient_visit_date", "patient_id, visit_date"),
+    ("encounters", "idx_encounters_length_of_stay", "length_of_stay"),
+    # claims_and_billing
+    ("claims_and_billing", "idx_claims_billing_date", "claim_billing_date"),
+    ("claims_and_billing", "idx_claims_status_billing_date", "claim_status, claim_billing_date"),
+    ("claims_and_billing", "idx_claims_status_amounts", "claim_status, billed_amount, paid_amount"),
+    ("claims_and_billing", "idx_claims_billed_amount", "billed_amount"),
+    ("claims_and_billing", "idx_claims_payment_method", "payment_method"),
+    # denials
+    ("denials", "idx_denials_denial_date", "denial_date"),
+    ("denials", "idx_denials_appeal_status_date", "appeal_status, denial_date"),
+    ("denials", "idx_denials_reason_code", "denial_reason_code"),
+    # diagnoses
+    ("diagnoses", "idx_diagnoses_code", "diagnosis_code"),
+    # procedures (encounter_id, procedure_cost) covers the claim amount sum
+    ("procedures", "idx_procedures_date", "procedure_date"),
+    ("procedures", "idx_procedures_code", "procedure_code"),
+    ("procedures", "idx_procedures_encounter_cost", "encounter_id, procedure_cost"),
+    ("procedures", "idx_procedures_cost", "procedure_cost"),
+    # medications (encounter_id, cost) covers the claim amount sum
+    ("medications", "idx_medications_prescribed_date", "prescribed_date"),
+    ("medications", "idx_medications_drug_name", "drug_name"),
+    ("medications", "idx_medications_encounter_cost", "encounter_id, cost"),
+    ("medications", "idx_medications_cost", "cost"),
+    # lab_tests
+    ("lab_tests", "idx_lab_tests_test_date", "test_date"),
+    ("lab_tests", "idx_lab_tests_status_date", "status, test_date"),
+    ("lab_tests", "idx_lab_tests_code", "test_code"),
+]
+
+# Versioned index migrations applied by migrations.py. Append new entries;
+# never edit one that has already shipped.
+# (version, description, index kind, [(table, index name, columns), ...])
+INDEX_MIGRATIONS = [
+    (1, "Full-text search indexes", "FULLTEXT", FULLTEXT_INDEXES),
+    (2, "Filter and sort indexes for list endpoints", "INDEX", LIST_INDEXES),
+    (3, "Primary diagnosis lookup for the activity feed", "INDEX", [
+        ("diagnoses", "idx_diagnoses_encounter_primary", "encounter_id, primary_flag"),
+    ]),
+    (4, "Rebuild full-text indexes without stopwords", "FULLTEXT_REBUILD", FULLTEXT_INDEXES),
+]